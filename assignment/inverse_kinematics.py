@@ -1,8 +1,8 @@
 import os
 import sys
+import time
 import numpy as np
 from math import pi
-from scipy.spatial.transform import Rotation as R
 import copy
 from typing import List
 
@@ -38,6 +38,10 @@ ik = IK()
 # --- Use your code to implement transformation class in transformation_utils.py---
 transform = transformation() 
 
+# Streaming of the IK iterates to the joint controller
+COMMAND_PERIOD = 0.01 # [s]
+MIN_COMMAND_STEP = 0.01 # [rad]
+
 class InverseKinematics(Node):
     def __init__(self):
         super().__init__('panda_teleop_control')
@@ -161,15 +165,9 @@ class InverseKinematics(Node):
     # Visualize the end effector
     def print_ee_err(self, T0e, target):
         position = T0e[:3, 3]
-        rotation_matrix = T0e[:3, :3]
-        rotation = R.from_matrix(rotation_matrix)
-        euler_angles = rotation.as_euler('xyz', degrees=True)  
-        rotation_matrix_target = target[:3, :3]
-        rotation_target = R.from_matrix(rotation_matrix_target)
-        euler_angles_target = rotation_target.as_euler('xyz', degrees=True)  
-        diff_r = (euler_angles[0] - euler_angles_target[0] + np.pi) % (2 * np.pi) - np.pi
-        diff_p = (euler_angles[1] - euler_angles_target[1] + np.pi) % (2 * np.pi) - np.pi
-        diff_y = (euler_angles[2] - euler_angles_target[2] + np.pi) % (2 * np.pi) - np.pi
+        # Roll-pitch-yaw of both poses at once, as given to transformation.transform
+        euler_angles, euler_angles_target = np.degrees(transform.rpy(np.stack((T0e, target))))
+        diff_r, diff_p, diff_y = (euler_angles - euler_angles_target + 180.) % 360. - 180.
         print("End Effector Position Error:")
         print(f"x: {position[0] - target[0][3]:.3f}, y: {position[1] - target[1][3]:.3f}, z: {position[2] - target[2][3]:.3f}")
         print("\nEnd Effector Orientation Error (Euler Angles):")
@@ -202,16 +200,29 @@ def main():
         # Use the initial position of the robotic arm as an initial guess
         initial_guess = initial_pose[:-2]
 
-        # Use your IK solver in solveIK.py
-        q_set, success = ik.inverse(target, initial_guess)
-        # Ignore panda_finger_joint1 and panda_finger_joint2
-        if success:  
-            print(f"Solution found with {len(q_set)} number of iterations.")
-            for q_ in q_set:
-                q_exe = np.append(q_, [0, 0])
-                node.move_joint_directly(q_exe)
-            joints, T0e = fk.forward(q_exe)
-            node.print_ee_err(T0e, target)
+        # Use your IK solver in solveIK.py. The iterates are streamed to the
+        # controller as they are computed, at most every COMMAND_PERIOD seconds
+        # and only once the joints have moved by MIN_COMMAND_STEP. The success
+        # of the solve is the return value of the generator
+        iterates = ik.iter_inverse(target, initial_guess, min_step=MIN_COMMAND_STEP)
+        n_commands = 0
+        while True:
+            try:
+                q_ = next(iterates)
+            except StopIteration as stop:
+                success = stop.value
+                break
+            # Ignore panda_finger_joint1 and panda_finger_joint2
+            q_exe = np.append(q_, [0, 0])
+            node.move_joint_directly(q_exe)
+            n_commands += 1
+            time.sleep(COMMAND_PERIOD)
+        joints, T0e = fk.forward(q_exe)
+        if success:
+            print(f"Solution found, sent with {n_commands} joint commands.")
+        else:
+            print(f"No solution found for target {i + 1}, the arm stopped at the last of {n_commands} joint commands.")
+        node.print_ee_err(T0e, target)
         if i < len(targets):
             input("Press Enter to move to next target...")
         else:
@@ -0,0 +1,135 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+# Microbenchmark of Panda.solve_fk, which runs on every /joint_states message, against the
+# previous implementation (frames resolved by name, a new Jacobian buffer, a Python loop for
+# the joint velocities, the full 6x(6+n) Jacobian product and new messages on every call).
+#
+# Usage (with the workspace sourced):
+#     python3 -m panda_ros2_gazebo.examples.benchmark_solve_fk [number_of_calls]
+
+import os
+import sys
+import time
+import yaml
+import numpy as np
+
+import rclpy
+from rclpy.node import Node
+from rclpy.parameter import Parameter
+from ament_index_python.packages import get_package_share_directory
+
+import idyntree.bindings as idt
+from geometry_msgs.msg import Vector3, PoseWithCovariance, TwistWithCovariance, Pose, Twist
+from sensor_msgs.msg import JointState
+from nav_msgs.msg import Odometry
+
+from .scripts.models.panda import Panda
+from .scripts.rbd.idyntree import numpy
+from .scripts.rbd.rotations import matrix_to_quaternion
+
+
+def solve_fk_reference(panda: Panda, joint_states: JointState, remap=True) -> Odometry:
+    # Panda.solve_fk before the preallocated FK workspace
+
+    panda.set_joint_states(joint_states, remap=remap)
+
+    panda._fk.setJointPos(numpy.FromNumPy.to_idyntree_dyn_vector(array=np.array(panda._joint_states.position)))
+
+    end_effector_pose_in_base_frame = panda._fk.getRelativeTransform(panda.base_frame, panda.end_effector_frame)
+    end_effector_position_in_base_frame = end_effector_pose_in_base_frame.getPosition().toNumPy()
+    end_effector_orientation_in_base_frame = end_effector_pose_in_base_frame.getRotation().toNumPy()
+
+    dofs = 6 + panda._fk.model().getNrOfDOFs()
+    J = idt.MatrixDynSize(6, dofs)
+    panda._fk.getFrameFreeFloatingJacobian(panda.end_effector_frame, J)
+    velocities = np.zeros((dofs,))
+    for i, joint_idx in enumerate(panda._arm_joint_names.keys()):
+        velocities[i+6] = panda._joint_states.velocity[joint_idx]
+
+    end_effector_twist = np.matmul(J.toNumPy(), velocities[:, np.newaxis]).squeeze()
+
+    odom = Odometry()
+    pose = Pose()
+    pose.position.x, pose.position.y, pose.position.z = end_effector_position_in_base_frame
+    quat = matrix_to_quaternion(end_effector_orientation_in_base_frame)
+    pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w = quat
+    odom.pose = PoseWithCovariance(pose=pose)
+
+    twist = Twist()
+    twist.linear = Vector3(x=end_effector_twist[0], y=end_effector_twist[1], z=end_effector_twist[2])
+    twist.angular = Vector3(x=end_effector_twist[3], y=end_effector_twist[4], z=end_effector_twist[5])
+    odom.twist = TwistWithCovariance(twist=twist)
+    odom.header.stamp = panda._node_handle.get_clock().now().to_msg()
+
+    return odom
+
+
+def get_parameter_overrides(share_dir: str):
+
+    with open(os.path.join(share_dir, 'config', 'params.yaml')) as params_file:
+        params = yaml.safe_load(params_file)['panda']['ros__parameters']
+
+    overrides = [Parameter('share_dir', value=share_dir)]
+    for name, value in params.items():
+        if isinstance(value, dict):
+            overrides += [Parameter(name + '.' + key, value=v) for key, v in value.items()]
+        else:
+            overrides.append(Parameter(name, value=value))
+
+    return overrides
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    num_calls = int(args[0]) if args else 10000
+
+    rclpy.init()
+    node = Node('panda', parameter_overrides=get_parameter_overrides(get_package_share_directory('panda_ros2_gazebo')))
+    node.declare_parameters(
+        namespace='',
+        parameters=[
+            ('model_file', None),
+            ('base_frame', None),
+            ('end_effector_frame', None),
+            ('arm_joint_tag', None),
+            ('finger_joint_tag', None),
+            ('initial_joint_angles', None),
+            ('share_dir', None)
+        ]
+    )
+    panda = Panda(node)
+
+    # Random joint states, in the order of /joint_states
+    rng = np.random.default_rng(0)
+    messages = []
+    for _ in range(100):
+        joint_states = JointState()
+        joint_states.position = rng.uniform(-1., 1., panda.num_joints).tolist()
+        joint_states.velocity = rng.uniform(-1., 1., panda.num_joints).tolist()
+        joint_states.effort = [0.] * panda.num_joints
+        messages.append(joint_states)
+
+    # Same pose and twist from both implementations
+    for joint_states in messages:
+        reference = solve_fk_reference(panda, joint_states)
+        odom = panda.solve_fk(joint_states)
+        for a, b in ((reference.pose.pose.position, odom.pose.pose.position),
+                     (reference.twist.twist.linear, odom.twist.twist.linear),
+                     (reference.twist.twist.angular, odom.twist.twist.angular)):
+            assert np.allclose([a.x, a.y, a.z], [b.x, b.y, b.z])
+
+    for name, solve_fk in (('reference', lambda joint_states: solve_fk_reference(panda, joint_states)),
+                           ('solve_fk', panda.solve_fk)):
+        start = time.perf_counter()
+        for i in range(num_calls):
+            solve_fk(messages[i % len(messages)])
+        elapsed = time.perf_counter() - start
+        print('{:<12}{:>10.1f} us per call'.format(name, elapsed / num_calls * 1e6))
+
+    node.destroy_node()
+    rclpy.shutdown()
+
+if __name__ == "__main__":
+    main()
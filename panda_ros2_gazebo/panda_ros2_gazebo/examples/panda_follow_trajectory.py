@@ -4,7 +4,6 @@
 
 import numpy as np
 from numpy import random
-from scipy.spatial.transform import Rotation as R
 import copy
 
 # ROS2 Python API libraries
@@ -18,6 +17,8 @@ from rcl_interfaces.srv import GetParameters
 
 # Panda kinematic model
 from .scripts.models.panda import Panda, FingersAction
+from .scripts.rbd.pose_batch import PoseBatch
+from .scripts.rbd.rotations import euler_to_quaternion
 from .helpers.rviz_helper import RVizHelper
 
 # Configure numpy output
@@ -69,6 +70,8 @@ class PandaFollowTrajectory(Node):
         # Set an end effector target
         self._end_effector_current = self._panda.solve_fk(self._joint_states, remap=False)
         self._joint_targets = self._panda.solve_ik(self._end_effector_current)
+        if self._joint_targets is None:
+            self._joint_targets = np.array(self._joint_states.position, dtype=float)
         self._end_effector_target = copy.deepcopy(self._end_effector_current)
 
         # Create the RViz helper for visualizing the waypoints and trajectories
@@ -150,27 +153,15 @@ class PandaFollowTrajectory(Node):
                             mask: np.ndarray = np.array([1., 1., 1.])) -> bool:
 
         # Check the position to see if the target has been reached
-        position = np.array([
-            self._end_effector_current.pose.pose.position.x,
-            self._end_effector_current.pose.pose.position.y,
-            self._end_effector_current.pose.pose.position.z])
+        poses = PoseBatch.from_odometry([self._end_effector_current, self._end_effector_target])
+        translation = poses.position[1] - poses.position[0]
         velocity = np.array([
             self._end_effector_current.twist.twist.linear.x,
             self._end_effector_current.twist.twist.linear.y,
-            self._end_effector_current.twist.twist.linear.z,
-            self._end_effector_current.twist.twist.angular.x,
-            self._end_effector_current.twist.twist.angular.y,
-            self._end_effector_current.twist.twist.angular.z])
-        target = np.array([
-            self._end_effector_target.pose.pose.position.x,
-            self._end_effector_target.pose.pose.position.y,
-            self._end_effector_target.pose.pose.position.z])
+            self._end_effector_current.twist.twist.linear.z])
 
-        masked_target = mask * target
-        masked_current = mask * position
-
-        end_effector_reached = (np.linalg.norm(masked_current - masked_target) < max_error_pos) and \
-            (np.linalg.norm(velocity[:3]) < max_error_vel)
+        end_effector_reached = (np.linalg.norm(mask * translation) < max_error_pos) and \
+            (np.linalg.norm(velocity) < max_error_vel)
 
         return True # end_effector_reached
 
@@ -187,7 +178,7 @@ class PandaFollowTrajectory(Node):
         p = 0. # np.random.uniform(low=-np.pi/4, high=np.pi/4)
         y = 0. # np.random.uniform(low=-np.pi/4, high=np.pi/4)
 
-        quat_xyzw = R.from_euler('xyz', [r, p, y], degrees=False).as_quat()
+        quat_xyzw = euler_to_quaternion('xyz', [r, p, y], degrees=False)
         self._end_effector_target.pose.pose.orientation.x = quat_xyzw[0]
         self._end_effector_target.pose.pose.orientation.y = quat_xyzw[1]
         self._end_effector_target.pose.pose.orientation.z = quat_xyzw[2]
@@ -200,7 +191,10 @@ class PandaFollowTrajectory(Node):
         #     r, p, y
         # ))
 
-        self._joint_targets = self._panda.solve_ik(self._end_effector_target)
+        # Keep the previous joint targets if the IK failed
+        joint_targets = self._panda.solve_ik(self._end_effector_target)
+        if joint_targets is not None:
+            self._joint_targets = joint_targets
 
         # Sample whether or not the fingers should be open or closed
         if random.random() > 0.5:
@@ -8,7 +8,6 @@ import copy
 import numpy as np
 import math
 from typing import List
-from scipy.spatial.transform import Rotation as R
 
 # ROS2 Python API libraries
 import rclpy
@@ -21,6 +20,8 @@ from std_msgs.msg import Float64MultiArray
 
 # Panda kinematic model
 from .scripts.models.panda import Panda, FingersAction
+from .scripts.rbd.pose_batch import PoseBatch
+from .scripts.rbd.rotations import constant_quaternion
 
 # Helper class for RViz visualization
 from .helpers.rviz_helper import RVizHelper
@@ -112,14 +113,14 @@ class PandaPickAndInsert(Node):
         self._end_effector_current = self._panda.solve_fk(self._joint_states, remap=False)
 
         self._end_effector_target: Odometry = copy.deepcopy(self._end_effector_current)
-        quat_xyzw = R.from_euler(seq="y", angles=90, degrees=True).as_quat()
+        quat_xyzw = constant_quaternion(seq="y", angles=90, degrees=True)
         self._end_effector_target.pose.pose.orientation.x = quat_xyzw[0]
         self._end_effector_target.pose.pose.orientation.y = quat_xyzw[1]
         self._end_effector_target.pose.pose.orientation.z = quat_xyzw[2]
         self._end_effector_target.pose.pose.orientation.w = quat_xyzw[3]
         self._initial_end_effector_target = copy.deepcopy(self._end_effector_target)
 
-        self._joint_targets: List[float] = self._panda.solve_ik(self._end_effector_target)
+        self._joint_targets: List[float] = self.solve_ik(self._end_effector_target, np.array(self._joint_states.position, dtype=float))
         self._joint_targets_finish: List[float] = self._joint_targets.copy()
         self._joint_targets_start: List[float] = self._joint_targets.copy()
 
@@ -169,9 +170,9 @@ class PandaPickAndInsert(Node):
     def callback_joint_states(self, joint_states):
 
         self._joint_states = joint_states
-        self._panda.set_joint_states(self._joint_states)
 
-        # Calculate the end effector location relative to the base from forward kinematics
+        # Calculate the end effector location relative to the base from forward kinematics (which also sets the
+        # joint states of the model)
         self._end_effector_current = self._panda.solve_fk(self._joint_states)
 
         self.get_next_target() # cycle target to next action in state machine
@@ -192,27 +193,15 @@ class PandaPickAndInsert(Node):
                             mask: np.ndarray = np.array([1., 1., 1.])) -> bool:
 
         # Check the position to see if the target has been reached
-        position = np.array([
-            self._end_effector_current.pose.pose.position.x,
-            self._end_effector_current.pose.pose.position.y,
-            self._end_effector_current.pose.pose.position.z])
+        poses = PoseBatch.from_odometry([self._end_effector_current, self._end_effector_target])
+        translation = poses.position[1] - poses.position[0]
         velocity = np.array([
             self._end_effector_current.twist.twist.linear.x,
             self._end_effector_current.twist.twist.linear.y,
-            self._end_effector_current.twist.twist.linear.z,
-            self._end_effector_current.twist.twist.angular.x,
-            self._end_effector_current.twist.twist.angular.y,
-            self._end_effector_current.twist.twist.angular.z])
-        target = np.array([
-            self._end_effector_target.pose.pose.position.x,
-            self._end_effector_target.pose.pose.position.y,
-            self._end_effector_target.pose.pose.position.z])
+            self._end_effector_current.twist.twist.linear.z])
 
-        masked_target = mask * target
-        masked_current = mask * position
-
-        end_effector_reached = (np.linalg.norm(masked_current - masked_target) < max_error_pos) and \
-            (np.linalg.norm(velocity[:3]) < max_error_vel)
+        end_effector_reached = (np.linalg.norm(mask * translation) < max_error_pos) and \
+            (np.linalg.norm(velocity) < max_error_vel)
 
         return end_effector_reached
 
@@ -249,7 +238,7 @@ class PandaPickAndInsert(Node):
         self._sparkplug_pose.position.x = random_position[0]
         self._sparkplug_pose.position.y = random_position[1]
         self._sparkplug_pose.position.z = 0.01
-        quat = R.from_euler(seq="y", angles=90, degrees=True).as_quat()
+        quat = constant_quaternion(seq="y", angles=90, degrees=True)
         self._sparkplug_pose.orientation.x = quat[0]
         self._sparkplug_pose.orientation.y = quat[1]
         self._sparkplug_pose.orientation.z = quat[2]
@@ -262,6 +251,14 @@ class PandaPickAndInsert(Node):
 
         self._sparkplug_counter += 1
 
+    def solve_ik(self, target_pose: Odometry, fallback: List[float]) -> List[float]:
+        # Joint targets of target_pose, or fallback if the IK failed (Panda.solve_ik logs the failure), so that
+        # the arm holds its targets instead of moving to those of a previous target
+
+        joint_targets = self._panda.solve_ik(target_pose)
+
+        return fallback if joint_targets is None else joint_targets
+
     def interp_joint_targets(self, joint_target: List[float], joint_targets_finish: List[float], joint_targets_start: List[float], num_steps):
 
         return [jt + (jf - js) / (num_steps - 1) for jt, jf, js in zip(joint_target, joint_targets_finish, joint_targets_start)].copy()
@@ -276,7 +273,7 @@ class PandaPickAndInsert(Node):
         # if self._state == StateMachineAction.DELIVER:
         #     quat_xyzw = R.from_euler(seq="xyz", angles=[0, 180 ,0], degrees=True).as_quat() # [180, 180, 0] ? 
         # else:
-        quat_xyzw = R.from_euler(seq="y", angles=90, degrees=True).as_quat()
+        quat_xyzw = constant_quaternion(seq="y", angles=90, degrees=True)
         self._end_effector_target.pose.pose.orientation.x = quat_xyzw[0]
         self._end_effector_target.pose.pose.orientation.y = quat_xyzw[1]
         self._end_effector_target.pose.pose.orientation.z = quat_xyzw[2]
@@ -301,7 +298,7 @@ class PandaPickAndInsert(Node):
                 self._end_effector_target.pose.pose.position.x += 0.012
                 self._end_effector_target.pose.pose.position.z = hover_height # hover above the sparkplug
 
-                self._joint_targets = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets = self.solve_ik(self._end_effector_target, self._joint_targets)
 
             return
 
@@ -311,7 +308,7 @@ class PandaPickAndInsert(Node):
                 self._end_effector_target.pose.pose.position.z = grab_height
 
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = self.solve_ik(self._end_effector_target, self._joint_targets_start)
 
                 self._wait += 1
 
@@ -338,7 +335,7 @@ class PandaPickAndInsert(Node):
                 self._end_effector_target.pose.pose.position.z = 2 * hover_height
 
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = self.solve_ik(self._end_effector_target, self._joint_targets_start)
 
             if self._wait < 2 * self._max_wait and self._wait >= self._max_wait:
                 # Raise the gripper
@@ -357,7 +354,7 @@ class PandaPickAndInsert(Node):
 
                 self._joint_targets = self._joint_targets.copy()
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = self.solve_ik(self._end_effector_target, self._joint_targets_start)
 
                 # Deliver the box to its location. Maybe hover above the location before dropping the box
                 self._state = StateMachineAction.DELIVER
@@ -381,7 +378,7 @@ class PandaPickAndInsert(Node):
                 self._end_effector_target.pose.pose.position.z = grab_height
 
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = self.solve_ik(self._end_effector_target, self._joint_targets_start)
 
                 self._wait += 1
 
@@ -389,7 +386,7 @@ class PandaPickAndInsert(Node):
                 self._end_effector_target.pose.pose.position.z = hover_height
 
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = self.solve_ik(self._end_effector_target, self._joint_targets_start)
 
             if self._wait >= self._max_wait:
                 self._wait += 1
@@ -417,7 +414,7 @@ class PandaPickAndInsert(Node):
                 # Return to the home position and spawn the box in a new location
                 self._end_effector_target = copy.deepcopy(self._initial_end_effector_target)
 
-                self._joint_targets = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets = self.solve_ik(self._end_effector_target, self._joint_targets)
 
                 self._state = StateMachineAction.HOME
 
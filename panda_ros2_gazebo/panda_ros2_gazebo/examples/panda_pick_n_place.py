@@ -5,8 +5,7 @@
 import enum
 import copy
 import numpy as np
-from typing import List
-from scipy.spatial.transform import Rotation as R
+from typing import List, Optional
 
 # ROS2 Python API libraries
 import rclpy
@@ -19,6 +18,9 @@ from std_msgs.msg import Float64MultiArray
 
 # Panda kinematic model
 from .scripts.models.panda import Panda, FingersAction
+from .scripts.models.ik_worker import IKWorker
+from .scripts.rbd.pose_batch import PoseBatch
+from .scripts.rbd.rotations import constant_quaternion
 
 # Helper class for RViz visualization
 from .helpers.rviz_helper import RVizHelper
@@ -82,6 +84,9 @@ class PandaPickAndPlace(Node):
         self._wait = 0
         self._max_wait = 200
 
+        # Number of times a failed IK target is posted again before the state machine gives up and returns home
+        self._max_ik_retries = 3
+
         # Create joint commands, end effector publishers; subscribe to joint state
         self._joint_commands_publisher = self.create_publisher(Float64MultiArray, self.get_parameter('joint_control_topic').value, 10)
         self._end_effector_target_publisher = self.create_publisher(Odometry, self.get_parameter('end_effector_target_topic').value, 10)
@@ -104,7 +109,7 @@ class PandaPickAndPlace(Node):
         self._end_effector_current = self._panda.solve_fk(self._joint_states, remap=False)
 
         self._end_effector_target: Odometry = copy.deepcopy(self._end_effector_current)
-        quat_xyzw = R.from_euler(seq="y", angles=90, degrees=True).as_quat()
+        quat_xyzw = constant_quaternion(seq="y", angles=90, degrees=True)
         self._end_effector_target.pose.pose.orientation.x = quat_xyzw[0]
         self._end_effector_target.pose.pose.orientation.y = quat_xyzw[1]
         self._end_effector_target.pose.pose.orientation.z = quat_xyzw[2]
@@ -112,6 +117,9 @@ class PandaPickAndPlace(Node):
         self._initial_end_effector_target = copy.deepcopy(self._end_effector_target)
 
         self._joint_targets: List[float] = self._panda.solve_ik(self._end_effector_target)
+        if self._joint_targets is None:
+            self._joint_targets = np.array(self._joint_states.position, dtype=float)
+        self._home_joint_targets: List[float] = self._joint_targets.copy()
         self._joint_targets_finish: List[float] = self._joint_targets.copy()
         self._joint_targets_start: List[float] = self._joint_targets.copy()
 
@@ -122,6 +130,11 @@ class PandaPickAndPlace(Node):
         msg.data = list(self._joint_targets.copy())
         self._joint_commands_publisher.publish(msg)
 
+        # Solve the IK of the state machine targets in the background (see solve_ik)
+        self._ik_worker = IKWorker(self, self._panda, initial_solution=self._joint_targets)
+        self._ik_sequence: Optional[int] = None
+        self._ik_retries = 0
+
         # Create the RViz helper for visualizing the waypoints and trajectories
         self._rviz_helper = RVizHelper(self)
 
@@ -162,9 +175,9 @@ class PandaPickAndPlace(Node):
     def callback_joint_states(self, joint_states):
 
         self._joint_states = joint_states
-        self._panda.set_joint_states(self._joint_states)
 
-        # Calculate the end effector location relative to the base from forward kinematics
+        # Calculate the end effector location relative to the base from forward kinematics (which also sets the
+        # joint states of the model)
         self._end_effector_current = self._panda.solve_fk(self._joint_states)
 
         self.get_next_target() # cycle target to next action in state machine
@@ -185,27 +198,15 @@ class PandaPickAndPlace(Node):
                             mask: np.ndarray = np.array([1., 1., 1.])) -> bool:
 
         # Check the position to see if the target has been reached
-        position = np.array([
-            self._end_effector_current.pose.pose.position.x,
-            self._end_effector_current.pose.pose.position.y,
-            self._end_effector_current.pose.pose.position.z])
+        poses = PoseBatch.from_odometry([self._end_effector_current, self._end_effector_target])
+        translation = poses.position[1] - poses.position[0]
         velocity = np.array([
             self._end_effector_current.twist.twist.linear.x,
             self._end_effector_current.twist.twist.linear.y,
-            self._end_effector_current.twist.twist.linear.z,
-            self._end_effector_current.twist.twist.angular.x,
-            self._end_effector_current.twist.twist.angular.y,
-            self._end_effector_current.twist.twist.angular.z])
-        target = np.array([
-            self._end_effector_target.pose.pose.position.x,
-            self._end_effector_target.pose.pose.position.y,
-            self._end_effector_target.pose.pose.position.z])
+            self._end_effector_current.twist.twist.linear.z])
 
-        masked_target = mask * target
-        masked_current = mask * position
-
-        end_effector_reached = (np.linalg.norm(masked_current - masked_target) < max_error_pos) and \
-            (np.linalg.norm(velocity[:3]) < max_error_vel)
+        end_effector_reached = (np.linalg.norm(mask * translation) < max_error_pos) and \
+            (np.linalg.norm(velocity) < max_error_vel)
 
         return end_effector_reached
 
@@ -242,38 +243,92 @@ class PandaPickAndPlace(Node):
 
         return [jt + (jf - js) / (num_steps - 1) for jt, jf, js in zip(joint_target, joint_targets_finish, joint_targets_start)].copy()
 
+    def solve_ik(self, target_pose: Odometry) -> Optional[List[float]]:
+        # Non-blocking IK of the state machine. The first call posts the target to the IK worker and returns None,
+        # and get_next_target is held until the worker has solved it. The step that posted the target is then run
+        # again (so it must not change the state before the call), and the call returns the solution. If the solve
+        # failed, the target is posted again and the state machine keeps holding, up to _max_ik_retries times, after
+        # which the target is given up and the arm returns home.
+
+        if self._ik_sequence is None:
+            self._ik_sequence = self._ik_worker.post(target_pose)
+            return None
+
+        joint_targets, ik_sequence, ik_success = self._ik_worker.latest()
+        if ik_sequence < self._ik_sequence:
+            return None
+
+        if not ik_success:
+            if self._ik_retries < self._max_ik_retries:
+                self._ik_retries += 1
+                self.get_logger().warn('IK FAILED, RETRYING THE TARGET ({}/{})'.format(self._ik_retries, self._max_ik_retries))
+                self._ik_sequence = self._ik_worker.post(target_pose)
+            else:
+                self.get_logger().error('IK FAILED {} TIMES, GIVING UP THE TARGET AND RETURNING HOME'.format(self._ik_retries + 1))
+                self.return_home()
+            return None
+
+        self._ik_sequence = None
+        self._ik_retries = 0
+
+        return joint_targets
+
+    def return_home(self) -> None:
+        # Abort the current pick and place: drop the pending IK target and go back to the home joint targets, which
+        # need no IK
+
+        self._ik_sequence = None
+        self._ik_retries = 0
+        self._end_effector_target = copy.deepcopy(self._initial_end_effector_target)
+        self._joint_targets = self._home_joint_targets.copy()
+        self._wait = 0
+        self._state = StateMachineAction.HOME
+
+    def ik_pending(self) -> bool:
+
+        return self._ik_sequence is not None and self._ik_worker.latest()[1] < self._ik_sequence
+
     def get_next_target(self):
         hover_height = 0.30
         box_height = 0.05
         grab_height = 0.03
 
-        quat_xyzw = R.from_euler(seq="xyz", angles=[0, 90, 90], degrees=True).as_quat()
+        # Hold the state machine while the IK worker solves its last target
+        if self.ik_pending():
+            return
+
+        quat_xyzw = constant_quaternion(seq="xyz", angles=[0, 90, 90], degrees=True)
         self._end_effector_target.pose.pose.orientation.x = quat_xyzw[0]
         self._end_effector_target.pose.pose.orientation.y = quat_xyzw[1]
         self._end_effector_target.pose.pose.orientation.z = quat_xyzw[2]
         self._end_effector_target.pose.pose.orientation.w = quat_xyzw[3]
 
-        # If the current state is "HOME" position and the target location has been reached
-        if self._state == StateMachineAction.HOME and self.end_effector_reached():
+        # If the current state is "HOME" position and the target location has been reached (or the IK of the next
+        # target, which is no longer the home position, has just been solved)
+        if self._state == StateMachineAction.HOME and (self._ik_sequence is not None or self.end_effector_reached()):
 
             if self._wait < self._max_wait:
                 # Keep waiting
                 self._wait += 1
 
             else:
+                # Set the end effector target to the cube pose (once: this step runs again when the IK is solved)
+                if self._ik_sequence is None:
+                    self.sample_new_cube_pose()
+                    self._end_effector_target.pose.pose.position = copy.deepcopy(self._cube_pose.position)
+                    self._end_effector_target.pose.pose.position.y += 0.02
+                    self._end_effector_target.pose.pose.position.z = hover_height # hover above the cube
+
+                joint_targets = self.solve_ik(self._end_effector_target)
+                if joint_targets is None:
+                    return
+
+                self._joint_targets = joint_targets
                 self._wait = 0
 
                 # Go to the location where the box is and hover above it
                 self._state = StateMachineAction.HOVER
 
-                # Set the end effector target to the cube pose
-                self.sample_new_cube_pose()
-                self._end_effector_target.pose.pose.position = copy.deepcopy(self._cube_pose.position)
-                self._end_effector_target.pose.pose.position.y += 0.02
-                self._end_effector_target.pose.pose.position.z = hover_height # hover above the cube
-
-                self._joint_targets = self._panda.solve_ik(self._end_effector_target)
-
             return
 
         if self._state == StateMachineAction.HOVER:
@@ -281,8 +336,12 @@ class PandaPickAndPlace(Node):
             if self._wait == 0:
                 self._end_effector_target.pose.pose.position.z = grab_height
 
+                joint_targets_finish = self.solve_ik(self._end_effector_target)
+                if joint_targets_finish is None:
+                    return
+
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = joint_targets_finish
 
             if self._wait < self._max_wait:
                 # Lower the gripper
@@ -305,8 +364,12 @@ class PandaPickAndPlace(Node):
             if self._wait == self._max_wait:
                 self._end_effector_target.pose.pose.position.z = hover_height
 
+                joint_targets_finish = self.solve_ik(self._end_effector_target)
+                if joint_targets_finish is None:
+                    return
+
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = joint_targets_finish
 
             if self._wait < 2 * self._max_wait and self._wait >= self._max_wait:
                 # Raise the gripper
@@ -314,17 +377,21 @@ class PandaPickAndPlace(Node):
 
                 self._joint_targets = self.interp_joint_targets(self._joint_targets, self._joint_targets_finish, self._joint_targets_start, self._max_wait)
 
-            self._wait += 1
+            if self._wait < 2 * self._max_wait:
+                self._wait += 1
 
             if self._wait == 2 * self._max_wait:
-                self._wait = 0
-
                 # Set the location for the delivery target
                 self._end_effector_target.pose.pose.position.x = 0.3
                 self._end_effector_target.pose.pose.position.y = 0.5
                 self._end_effector_target.pose.pose.position.z = max((self._cube_counter + 0.5) * box_height, hover_height)
 
-                self._joint_targets = self._panda.solve_ik(self._end_effector_target)
+                joint_targets = self.solve_ik(self._end_effector_target)
+                if joint_targets is None:
+                    return
+
+                self._joint_targets = joint_targets
+                self._wait = 0
 
                 # Deliver the box to its location. Maybe hover above the location before dropping the box
                 self._state = StateMachineAction.DELIVER
@@ -336,21 +403,29 @@ class PandaPickAndPlace(Node):
             grab_height = goal + 0.25 * box_height
             hover_height = goal + box_height
 
-            if self._wait == 0 and self.end_effector_reached():
+            if self._wait == 0 and (self._ik_sequence is not None or self.end_effector_reached()):
                 self._end_effector_target.pose.pose.position.z = grab_height
 
+                joint_targets_finish = self.solve_ik(self._end_effector_target)
+                if joint_targets_finish is None:
+                    return
+
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = joint_targets_finish
 
                 self._wait += 1
 
             if self._wait == 2 * self._max_wait:
                 self._end_effector_target.pose.pose.position.z = hover_height
 
+                joint_targets_finish = self.solve_ik(self._end_effector_target)
+                if joint_targets_finish is None:
+                    return
+
                 self._joint_targets_start = self._joint_targets.copy()
-                self._joint_targets_finish = self._panda.solve_ik(self._end_effector_target)
+                self._joint_targets_finish = joint_targets_finish
 
-            if self._wait >= self._max_wait:
+            if self._wait >= self._max_wait and self._wait < 3 * self._max_wait:
                 self._wait += 1
 
             if self._wait < self._max_wait and self._wait > 0:
@@ -371,12 +446,15 @@ class PandaPickAndPlace(Node):
                     self._joint_targets = self.interp_joint_targets(self._joint_targets, self._joint_targets_finish, self._joint_targets_start, self._max_wait)
 
             if self._wait == 3 * self._max_wait:
-                self._wait = 0
-
                 # Return to the home position and spawn the box in a new location
                 self._end_effector_target = copy.deepcopy(self._initial_end_effector_target)
 
-                self._joint_targets = self._panda.solve_ik(self._end_effector_target)
+                joint_targets = self.solve_ik(self._end_effector_target)
+                if joint_targets is None:
+                    return
+
+                self._joint_targets = joint_targets
+                self._wait = 0
 
                 self._state = StateMachineAction.HOME
 
@@ -15,6 +15,8 @@ from std_msgs.msg import Float64MultiArray
 
 # Panda kinematic model
 from .scripts.models.panda import Panda, FingersAction
+from .scripts.models.ik_worker import IKWorker
+from .scripts.rbd.pose_batch import PoseBatch
 from .helpers.rviz_helper import RVizHelper
 
 # For communication with the teleop node
@@ -72,15 +74,22 @@ class PandaTeleopControl(Node):
         # Set an end effector target
         self._end_effector_current = self._panda.solve_fk(self._joint_states, remap=False)
         self._joint_targets = self._panda.solve_ik(self._end_effector_current)
+        if self._joint_targets is None:
+            self._joint_targets = np.array(self._joint_states.position, dtype=float)
         self._end_effector_target = copy.deepcopy(self._end_effector_current)
 
+        # Solve the IK of the end effector targets in the background (see callback_end_effector_target)
+        self._ik_worker = IKWorker(self, self._panda, initial_solution=self._joint_targets)
+        self._ik_sequence = 0
+
         # Create the RViz helper for visualizing the waypoints and trajectories
         self._rviz_helper = RVizHelper(self)
 
     def callback_end_effector_target(self, end_effector_target: Odometry):
 
+        # Only post the target: the IK worker solves the latest one, and callback_joint_states reads its solution
         self._end_effector_target = end_effector_target
-        self._joint_targets = self._panda.solve_ik(self._end_effector_target)
+        self._ik_worker.post(self._end_effector_target)
 
     def callback_actuate_gripper(self, request: Empty.Request, response: Empty.Response):
 
@@ -95,6 +104,13 @@ class PandaTeleopControl(Node):
 
         self._joint_states = joint_states
 
+        # Take the latest IK solution, if the worker has solved a new target (keep the joint targets if it failed)
+        joint_targets, ik_sequence, ik_success = self._ik_worker.latest()
+        if ik_sequence > self._ik_sequence:
+            self._ik_sequence = ik_sequence
+            if ik_success:
+                self._joint_targets = joint_targets
+
         if self._panda.gripper_state == FingersAction.OPEN: # if the grippers are OPEN, keep them OPEN
             self._joint_targets[-2:] = self._panda.move_fingers(list(self._joint_targets), FingersAction.OPEN)[-2:]
         else: # if the grippers are CLOSED, keep them CLOSED
@@ -127,26 +143,14 @@ class PandaTeleopControl(Node):
                             mask: np.ndarray = np.array([1., 1., 1.])) -> bool:
 
         # Check the position to see if the target has been reached
-        position = np.array([
-            self._end_effector_current.pose.pose.position.x,
-            self._end_effector_current.pose.pose.position.y,
-            self._end_effector_current.pose.pose.position.z])
+        poses = PoseBatch.from_odometry([self._end_effector_current, self._end_effector_target])
+        translation = poses.position[1] - poses.position[0]
         velocity = np.array([
             self._end_effector_current.twist.twist.linear.x,
             self._end_effector_current.twist.twist.linear.y,
-            self._end_effector_current.twist.twist.linear.z,
-            self._end_effector_current.twist.twist.angular.x,
-            self._end_effector_current.twist.twist.angular.y,
-            self._end_effector_current.twist.twist.angular.z])
-        target = np.array([
-            self._end_effector_target.pose.pose.position.x,
-            self._end_effector_target.pose.pose.position.y,
-            self._end_effector_target.pose.pose.position.z])
-
-        masked_target = mask * target
-        masked_current = mask * position
-
-        end_effector_reached = (np.linalg.norm(masked_current - masked_target) < max_error_pos) and \
-            (np.linalg.norm(velocity[:3]) < max_error_vel)
+            self._end_effector_current.twist.twist.linear.z])
+
+        end_effector_reached = (np.linalg.norm(mask * translation) < max_error_pos) and \
+            (np.linalg.norm(velocity) < max_error_vel)
 
         return end_effector_reached
\ No newline at end of file
@@ -6,4 +6,5 @@ import numpy
 
 max_float = float(numpy.finfo(numpy.float32).max)
 
-from . import panda
\ No newline at end of file
+from . import panda
+from . import ik_worker
\ No newline at end of file
@@ -0,0 +1,158 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import copy
+import time
+import threading
+import numpy as np
+from typing import List, Optional, Tuple
+
+# ROS2 message data structures
+from nav_msgs.msg import Odometry
+from std_msgs.msg import Float64MultiArray, MultiArrayDimension
+
+from .panda import Panda
+
+class IKWorker():
+    """
+    Runs Panda.solve_ik in a background thread, so that the IK solves do not block the executor (and the
+    /joint_states callbacks) of the node. The iDynTree bindings release the GIL while IPOPT is running.
+
+    The targets are passed through a single-slot mailbox: a target posted while the previous one is still
+    waiting to be solved replaces it (the older one is dropped and counted as coalesced), so the worker
+    always solves the most recent target. The callbacks only post targets and read the latest result, which
+    tells whether its target was solved (a failed solve has no solution, so that the callers never take the
+    joints of another target for those of theirs).
+
+    After every solve, the worker publishes its statistics as a Float64MultiArray (see STATS_LABELS) on the
+    topic of the 'ik_worker_stats_topic' parameter. The latencies [s] are from the post of a target to its
+    solution.
+    """
+
+    STATS_LABELS: List[str] = ['solved', 'failed', 'coalesced', 'solve_time', 'latency', 'mean_latency', 'max_latency']
+
+    def __init__(self, node_handle, panda: Panda, initial_solution: List[float] = None):
+        """
+        Args:
+            node_handle: The node publishing the statistics.
+            panda: The model whose solve_ik is run by the worker. Its IK must not be used by other threads
+                once the worker has started.
+            initial_solution: The solution returned by latest until the first solve.
+        """
+
+        self._node_handle = node_handle
+        self._panda = panda
+
+        # Mailbox and latest solution, guarded by the condition
+        self._condition = threading.Condition()
+        self._target: Optional[Odometry] = None
+        self._target_time = 0.
+        self._posted = 0
+        self._solution = None if initial_solution is None else np.array(initial_solution, dtype=float)
+        self._solution_sequence = 0
+        self._success = True
+        self._running = True
+
+        # Statistics
+        self._solved = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._total_latency = 0.
+        self._max_latency = 0.
+
+        self._node_handle.declare_parameter('ik_worker_stats_topic', 'ik_worker_stats')
+        self._stats_publisher = self._node_handle.create_publisher(
+            Float64MultiArray, self._node_handle.get_parameter('ik_worker_stats_topic').value, 10)
+        self._stats = Float64MultiArray()
+        self._stats.layout.dim = [MultiArrayDimension(label=','.join(self.STATS_LABELS), size=len(self.STATS_LABELS), stride=len(self.STATS_LABELS))]
+
+        self._thread = threading.Thread(target=self._run, name='ik_worker', daemon=True)
+        self._thread.start()
+
+    def post(self, target_pose: Odometry) -> int:
+        """
+        Post a target to the worker, replacing the target waiting to be solved, if any.
+
+        Args:
+            target_pose: The end effector target. It is copied, so the caller may keep modifying it.
+
+        Returns:
+            The sequence number of the target (see latest).
+        """
+
+        target_pose = copy.deepcopy(target_pose)
+
+        with self._condition:
+            if self._target is not None:
+                self._coalesced += 1
+
+            self._posted += 1
+            self._target = target_pose
+            self._target_time = time.perf_counter()
+            self._condition.notify()
+
+            return self._posted
+
+    def latest(self) -> Tuple[Optional[np.ndarray], int, bool]:
+        """
+        Returns:
+            A tuple with a copy of the latest solution, the sequence number of its target (0 for the initial
+            solution) and whether the solve succeeded (if not, the solution is None). A target has its result,
+            or was coalesced into a newer target with a result, once the sequence number of the latest result
+            is greater or equal to its own.
+        """
+
+        with self._condition:
+            solution = None if self._solution is None else self._solution.copy()
+
+            return solution, self._solution_sequence, self._success
+
+    def stop(self) -> None:
+
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        self._thread.join()
+
+    def _run(self) -> None:
+
+        while True:
+            with self._condition:
+                while self._target is None and self._running:
+                    self._condition.wait()
+
+                if not self._running:
+                    return
+
+                target_pose, sequence, target_time = self._target, self._posted, self._target_time
+                self._target = None
+
+            start = time.perf_counter()
+            try:
+                # None if the target is out of reach or the IK failed
+                solution = self._panda.solve_ik(target_pose)
+                if solution is not None:
+                    solution = np.array(solution, dtype=float)
+            except Exception as exception:
+                # Publish a failed result for this target, so that the callers waiting for it are not held forever
+                self._node_handle.get_logger().error('IK WORKER FAILED TO SOLVE THE TARGET: {}'.format(exception))
+                solution = None
+            end = time.perf_counter()
+
+            with self._condition:
+                self._solution = solution
+                self._solution_sequence = sequence
+                self._success = solution is not None
+
+                latency = end - target_time
+                self._solved += self._success
+                self._failed += not self._success
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+
+                self._stats.data = [float(self._solved), float(self._failed), float(self._coalesced), end - start, latency,
+                                    self._total_latency / (self._solved + self._failed), self._max_latency]
+
+            self._stats_publisher.publish(self._stats)
@@ -5,21 +5,26 @@
 import os
 import enum
 import copy
+import threading
 import numpy as np
+from collections import OrderedDict
 from ..rbd.idyntree import numpy
-from typing import List
-from scipy.spatial.transform import Rotation as R
+from typing import List, Optional, Tuple
 
 # For using iDynTree inverse kinematics library
 import idyntree.bindings as idt
 from idyntree.bindings import KinDynComputations
 from ..rbd import conversions
+from ..rbd.reachability import ReachabilityMap
+from ..rbd.pose_batch import PoseBatch
+from ..rbd.rotations import matrix_to_quaternion
 from ..rbd.idyntree import inverse_kinematics_nlp
 from ..rbd.idyntree import kindyncomputations
+from ..rbd.idyntree import model_registry
 from ..rbd.idyntree.helpers import FrameVelocityRepresentation
 
 # ROS2 message and service data structures
-from geometry_msgs.msg import Transform, Vector3, Quaternion, PoseWithCovariance, TwistWithCovariance, Pose, Twist
+from geometry_msgs.msg import Transform, Vector3, Quaternion
 from sensor_msgs.msg import JointState
 from nav_msgs.msg import Odometry
 from gazebo_msgs.msg import EntityState
@@ -61,10 +66,11 @@ class Panda():
         else:
             self._urdf = model_file
 
-        # Get the model loader
-        self._model_loader = idt.ModelLoader()
-        
-        self._articulated_system = self._get_model_loader(self._urdf).model()
+        # Get the model loader (shared with the IK, see model_registry). The shared model is read-only, this instance
+        # works on its own copy (whose joint limits are enabled below, and which is loaded into the FK)
+        self._model_loader = self._get_model_loader(self._urdf)
+
+        self._articulated_system = self._model_loader.model().copy()
 
         self._node_handle.get_logger().info('NUMBER OF JOINTS:\n{}'.format(self._articulated_system.getNrOfJoints()))
 
@@ -110,6 +116,14 @@ class Panda():
 
         self._finger_joint_limits = dict(zip(self._finger_joint_names, self._finger_joint_limits))
 
+        # Reordering of the joint states messages into the joints of the model (see set_joint_states): model joint
+        # indices, and their indices in the message layout (JointState.name) seen last, or in the joint_remapping
+        # table for messages without names
+        self._joint_states_model_idxs = np.array(list(self._joint_states_remapping.keys()), dtype=int)
+        self._joint_states_model_names = [self._articulated_system.getJointName(joint_idx) for joint_idx in self._joint_states_model_idxs]
+        self._joint_states_layout = None
+        self._joint_states_message_idxs = None
+
         # Initial joint targets
         self._initial_joint_position_targets = self._node_handle.get_parameter('initial_joint_angles').value
         self._initial_joint_position_targets = self.move_fingers(self._initial_joint_position_targets, FingersAction.OPEN)
@@ -118,6 +132,17 @@ class Panda():
         self._fk.setFrameVelocityRepresentation(idt.INERTIAL_FIXED_REPRESENTATION)
         self._fk.loadRobotModel(self._articulated_system)
 
+        # FK workspace, reused by every call to solve_fk: frame indices resolved once, a persistent
+        # Jacobian buffer, and the Jacobian columns / joint velocities of the arm (the base columns
+        # are multiplied by zero velocities)
+        self._base_frame_idx = self._fk.getFrameIndex(self.base_frame)
+        self._end_effector_frame_idx = self._fk.getFrameIndex(self.end_effector_frame)
+        if self._base_frame_idx < 0 or self._end_effector_frame_idx < 0:
+            raise ValueError('Unknown frame: {} or {}'.format(self.base_frame, self.end_effector_frame))
+        self._fk_jacobian = idt.MatrixDynSize(6, 6 + self._fk.model().getNrOfDOFs())
+        self._fk_arm_columns = 6 + np.arange(len(self._arm_joint_names))
+        self._fk_arm_joint_idxs = np.array(list(self._arm_joint_names.keys()), dtype=int)
+
         # create containers for the joint position, velocity, effort
         self._joint_states = JointState()
         self._joint_states.position = self._initial_joint_position_targets
@@ -140,64 +165,51 @@ class Panda():
         # Create an object for the fingers state
         self._gripper_state: FingersAction = FingersAction.OPEN
 
-        self._rot = np.array([[-1, 0, 0], [0, -1, 0], [0, 0, 1]])
+        # Rotation by pi about z, from the frame of the targets to the frame of the IK
+        self._rot = PoseBatch(position=np.zeros(3), quaternion=np.array([0., 0., 1., 0.]))
+
+        # Optional reachability map, for rejecting the targets clearly out of reach before running the IK
+        self._node_handle.declare_parameter('reachability_map', '')
+        self._reachability = self._get_reachability_map()
+
+        # LRU cache of the IK solutions, keyed on the targets quantized to the tolerances (see solve_ik). It is
+        # shared with the IK worker thread, hence the lock
+        self._node_handle.declare_parameter('ik_cache_size', 64)
+        self._node_handle.declare_parameter('ik_cache_position_tolerance', 1e-4)
+        self._node_handle.declare_parameter('ik_cache_orientation_tolerance', 1e-4)
+        self._ik_cache_size = self._node_handle.get_parameter('ik_cache_size').value
+        self._ik_cache_position_tolerance = self._node_handle.get_parameter('ik_cache_position_tolerance').value
+        self._ik_cache_orientation_tolerance = self._node_handle.get_parameter('ik_cache_orientation_tolerance').value
+        self._ik_cache = OrderedDict()
+        self._ik_cache_lock = threading.Lock()
+        self.reset_ik_cache_stats()
 
     def solve_fk(self, joint_states: JointState, remap=True) -> Odometry:
-        """ Returns an end effector odometry message """
+        """ Returns an end effector odometry message (the same instance on every call, updated in place) """
 
         self.set_joint_states(joint_states, remap=remap)
 
         # Update the robot state
-        self._fk.setJointPos(numpy.FromNumPy.to_idyntree_dyn_vector(array=np.array(self._joint_states.position)))
+        self._fk.setJointPos(numpy.FromNumPy.to_idyntree_dyn_vector(array=np.asarray(self._joint_states.position, dtype=float)))
 
         # get the end effector pose from the kinematic model
-        end_effector_pose_in_base_frame = self._fk.getRelativeTransform(self.base_frame, self.end_effector_frame)
-        end_effector_position_in_base_frame = end_effector_pose_in_base_frame.getPosition().toNumPy()
-        end_effector_orientation_in_base_frame = end_effector_pose_in_base_frame.getRotation().toNumPy()
-
-        # compose the joint velocity vector for determining the end effector pose using the end effector Jacobian
-        dofs = 6 + self._fk.model().getNrOfDOFs()
-        J = idt.MatrixDynSize(6, dofs)
-        self._fk.getFrameFreeFloatingJacobian(self.end_effector_frame, J)
-        velocities = np.zeros((dofs,))
-        for i, joint_idx in enumerate(self._arm_joint_names.keys()):
-            velocities[i+6] = self._joint_states.velocity[joint_idx]
-
-        end_effector_twist = np.matmul(J.toNumPy(), velocities[:, np.newaxis]).squeeze() # Double-check - is this in the right coordinate system?
-
-        end_effector_pose_msg = PoseWithCovariance()
-        pose = Pose()
-        pose.position.x = end_effector_position_in_base_frame[0]
-        pose.position.y = end_effector_position_in_base_frame[1]
-        pose.position.z = end_effector_position_in_base_frame[2]
-
-        quat = R.from_matrix(end_effector_orientation_in_base_frame).as_quat()
-
-        pose.orientation.x = quat[0]
-        pose.orientation.y = quat[1]
-        pose.orientation.z = quat[2]
-        pose.orientation.w = quat[3]
-
-        end_effector_pose_msg.pose = pose
-
-        self._end_effector_odom.pose = end_effector_pose_msg
-
-        end_effector_twist_msg = TwistWithCovariance()
-        twist = Twist()
-        velocity = Vector3()
-        velocity.x = end_effector_twist[0]
-        velocity.y = end_effector_twist[1]
-        velocity.z = end_effector_twist[2]
-        twist.linear = velocity
-        velocity.x = end_effector_twist[3]
-        velocity.y = end_effector_twist[4]
-        velocity.z = end_effector_twist[5]
-        twist.angular = velocity
-
-        end_effector_twist_msg.twist = twist
-
-        self._end_effector_odom.twist = end_effector_twist_msg
-        
+        end_effector_pose_in_base_frame = self._fk.getRelativeTransform(self._base_frame_idx, self._end_effector_frame_idx)
+        px, py, pz = end_effector_pose_in_base_frame.getPosition().toNumPy().tolist()
+        qx, qy, qz, qw = matrix_to_quaternion(end_effector_pose_in_base_frame.getRotation().toNumPy()).tolist()
+
+        # end effector twist from the arm columns of the Jacobian and the arm joint velocities
+        self._fk.getFrameFreeFloatingJacobian(self._end_effector_frame_idx, self._fk_jacobian)
+        velocities = np.take(np.asarray(self._joint_states.velocity, dtype=float), self._fk_arm_joint_idxs)
+        vx, vy, vz, wx, wy, wz = (self._fk_jacobian.toNumPy()[:, self._fk_arm_columns] @ velocities).tolist() # Double-check - is this in the right coordinate system?
+
+        pose = self._end_effector_odom.pose.pose
+        pose.position.x, pose.position.y, pose.position.z = px, py, pz
+        pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w = qx, qy, qz, qw
+
+        twist = self._end_effector_odom.twist.twist
+        twist.linear.x, twist.linear.y, twist.linear.z = vx, vy, vz
+        twist.angular.x, twist.angular.y, twist.angular.z = wx, wy, wz
+
         self._end_effector_odom.header.stamp = self._node_handle.get_clock().now().to_msg()
 
         return self._end_effector_odom
@@ -239,18 +251,31 @@ class Panda():
                 self.base_orientation.w]),
             joint_configuration=np.array(joint_positions))
 
-    def solve_ik(self, target_pose: Odometry) -> np.ndarray:
+    def solve_ik(self, target_pose: Odometry) -> Optional[np.ndarray]:
+        """ Returns the joint configuration of the end effector target, or None if it is out of reach or the IK failed """
 
-        target_position = np.array([target_pose.pose.pose.position.x, target_pose.pose.pose.position.y, target_pose.pose.pose.position.z])
-        target_position = np.matmul(
-            self._rot, 
-            target_position[:, np.newaxis]).squeeze()
+        target = self._rot.compose(PoseBatch.from_odometry([target_pose]))
+        target_position = target.position[0]
+        quat_xyzw = target.quaternion[0]
 
-        target_orientation = R.from_quat([target_pose.pose.pose.orientation.x, target_pose.pose.pose.orientation.y, target_pose.pose.pose.orientation.z, target_pose.pose.pose.orientation.w]).as_matrix()
-        target_orientation = np.matmul(
-            self._rot, 
-            target_orientation)
-        quat_xyzw = R.from_matrix(target_orientation).as_quat()
+        # Solution of a recent target within the tolerances, which also becomes the warm start of the next solve
+        ik_cache_key = self._get_ik_cache_key(target_position, quat_xyzw)
+        with self._ik_cache_lock:
+            ik_solution = self._ik_cache.get(ik_cache_key)
+            if ik_solution is None:
+                self._ik_cache_misses += 1
+            else:
+                self._ik_cache.move_to_end(ik_cache_key)
+                self._ik_cache_hits += 1
+
+        if ik_solution is not None:
+            self._ik.warm_start_from(reduced_solution=ik_solution)
+            return ik_solution.joint_configuration.copy()
+
+        # The approach axis of the end effector is the x axis of the end_effector_frame
+        if self._reachability is not None and not self._reachability.reachable(target_position, target.rotation_matrices()[0, :, 0]):
+            self._node_handle.get_logger().warn('END EFFECTOR TARGET OUT OF REACH, SKIPPING THE IK:\n{}'.format(target_position))
+            return None
 
         # quat_xyzw = R.from_euler(seq="y", angles=90, degrees=True).as_quat()
 
@@ -261,8 +286,50 @@ class Panda():
 
         # Run the IK
         self._ik.solve()
+        ik_solution = self._ik.get_reduced_solution()
+
+        # On failure, the solution is still the one of the previous target
+        if self._ik.get_failed_to_solve():
+            self._node_handle.get_logger().warn('IK FAILED TO SOLVE THE END EFFECTOR TARGET:\n{}'.format(target_position))
+            return None
+
+        if self._ik_cache_size > 0:
+            with self._ik_cache_lock:
+                self._ik_cache[ik_cache_key] = copy.deepcopy(ik_solution)
+                if len(self._ik_cache) > self._ik_cache_size:
+                    self._ik_cache.popitem(last=False)
+
+        return ik_solution.joint_configuration
+
+    def _get_ik_cache_key(self, position: np.ndarray, quat_xyzw: np.ndarray) -> Tuple[int, ...]:
+
+        # q and -q are the same orientation
+        if quat_xyzw[3] < 0.:
+            quat_xyzw = -quat_xyzw
+
+        return tuple(np.round(position / self._ik_cache_position_tolerance).astype(int).tolist() +
+                     np.round(quat_xyzw / self._ik_cache_orientation_tolerance).astype(int).tolist())
+
+    def invalidate_ik_cache(self) -> None:
+        """ Drop the cached IK solutions, e.g. after a change of the model or of the base pose """
 
-        return self._ik.get_reduced_solution().joint_configuration
+        with self._ik_cache_lock:
+            self._ik_cache.clear()
+
+    def reset_ik_cache_stats(self) -> None:
+
+        self._ik_cache_hits = 0
+        self._ik_cache_misses = 0
+
+    def ik_cache_stats(self) -> dict:
+        """ Returns the number of solve_ik calls answered from the IK cache (hits) or solved (misses), the hit rate, and the number of cached solutions """
+
+        with self._ik_cache_lock:
+            calls = self._ik_cache_hits + self._ik_cache_misses
+            return {'hits': self._ik_cache_hits,
+                    'misses': self._ik_cache_misses,
+                    'hit_rate': self._ik_cache_hits / calls if calls else 0.,
+                    'size': len(self._ik_cache)}
 
     def reset_model(self) -> np.ndarray:
 
@@ -323,13 +390,37 @@ class Panda():
     def set_joint_states(self, joint_states: JointState, remap=True):
 
         if remap:
-            for right, left in zip(list(self._joint_states_remapping.values()), list(self._joint_states_remapping.keys())):
-                self._joint_states.position[left] = joint_states.position[right]
-                self._joint_states.velocity[left] = joint_states.velocity[right]
-                self._joint_states.effort[left] = joint_states.effort[right]
+            # One fancy-index per field, written in place (the sequences of the messages are array.array('d'))
+            message_idxs = self._get_joint_states_message_idxs(joint_states)
+            for field in ('position', 'velocity', 'effort'):
+                values = getattr(joint_states, field)
+                if len(values):
+                    np.asarray(getattr(self._joint_states, field))[self._joint_states_model_idxs] = np.asarray(values, dtype=float)[message_idxs]
         else:
             self._joint_states = copy.deepcopy(joint_states)
 
+    def _get_joint_states_message_idxs(self, joint_states: JointState) -> np.ndarray:
+        # Indices of the joints of the model in the message. They are computed from JointState.name the first time a
+        # layout is seen, and reused as long as the names come in the same order
+
+        if not joint_states.name:
+            if None in self._joint_states_remapping.values():
+                raise ValueError('Joint states without names, and no joint_remapping for all the joints')
+            return np.array(list(self._joint_states_remapping.values()), dtype=int)
+
+        if joint_states.name != self._joint_states_layout:
+            message_idxs = {name: i for i, name in enumerate(joint_states.name)}
+            missing = [name for name in self._joint_states_model_names if name not in message_idxs]
+            if missing:
+                raise ValueError('Joint states without the joints {}'.format(missing))
+
+            self._joint_states_message_idxs = np.array([message_idxs[name] for name in self._joint_states_model_names], dtype=int)
+            self._joint_states_layout = list(joint_states.name)
+
+            self._node_handle.get_logger().info('JOINT STATES LAYOUT:\n{}'.format(self._joint_states_layout))
+
+        return self._joint_states_message_idxs
+
     @property
     def joint_positions(self) -> List[float]:
 
@@ -369,17 +460,25 @@ class Panda():
 
         return model_file
 
+    def _get_reachability_map(self) -> ReachabilityMap:
+
+        reachability_map = self._node_handle.get_parameter('reachability_map').value
+        if not reachability_map:
+            return None
+
+        reachability_map = os.path.join(self._node_handle.get_parameter('share_dir').value, reachability_map)
+        if not os.path.exists(reachability_map):
+            raise FileNotFoundError(reachability_map)
+
+        self._node_handle.get_logger().info('REACHABILITY MAP FILE NAME:\n{}'.format(reachability_map))
+
+        return ReachabilityMap.load(reachability_map)
+
     def _get_model_loader(self, urdf, joint_serialization=[]):
         
-        # If the joint serialization function parameter is not empty, pass it as an argument to the model loader
-        if joint_serialization:
-            ok_load = self._model_loader.loadModelFromFile(urdf, joint_serialization)
-        else:
-            ok_load = self._model_loader.loadModelFromFile(urdf)
+        # The URDF is parsed once per process, and reduced models (non-empty joint serialization) are derived from the parsed one
+        model_loader = model_registry.get_model_loader(urdf, joint_serialization)
 
-        if not ok_load:
-            raise RuntimeError("Failed to load model")
-        else:
-            self._node_handle.get_logger().info('MODEL SUCCESSFULLY LOADED. FILE NAME:\n{}'.format(urdf))
+        self._node_handle.get_logger().info('MODEL SUCCESSFULLY LOADED. FILE NAME:\n{}\nMODEL REGISTRY: {}'.format(urdf, model_registry.get_stats()))
 
-        return self._model_loader
+        return model_loader
@@ -5,3 +5,6 @@
 from . import utils
 from . import idyntree
 from . import conversions
+from . import reachability
+from . import pose_batch
+from . import rotations
@@ -1,7 +1,7 @@
 import abc
 import numpy as np
 from typing import Tuple
-from scipy.spatial.transform import Rotation
+from .rotations import quaternion_to_matrix, matrix_to_quaternion
 
 
 class Transform(abc.ABC):
@@ -80,7 +80,7 @@ class Quaternion(abc.ABC):
 
         xyzw = Quaternion.to_xyzw(quaternion)
 
-        return Rotation.from_quat(xyzw).as_matrix()
+        return quaternion_to_matrix(xyzw)
 
     @staticmethod
     def from_matrix(matrix: np.ndarray) -> np.ndarray:
@@ -88,7 +88,7 @@ class Quaternion(abc.ABC):
         if matrix.shape != (3, 3):
             raise ValueError(matrix)
 
-        quaternion_xyzw = Rotation.from_matrix(matrix).as_quat()
+        quaternion_xyzw = matrix_to_quaternion(matrix)
         quaternion_wxyz = Quaternion.to_wxyz(quaternion_xyzw)
 
         return quaternion_wxyz
@@ -8,5 +8,6 @@ sys.path.append(os.path.join(os.getenv('COLCON_PREFIX_PATH'), 'lib', 'python3','
 
 from . import numpy
 from . import helpers
+from . import model_registry
 from . import kindyncomputations
 from . import inverse_kinematics_nlp
@@ -8,6 +8,7 @@ from typing import List
 from enum import Enum, auto
 import idyntree.bindings as idt
 from os.path import exists, isfile
+from . import model_registry
 
 def find_resource(file_name: str) -> str:
     file_abs_path = ""
@@ -58,19 +59,8 @@ class iDynTreeHelpers(abc.ABC):
         if extension == ".sdf":
             raise RuntimeError("SDF models are not currently supported by iDynTree")
 
-        # Create the model loader
-        mdl_loader = idt.ModelLoader()
-
-        # Load the urdf model
-        if considered_joints is None:
-            ok_load = mdl_loader.loadModelFromFile(urdf_file)
-        else:
-            ok_load = mdl_loader.loadReducedModelFromFile(urdf_file, considered_joints)
-
-        if not ok_load:
-            raise RuntimeError(f"Failed to load model from file '{urdf_file}'")
-
-        return mdl_loader
+        # Get the (shared) model loader of the urdf model
+        return model_registry.get_model_loader(urdf_file, considered_joints)
 
     @staticmethod
     def get_kindyncomputations(
@@ -2,7 +2,6 @@
 # This software may be modified and distributed under the terms of the
 # GNU Lesser General Public License v2.1 or any later version.
 
-import os
 import numpy as np
 from enum import Enum, auto
 from ... import rbd
@@ -102,6 +101,7 @@ class InverseKinematicsNLP:
         self._prev_ik_soln: IKSolution = IKSolution(base_position=np.array([0.0, 0.0, 0.0]),
                           base_quaternion=np.array([1.0, 0.0, 0.0, 0.0]),
                           joint_configuration=np.zeros((len(joint_serialization),)))
+        self._failed_to_solve_ik: bool = False
 
     # ======================
     # INITIALIZATION METHODS
@@ -509,6 +509,10 @@ class InverseKinematicsNLP:
 
         return self._base_frame
 
+    def get_failed_to_solve(self) -> bool:
+
+        return self._failed_to_solve_ik
+
     def get_available_target_names(self) -> List[str]:
 
         # Get the reduced model
@@ -586,24 +590,11 @@ class InverseKinematicsNLP:
                           joint_serialization: List[str] = None) \
             -> idt.ModelLoader:
 
-        # Get the model loader
-        model_loader = idt.ModelLoader()
-
-        if not os.path.exists(urdf):
-            raise FileNotFoundError(urdf)
-
-        # Load the model
-        if joint_serialization:
-            ok_load = model_loader.loadReducedModelFromFile(urdf, joint_serialization)
-        else:
-            ok_load = model_loader.loadModelFromFile(urdf)
-
-        if not ok_load:
-            raise RuntimeError("Failed to load model")
-
+        # Get the model loader, shared through the model registry (the reduced model is
+        # derived from the full model, which is parsed only once per process).
         # Due to some SWIG internal, returning the model contained by the loader
         # does not work as expected
-        return model_loader
+        return rbd.idyntree.model_registry.get_model_loader(urdf, joint_serialization)
 
     def _warm_start_with_last_solution(self) -> None:
 
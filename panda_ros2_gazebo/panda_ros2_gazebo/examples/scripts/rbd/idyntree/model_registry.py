@@ -0,0 +1,87 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import os
+import threading
+import idyntree.bindings as idt
+from typing import Dict, List, Tuple
+
+# Process-wide registry of the parsed models, keyed on the URDF file (path and modification time) and the joint
+# serialization. A URDF is parsed once, and its reduced models are derived from the parsed full model. The
+# loaders are stored rather than their models: due to some SWIG internal, a model must not outlive its loader.
+_model_loaders: Dict[Tuple[str, int, Tuple[str, ...]], idt.ModelLoader] = {}
+_lock = threading.RLock()
+_stats = {'parsed': 0, 'reduced': 0, 'hits': 0}
+
+
+def get_model_loader(urdf: str, joint_serialization: List[str] = None) -> idt.ModelLoader:
+    """
+    Get the loader of a model, parsing the URDF only the first time it is requested.
+
+    Args:
+        urdf: The path of the URDF file.
+        joint_serialization: The joints of a reduced model, in the order of its DOFs (the other joints are
+            fixed and their child links lumped). If None or empty, the full model.
+
+    Returns:
+        The model loader, shared with the other callers requesting the same model. The objects that keep
+        a model (KinDynComputations, InverseKinematics) copy it, so it should only be read.
+    """
+
+    if not os.path.exists(urdf):
+        raise FileNotFoundError(urdf)
+
+    path = os.path.realpath(urdf)
+    key = (path, os.stat(path).st_mtime_ns, tuple(joint_serialization or ()))
+
+    with _lock:
+        model_loader = _model_loaders.get(key)
+
+        if model_loader is not None:
+            _stats['hits'] += 1
+            return model_loader
+
+        # Drop the models of older versions of the file
+        for stale_key in [k for k in _model_loaders if k[0] == path and k[1] != key[1]]:
+            del _model_loaders[stale_key]
+
+        model_loader = idt.ModelLoader()
+
+        if joint_serialization:
+            ok_load = model_loader.loadReducedModelFromFullModel(get_model_loader(path).model(), list(joint_serialization))
+            _stats['reduced'] += 1
+        else:
+            ok_load = model_loader.loadModelFromFile(path)
+            _stats['parsed'] += 1
+
+        if not ok_load:
+            raise RuntimeError("Failed to load model")
+
+        _model_loaders[key] = model_loader
+
+        return model_loader
+
+
+def get_model(urdf: str, joint_serialization: List[str] = None) -> idt.Model:
+    """
+    Get a shared model (see get_model_loader).
+    """
+
+    return get_model_loader(urdf, joint_serialization).model()
+
+
+def clear() -> None:
+
+    with _lock:
+        _model_loaders.clear()
+
+
+def get_stats() -> dict:
+    """
+    Returns the number of URDF files parsed, of reduced models derived from parsed ones, and of requests
+    answered from the registry (hits).
+    """
+
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,207 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import numpy as np
+from typing import TYPE_CHECKING, List, Tuple, Union
+from .rotations import quaternion_multiply, quaternion_rotate, quaternion_to_matrix, matrix_to_quaternion
+
+if TYPE_CHECKING:
+    # Only for the annotations: the batches are used without ROS as well
+    import geometry_msgs.msg
+    import nav_msgs.msg
+
+
+class PoseBatch:
+    """
+    Structure of arrays of N poses: positions (N, 3) and unit xyzw quaternions (N, 4),
+    each stored in its own contiguous float64 array.
+
+    Indexing with an integer or a slice returns a PoseBatch of views (no copy), so that
+    code working on whole batches can also work on parts of them in place.
+    """
+
+    __slots__ = ('position', 'quaternion')
+
+    def __init__(self, position: np.ndarray, quaternion: np.ndarray, copy: bool = False):
+        """
+        Args:
+            position: The (N, 3) or (3,) positions.
+            quaternion: The (N, 4) or (4,) xyzw quaternions.
+            copy: If False, arrays that are already contiguous float64 are used
+                without copy.
+        """
+
+        position = np.array(position, dtype=float, copy=copy or None, ndmin=2)
+        quaternion = np.array(quaternion, dtype=float, copy=copy or None, ndmin=2)
+
+        if position.shape[-1] != 3 or quaternion.shape[-1] != 4 or len(position) != len(quaternion):
+            raise ValueError((position.shape, quaternion.shape))
+
+        self.position = np.ascontiguousarray(position)
+        self.quaternion = np.ascontiguousarray(quaternion)
+
+    @classmethod
+    def identity(cls, n: int = 1) -> "PoseBatch":
+
+        quaternion = np.zeros((n, 4))
+        quaternion[:, 3] = 1.
+
+        return cls(np.zeros((n, 3)), quaternion)
+
+    @classmethod
+    def from_matrices(cls, transforms: np.ndarray) -> "PoseBatch":
+        """
+        Create a batch from homogeneous transforms.
+
+        Args:
+            transforms: The (N, 4, 4) or (4, 4) transforms.
+
+        Returns:
+            The batch of the N poses.
+        """
+
+        transforms = np.asarray(transforms, dtype=float).reshape(-1, 4, 4)
+
+        return cls(transforms[:, :3, 3], matrix_to_quaternion(transforms[:, :3, :3]))
+
+    @classmethod
+    def from_poses(cls, poses: List["geometry_msgs.msg.Pose"]) -> "PoseBatch":
+        """
+        Create a batch from a list of geometry_msgs/Pose messages.
+        """
+
+        data = np.array([(p.position.x, p.position.y, p.position.z,
+                          p.orientation.x, p.orientation.y, p.orientation.z, p.orientation.w) for p in poses],
+                        dtype=float).reshape(-1, 7)
+
+        return cls(data[:, :3], data[:, 3:])
+
+    @classmethod
+    def from_odometry(cls, odometry: List["nav_msgs.msg.Odometry"]) -> "PoseBatch":
+        """
+        Create a batch from the poses of a list of nav_msgs/Odometry messages.
+        """
+
+        return cls.from_poses([odom.pose.pose for odom in odometry])
+
+    def to_poses(self, poses: List["geometry_msgs.msg.Pose"] = None) -> List["geometry_msgs.msg.Pose"]:
+        """
+        Write the batch to geometry_msgs/Pose messages.
+
+        Args:
+            poses: The N messages to fill in. If None, new messages are created.
+
+        Returns:
+            The list of the N messages.
+        """
+
+        if poses is None:
+            from geometry_msgs.msg import Pose
+            poses = [Pose() for _ in range(len(self))]
+
+        if len(poses) != len(self):
+            raise ValueError("Expected {} messages, got {}".format(len(self), len(poses)))
+
+        for pose, (px, py, pz), (qx, qy, qz, qw) in zip(poses, self.position.tolist(), self.quaternion.tolist()):
+            pose.position.x, pose.position.y, pose.position.z = px, py, pz
+            pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w = qx, qy, qz, qw
+
+        return poses
+
+    def to_odometry(self, odometry: List["nav_msgs.msg.Odometry"]) -> List["nav_msgs.msg.Odometry"]:
+        """
+        Write the batch to the poses of existing nav_msgs/Odometry messages.
+        """
+
+        self.to_poses([odom.pose.pose for odom in odometry])
+
+        return odometry
+
+    def __len__(self) -> int:
+
+        return len(self.position)
+
+    def __getitem__(self, index: Union[int, slice]) -> "PoseBatch":
+
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1 if index != -1 else None)
+
+        return PoseBatch(self.position[index], self.quaternion[index])
+
+    def __repr__(self) -> str:
+
+        return 'PoseBatch(position={}, quaternion={})'.format(self.position, self.quaternion)
+
+    def copy(self) -> "PoseBatch":
+
+        return PoseBatch(self.position, self.quaternion, copy=True)
+
+    def as_matrices(self) -> np.ndarray:
+        """
+        Returns:
+            The (N, 4, 4) homogeneous transforms of the poses.
+        """
+
+        T = np.zeros((len(self), 4, 4))
+        T[:, :3, :3] = quaternion_to_matrix(self.quaternion)
+        T[:, :3, 3] = self.position
+        T[:, 3, 3] = 1.
+
+        return T
+
+    def rotation_matrices(self) -> np.ndarray:
+
+        return quaternion_to_matrix(self.quaternion)
+
+    def compose(self, other: "PoseBatch") -> "PoseBatch":
+        """
+        Compose the poses with other (self * other), broadcasting batches of one pose.
+        """
+
+        return PoseBatch(self.position + quaternion_rotate(self.quaternion, other.position),
+                         quaternion_multiply(self.quaternion, other.quaternion))
+
+    def inverse(self) -> "PoseBatch":
+
+        conjugate = self.quaternion * np.array([-1., -1., -1., 1.])
+
+        return PoseBatch(-quaternion_rotate(conjugate, self.position), conjugate)
+
+    def error(self, target: "PoseBatch") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Displacement from the poses to target, broadcasting batches of one pose.
+
+        Args:
+            target: The target poses.
+
+        Returns:
+            A tuple with the (N, 3) translation vectors and the (N, 3) rotation vectors
+            (axis times angle, in [0, pi]) taking the orientations to the target ones,
+            both expressed in the world frame.
+        """
+
+        translation = target.position - self.position
+
+        # Relative rotation target * self^-1, on the hemisphere w >= 0 (shortest rotation)
+        delta = quaternion_multiply(target.quaternion, self.quaternion * np.array([-1., -1., -1., 1.]))
+        delta = np.where(delta[..., 3:] < 0., -delta, delta)
+        sin_half = np.linalg.norm(delta[..., :3], axis=-1, keepdims=True)
+        angle = 2. * np.arctan2(sin_half, delta[..., 3:])
+
+        # angle / sin(angle / 2) tends to 2 for small rotations
+        scale = np.full_like(angle, 2.)
+        regular = sin_half > 1e-12
+        scale[regular] = angle[regular] / sin_half[regular]
+
+        return translation, scale * delta[..., :3]
+
+    def error_norms(self, target: "PoseBatch") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            A tuple with the (N,) position [m] and rotation [rad] errors to target.
+        """
+
+        translation, rotation = self.error(target)
+
+        return np.linalg.norm(translation, axis=-1), np.linalg.norm(rotation, axis=-1)
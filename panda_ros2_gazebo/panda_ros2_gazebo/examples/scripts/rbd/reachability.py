@@ -0,0 +1,71 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import numpy as np
+
+
+class ReachabilityMap:
+    """
+    Query-only reader of the reachability maps written by solution/reachability.py.
+
+    The map is a voxel grid of the end effector positions reached by the arm (in the
+    frame of the DH model), with, for each voxel, a 64-bit mask of the approach
+    directions reached there. Queries are made against the grid dilated by the safety
+    margins the map was built with (see solution/reachability.py), so that only targets
+    clearly out of reach are rejected.
+    """
+
+    def __init__(self,
+                 lower: np.ndarray,
+                 voxel_size: float,
+                 dilated: np.ndarray,
+                 directions: np.ndarray):
+
+        self._lower = np.asarray(lower, dtype=float)
+        self._voxel_size = float(voxel_size)
+        self._masks = np.asarray(dilated, dtype=np.uint64)
+        self._directions = np.asarray(directions, dtype=float)
+        self._shape = np.array(self._masks.shape)
+
+    @classmethod
+    def load(cls, path: str) -> "ReachabilityMap":
+        """
+        Load a map from a .npz file.
+
+        Args:
+            path: The file written by solution/reachability.py.
+
+        Returns:
+            The reachability map.
+        """
+
+        with np.load(path) as data:
+            if 'dilated' not in data:
+                raise ValueError('{} has no dilated grid, rebuild it with python -m solution.reachability'.format(path))
+
+            return cls(lower=data['lower'],
+                       voxel_size=data['voxel_size'],
+                       dilated=data['dilated'],
+                       directions=data['directions'])
+
+    def reachable(self, position: np.ndarray, approach_direction: np.ndarray) -> bool:
+        """
+        Check whether an end effector target may be reachable.
+
+        Args:
+            position: The 3D position of the end effector, in the frame of the DH model.
+            approach_direction: The unit approach axis of the end effector, in the same frame.
+
+        Returns:
+            False if the target is clearly out of reach, True otherwise.
+        """
+
+        index = np.floor((np.asarray(position, dtype=float) - self._lower) / self._voxel_size).astype(int)
+
+        if np.any(index < 0) or np.any(index >= self._shape):
+            return False
+
+        b = int(np.argmax(self._directions @ np.asarray(approach_direction, dtype=float)))
+
+        return bool((int(self._masks[index[0], index[1], index[2]]) >> b) & 1)
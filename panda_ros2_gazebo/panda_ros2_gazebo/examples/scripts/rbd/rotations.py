@@ -0,0 +1,235 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import math
+import functools
+import numpy as np
+from typing import Sequence, Union
+
+# Index of the axes of the Euler sequences in the quaternions
+_AXES = {'x': 0, 'y': 1, 'z': 2}
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Hamilton product of (broadcast) arrays of xyzw quaternions.
+
+    Args:
+        a: The (..., 4) left quaternions.
+        b: The (..., 4) right quaternions.
+
+    Returns:
+        The (..., 4) quaternions of the rotations a * b.
+    """
+
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+
+    return np.stack((aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz), axis=-1)
+
+
+def quaternion_rotate(quaternion: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """
+    Rotate (broadcast) arrays of 3D vectors by unit xyzw quaternions.
+
+    Args:
+        quaternion: The (..., 4) unit quaternions.
+        vector: The (..., 3) vectors.
+
+    Returns:
+        The (..., 3) rotated vectors.
+    """
+
+    u, w = quaternion[..., :3], quaternion[..., 3:]
+    t = 2. * np.cross(u, vector)
+
+    return vector + w * t + np.cross(u, t)
+
+
+def quaternion_to_matrix(quaternion: np.ndarray) -> np.ndarray:
+    """
+    Convert an array of unit xyzw quaternions to rotation matrices.
+
+    Args:
+        quaternion: The (..., 4) unit quaternions.
+
+    Returns:
+        The (..., 3, 3) rotation matrices.
+    """
+
+    if np.ndim(quaternion) == 1:
+        # Single quaternion: plain floats are much cheaper than the array expressions
+        x, y, z, w = np.asarray(quaternion, dtype=float).tolist()
+        return np.array([[1. - 2. * (y * y + z * z), 2. * (x * y - z * w), 2. * (x * z + y * w)],
+                         [2. * (x * y + z * w), 1. - 2. * (x * x + z * z), 2. * (y * z - x * w)],
+                         [2. * (x * z - y * w), 2. * (y * z + x * w), 1. - 2. * (x * x + y * y)]])
+
+    x, y, z, w = np.moveaxis(quaternion, -1, 0)
+    R = np.empty(np.shape(quaternion)[:-1] + (3, 3))
+    R[..., 0, 0] = 1. - 2. * (y * y + z * z)
+    R[..., 0, 1] = 2. * (x * y - z * w)
+    R[..., 0, 2] = 2. * (x * z + y * w)
+    R[..., 1, 0] = 2. * (x * y + z * w)
+    R[..., 1, 1] = 1. - 2. * (x * x + z * z)
+    R[..., 1, 2] = 2. * (y * z - x * w)
+    R[..., 2, 0] = 2. * (x * z - y * w)
+    R[..., 2, 1] = 2. * (y * z + x * w)
+    R[..., 2, 2] = 1. - 2. * (x * x + y * y)
+
+    return R
+
+
+def matrix_to_quaternion(matrix: np.ndarray) -> np.ndarray:
+    """
+    Convert an array of rotation matrices to unit xyzw quaternions (with w >= 0).
+
+    Args:
+        matrix: The (..., 3, 3) rotation matrices.
+
+    Returns:
+        The (..., 4) unit quaternions.
+
+    Note:
+        Each quaternion is computed from the largest of its components (Shepperd's
+        method), which keeps the conversion accurate for all rotations.
+    """
+
+    m = np.asarray(matrix, dtype=float)
+    if m.ndim == 2:
+        return _matrix_to_quaternion(m.tolist())
+
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+
+    # Four times the square of each component, the largest one is used as pivot
+    squares = np.stack((1. + m00 - m11 - m22,
+                        1. - m00 + m11 - m22,
+                        1. - m00 - m11 + m22,
+                        1. + m00 + m11 + m22), axis=-1)
+    pivot = np.argmax(squares, axis=-1)
+
+    # Components times 4 times the pivot component, for each choice of pivot
+    candidates = np.stack((
+        np.stack((squares[..., 0], m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] - m[..., 1, 2]), axis=-1),
+        np.stack((m[..., 0, 1] + m[..., 1, 0], squares[..., 1], m[..., 1, 2] + m[..., 2, 1], m[..., 0, 2] - m[..., 2, 0]), axis=-1),
+        np.stack((m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1], squares[..., 2], m[..., 1, 0] - m[..., 0, 1]), axis=-1),
+        np.stack((m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1], squares[..., 3]), axis=-1)),
+        axis=-2)
+    quaternion = np.take_along_axis(candidates, pivot[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    quaternion /= np.linalg.norm(quaternion, axis=-1, keepdims=True)
+
+    return np.where(quaternion[..., 3:] < 0., -quaternion, quaternion)
+
+
+def euler_to_quaternion(seq: str, angles: Union[float, Sequence[float], np.ndarray], degrees: bool = False) -> np.ndarray:
+    """
+    Convert Euler angles to unit xyzw quaternions, with the conventions of scipy's
+    Rotation.from_euler.
+
+    Args:
+        seq: Up to 3 axes, lowercase for extrinsic rotations (about the fixed axes),
+            uppercase for intrinsic rotations (about the rotating axes), e.g. 'xyz', 'y'.
+        angles: The angles, a scalar or a (..., len(seq)) array (a (...) array for a
+            single axis).
+        degrees: True if the angles are in degrees.
+
+    Returns:
+        The (..., 4) unit quaternions (with w >= 0).
+    """
+
+    if not 1 <= len(seq) <= 3 or not (seq.islower() or seq.isupper()):
+        raise ValueError(seq)
+
+    if np.ndim(angles) <= 1 and np.size(angles) == len(seq):
+        return _euler_to_quaternion(seq, np.ravel(angles).tolist(), degrees)
+
+    angles = np.asarray(angles, dtype=float)
+    if len(seq) == 1 and (angles.ndim == 0 or angles.shape[-1] != 1):
+        angles = angles[..., np.newaxis]
+    if angles.shape[-1] != len(seq):
+        raise ValueError("Expected {} angles, got {}".format(len(seq), angles.shape[-1]))
+    if degrees:
+        angles = np.deg2rad(angles)
+
+    half = 0.5 * angles
+    quaternion = None
+    for i, axis in enumerate(seq.lower()):
+        elementary = np.zeros(angles.shape[:-1] + (4,))
+        elementary[..., _AXES[axis]] = np.sin(half[..., i])
+        elementary[..., 3] = np.cos(half[..., i])
+        if quaternion is None:
+            quaternion = elementary
+        elif seq.islower():
+            # Extrinsic: each rotation is applied after the previous ones
+            quaternion = quaternion_multiply(elementary, quaternion)
+        else:
+            quaternion = quaternion_multiply(quaternion, elementary)
+
+    return np.where(quaternion[..., 3:] < 0., -quaternion, quaternion)
+
+
+def _multiply(a, b):
+    # Hamilton product of two xyzw quaternions given as sequences of floats
+    ax, ay, az, aw = a
+    bx, by, bz, bw = b
+
+    return (aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+            aw * bw - ax * bx - ay * by - az * bz)
+
+
+def _matrix_to_quaternion(m):
+    # Scalar version of matrix_to_quaternion, m is a nested list
+    (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = m
+    squares = (1. + m00 - m11 - m22, 1. - m00 + m11 - m22, 1. - m00 - m11 + m22, 1. + m00 + m11 + m22)
+    pivot = squares.index(max(squares))
+    if pivot == 0:
+        q = (squares[0], m01 + m10, m02 + m20, m21 - m12)
+    elif pivot == 1:
+        q = (m01 + m10, squares[1], m12 + m21, m02 - m20)
+    elif pivot == 2:
+        q = (m02 + m20, m12 + m21, squares[2], m10 - m01)
+    else:
+        q = (m21 - m12, m02 - m20, m10 - m01, squares[3])
+    scale = math.copysign(1. / math.sqrt(q[0]**2 + q[1]**2 + q[2]**2 + q[3]**2), q[3])
+
+    return np.array(q) * scale
+
+
+def _euler_to_quaternion(seq, angles, degrees):
+    # Scalar version of euler_to_quaternion, angles is a list of floats
+    quaternion = None
+    for axis, angle in zip(seq.lower(), angles):
+        half = 0.5 * (math.radians(angle) if degrees else angle)
+        elementary = [0., 0., 0., math.cos(half)]
+        elementary[_AXES[axis]] = math.sin(half)
+        if quaternion is None:
+            quaternion = elementary
+        elif seq.islower():
+            quaternion = _multiply(elementary, quaternion)
+        else:
+            quaternion = _multiply(quaternion, elementary)
+
+    return np.array(quaternion) * math.copysign(1., quaternion[3])
+
+
+@functools.lru_cache(maxsize=64)
+def _constant_quaternion(seq: str, angles: tuple, degrees: bool) -> np.ndarray:
+
+    quaternion = euler_to_quaternion(seq, angles, degrees)
+    quaternion.flags.writeable = False
+
+    return quaternion
+
+
+def constant_quaternion(seq: str, angles: Union[float, Sequence[float]], degrees: bool = False) -> np.ndarray:
+    """
+    Cached euler_to_quaternion for constant orientations (e.g. the grasp orientation
+    set on every control tick). The returned array is shared, and read-only.
+    """
+
+    return _constant_quaternion(seq, tuple(np.atleast_1d(angles).tolist()), degrees)
@@ -0,0 +1,201 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import os
+import time
+import threading
+import numpy as np
+import pytest
+
+# The examples package loads iDynTree from the colcon workspace on import
+if 'COLCON_PREFIX_PATH' not in os.environ:
+    pytest.skip("requires a sourced colcon workspace", allow_module_level=True)
+
+rclpy = pytest.importorskip('rclpy')
+pytest.importorskip('idyntree.bindings')
+
+from rclpy.node import Node
+from nav_msgs.msg import Odometry
+
+from panda_ros2_gazebo.examples.scripts.models.ik_worker import IKWorker
+
+
+class FakePanda():
+    """
+    Stands in for Panda in the worker: the solution of a target is [x, y, z] of its position, None for targets
+    with x < 0, and targets with x > 100 raise. Each solve waits for release.
+    """
+
+    def __init__(self):
+
+        self.targets = []
+        self.started = threading.Semaphore(0)
+        self.release = threading.Semaphore(0)
+
+    def solve_ik(self, target_pose: Odometry):
+
+        self.targets.append(target_pose)
+        self.started.release()
+        assert self.release.acquire(timeout=5.)
+
+        position = target_pose.pose.pose.position
+        if position.x > 100.:
+            raise RuntimeError('solver error')
+
+        return None if position.x < 0. else [position.x, position.y, position.z]
+
+
+def target(x: float) -> Odometry:
+
+    odom = Odometry()
+    odom.pose.pose.position.x = x
+
+    return odom
+
+
+def wait_for(worker: IKWorker, sequence: int):
+
+    deadline = time.perf_counter() + 5.
+    while worker.latest()[1] < sequence:
+        assert time.perf_counter() < deadline
+        time.sleep(1e-3)
+
+    return worker.latest()
+
+
+@pytest.fixture(scope='module')
+def context():
+
+    rclpy.init()
+
+    yield
+
+    rclpy.shutdown()
+
+
+@pytest.fixture
+def node(context):
+
+    # A node per worker, which declares its parameters
+    node = Node('ik_worker_test')
+
+    yield node
+
+    node.destroy_node()
+
+
+@pytest.fixture
+def panda():
+
+    return FakePanda()
+
+
+@pytest.fixture
+def worker(node, panda):
+
+    worker = IKWorker(node, panda, initial_solution=[0., 0., 0.])
+
+    yield worker
+
+    # Let a solve in progress finish
+    panda.release.release()
+    worker.stop()
+
+
+def test_initial_solution(worker: IKWorker):
+
+    solution, sequence, success = worker.latest()
+    np.testing.assert_array_equal(solution, [0., 0., 0.])
+    assert sequence == 0 and success
+
+
+def test_solution_of_a_target(worker: IKWorker, panda: FakePanda):
+
+    sequence = worker.post(target(1.))
+    assert sequence == 1
+    panda.release.release()
+
+    solution, sequence, success = wait_for(worker, 1)
+    np.testing.assert_array_equal(solution, [1., 0., 0.])
+    assert sequence == 1 and success
+
+    # A copy
+    solution[0] = 2.
+    assert worker.latest()[0][0] == 1.
+
+
+def test_targets_are_copied(worker: IKWorker, panda: FakePanda):
+
+    odom = target(1.)
+    worker.post(odom)
+    odom.pose.pose.position.x = 2.
+    panda.release.release()
+
+    np.testing.assert_array_equal(wait_for(worker, 1)[0], [1., 0., 0.])
+
+
+def test_latest_target_wins(worker: IKWorker, panda: FakePanda):
+
+    # The worker is busy with the first target while the next ones are posted
+    worker.post(target(1.))
+    assert panda.started.acquire(timeout=5.)
+    for x in (2., 3., 4.):
+        worker.post(target(x))
+    panda.release.release()
+    panda.release.release()
+
+    solution, sequence, success = wait_for(worker, 4)
+    np.testing.assert_array_equal(solution, [4., 0., 0.])
+    assert sequence == 4 and success
+    assert [odom.pose.pose.position.x for odom in panda.targets] == [1., 4.]
+
+    solved, failed, coalesced = worker._stats.data[:3]
+    assert (solved, failed, coalesced) == (2., 0., 2.)
+
+
+def test_failed_solve(worker: IKWorker, panda: FakePanda):
+
+    worker.post(target(-1.))
+    panda.release.release()
+
+    solution, sequence, success = wait_for(worker, 1)
+    assert solution is None and sequence == 1 and not success
+    assert list(worker._stats.data[:2]) == [0., 1.]
+
+
+def test_solver_exception(worker: IKWorker, panda: FakePanda):
+
+    worker.post(target(1000.))
+    panda.release.release()
+
+    solution, sequence, success = wait_for(worker, 1)
+    assert solution is None and not success
+
+    # The worker carries on with the next targets
+    worker.post(target(1.))
+    panda.release.release()
+    solution, sequence, success = wait_for(worker, 2)
+    np.testing.assert_array_equal(solution, [1., 0., 0.])
+    assert success
+
+
+def test_statistics(worker: IKWorker, panda: FakePanda):
+
+    for sequence in range(1, 4):
+        worker.post(target(float(sequence)))
+        panda.release.release()
+        wait_for(worker, sequence)
+
+    stats = dict(zip(IKWorker.STATS_LABELS, worker._stats.data))
+    assert (stats['solved'], stats['failed'], stats['coalesced']) == (3., 0., 0.)
+    assert 0. <= stats['solve_time'] <= stats['latency'] <= stats['max_latency']
+    assert stats['mean_latency'] <= stats['max_latency']
+
+
+def test_stop(node, panda: FakePanda):
+
+    worker = IKWorker(node, panda)
+    assert worker.latest() == (None, 0, True)
+    worker.stop()
+    assert not worker._thread.is_alive()
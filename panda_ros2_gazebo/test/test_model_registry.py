@@ -0,0 +1,104 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import os
+import shutil
+import pytest
+
+# The examples package loads iDynTree from the colcon workspace on import
+if 'COLCON_PREFIX_PATH' not in os.environ:
+    pytest.skip("requires a sourced colcon workspace", allow_module_level=True)
+
+pytest.importorskip('idyntree.bindings')
+
+from panda_ros2_gazebo.examples.scripts.rbd.idyntree import model_registry
+
+URDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    'description', 'models', 'panda', 'panda.urdf')
+ARM_JOINTS = ['panda_joint{}'.format(i) for i in range(1, 8)]
+
+
+@pytest.fixture
+def urdf(tmp_path):
+    # A copy of the URDF, whose modification time the tests can change
+
+    model_registry.clear()
+    path = str(tmp_path / 'panda.urdf')
+    shutil.copyfile(URDF, path)
+
+    yield path
+
+    model_registry.clear()
+
+
+def stats_since(before: dict) -> dict:
+
+    return {name: value - before[name] for name, value in model_registry.get_stats().items()}
+
+
+def test_urdf_is_parsed_once(urdf: str):
+
+    before = model_registry.get_stats()
+    model_loader = model_registry.get_model_loader(urdf)
+
+    assert model_registry.get_model_loader(urdf) is model_loader
+    # Same file through another path
+    assert model_registry.get_model_loader(os.path.join(os.path.dirname(urdf), '.', 'panda.urdf')) is model_loader
+    assert stats_since(before) == {'parsed': 1, 'reduced': 0, 'hits': 2}
+
+
+def test_reduced_models_are_derived_from_the_parsed_one(urdf: str):
+
+    before = model_registry.get_stats()
+    full = model_registry.get_model(urdf)
+    reduced = model_registry.get_model(urdf, ARM_JOINTS)
+    model_registry.get_model(urdf, ARM_JOINTS)
+
+    assert reduced.getNrOfDOFs() == len(ARM_JOINTS) < full.getNrOfDOFs()
+    assert [reduced.getJointName(i) for i in range(reduced.getNrOfJoints())][:len(ARM_JOINTS)] == ARM_JOINTS
+    # The full model is requested again for the reduction, from the registry
+    assert stats_since(before) == {'parsed': 1, 'reduced': 1, 'hits': 2}
+
+    # Another serialization is another model
+    assert model_registry.get_model(urdf, ARM_JOINTS[::-1]).getJointName(0) == ARM_JOINTS[-1]
+
+
+def test_modified_urdf_is_parsed_again(urdf: str):
+
+    model_loader = model_registry.get_model_loader(urdf)
+    model_registry.get_model_loader(urdf, ARM_JOINTS)
+
+    stat = os.stat(urdf)
+    os.utime(urdf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    before = model_registry.get_stats()
+    assert model_registry.get_model_loader(urdf) is not model_loader
+    assert stats_since(before)['parsed'] == 1
+    # The models of the older version are dropped
+    assert all(key[1] == os.stat(urdf).st_mtime_ns for key in model_registry._model_loaders)
+
+
+def test_clear(urdf: str):
+
+    model_loader = model_registry.get_model_loader(urdf)
+    model_registry.clear()
+
+    before = model_registry.get_stats()
+    assert model_registry.get_model_loader(urdf) is not model_loader
+    assert stats_since(before)['parsed'] == 1
+
+
+def test_missing_urdf(tmp_path):
+
+    with pytest.raises(FileNotFoundError):
+        model_registry.get_model_loader(str(tmp_path / 'missing.urdf'))
+
+
+def test_invalid_urdf(tmp_path):
+
+    path = tmp_path / 'invalid.urdf'
+    path.write_text('<robot name="invalid">')
+
+    with pytest.raises(RuntimeError):
+        model_registry.get_model_loader(str(path))
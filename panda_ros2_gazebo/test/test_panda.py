@@ -0,0 +1,287 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import os
+import copy
+import numpy as np
+import pytest
+
+# The examples package loads iDynTree from the colcon workspace on import
+if 'COLCON_PREFIX_PATH' not in os.environ:
+    pytest.skip("requires a sourced colcon workspace", allow_module_level=True)
+
+rclpy = pytest.importorskip('rclpy')
+pytest.importorskip('idyntree.bindings')
+
+from rclpy.node import Node
+from nav_msgs.msg import Odometry
+from sensor_msgs.msg import JointState
+
+from panda_ros2_gazebo.examples.benchmark_solve_fk import get_parameter_overrides, solve_fk_reference
+from panda_ros2_gazebo.examples.scripts.models.panda import Panda
+
+# Source tree of the package, with the same config and description directories as the installed share
+SHARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def panda():
+
+    rclpy.init()
+    node = Node('panda', parameter_overrides=get_parameter_overrides(SHARE_DIR))
+    node.declare_parameters(
+        namespace='',
+        parameters=[
+            ('model_file', None),
+            ('base_frame', None),
+            ('end_effector_frame', None),
+            ('arm_joint_tag', None),
+            ('finger_joint_tag', None),
+            ('initial_joint_angles', None),
+            ('share_dir', None)
+        ]
+    )
+
+    yield Panda(node)
+
+    node.destroy_node()
+    rclpy.shutdown()
+
+
+def random_joint_states(panda: Panda, seed: int = 0) -> JointState:
+
+    rng = np.random.default_rng(seed)
+    joint_states = JointState()
+    joint_states.position = rng.uniform(-1., 1., panda.num_joints).tolist()
+    joint_states.velocity = rng.uniform(-1., 1., panda.num_joints).tolist()
+    joint_states.effort = [0.] * panda.num_joints
+
+    return joint_states
+
+
+def test_solve_fk_matches_reference(panda: Panda):
+
+    for seed in range(20):
+        joint_states = random_joint_states(panda, seed)
+        reference = solve_fk_reference(panda, joint_states)
+        odom = panda.solve_fk(joint_states)
+
+        for a, b in ((reference.pose.pose.position, odom.pose.pose.position),
+                     (reference.twist.twist.linear, odom.twist.twist.linear),
+                     (reference.twist.twist.angular, odom.twist.twist.angular)):
+            np.testing.assert_allclose([b.x, b.y, b.z], [a.x, a.y, a.z], atol=1e-12)
+
+        a, b = reference.pose.pose.orientation, odom.pose.pose.orientation
+        np.testing.assert_allclose([b.x, b.y, b.z, b.w], [a.x, a.y, a.z, a.w], atol=1e-12)
+
+
+def test_solve_fk_updates_the_same_message(panda: Panda):
+
+    first = panda.solve_fk(random_joint_states(panda, 0))
+    position = first.pose.pose.position.x
+
+    second = panda.solve_fk(random_joint_states(panda, 1))
+    assert second is first
+    assert second.pose.pose.position.x != position
+    assert (second.header.frame_id, second.child_frame_id) == (panda.base_frame, panda.end_effector_frame)
+
+
+def test_solve_fk_without_remapping(panda: Panda):
+
+    # Joint states already in the order of the model
+    joint_states = random_joint_states(panda, 2)
+    joint_states.velocity = [0.] * panda.num_joints
+    odom = panda.solve_fk(joint_states, remap=False)
+
+    np.testing.assert_array_equal(panda.joint_positions, joint_states.position)
+    twist = odom.twist.twist
+    np.testing.assert_array_equal([twist.linear.x, twist.linear.y, twist.linear.z,
+                                   twist.angular.x, twist.angular.y, twist.angular.z], 0.)
+
+
+def named_joint_states(panda: Panda, order: np.ndarray, seed: int = 0) -> JointState:
+    # Joint states of the joints of the model in the given order, with their names
+
+    model_names = panda._joint_states_model_names
+    values = random_joint_states(panda, seed)
+
+    joint_states = JointState()
+    joint_states.name = [model_names[i] for i in order]
+    joint_states.position = [values.position[i] for i in order]
+    joint_states.velocity = [values.velocity[i] for i in order]
+    joint_states.effort = [0.] * len(order)
+
+    return joint_states
+
+
+def test_set_joint_states_by_name(panda: Panda):
+
+    order = np.random.default_rng(0).permutation(len(panda._joint_states_model_names))
+    joint_states = named_joint_states(panda, order)
+    panda.set_joint_states(joint_states)
+
+    for name, position, velocity in zip(joint_states.name, joint_states.position, joint_states.velocity):
+        model_idx = panda._joint_states_model_idxs[panda._joint_states_model_names.index(name)]
+        assert panda.joint_states.position[model_idx] == position
+        assert panda.joint_states.velocity[model_idx] == velocity
+
+
+def test_set_joint_states_caches_the_layout(panda: Panda):
+
+    num_joints = len(panda._joint_states_model_names)
+    panda.set_joint_states(named_joint_states(panda, np.arange(num_joints)))
+    message_idxs = panda._joint_states_message_idxs
+
+    # Same layout: the indices are reused
+    panda.set_joint_states(named_joint_states(panda, np.arange(num_joints), seed=1))
+    assert panda._joint_states_message_idxs is message_idxs
+
+    # New layout: the indices are computed again
+    panda.set_joint_states(named_joint_states(panda, np.arange(num_joints)[::-1], seed=2))
+    assert panda._joint_states_message_idxs is not message_idxs
+    np.testing.assert_array_equal(panda._joint_states_message_idxs, np.arange(num_joints)[::-1])
+
+
+def test_set_joint_states_extra_and_missing_joints(panda: Panda):
+
+    num_joints = len(panda._joint_states_model_names)
+    joint_states = named_joint_states(panda, np.arange(num_joints))
+
+    # Joints the model does not know about are ignored
+    joint_states.name = ['other_joint'] + list(joint_states.name)
+    joint_states.position = [100.] + list(joint_states.position)
+    joint_states.velocity = [100.] + list(joint_states.velocity)
+    joint_states.effort = [100.] + list(joint_states.effort)
+    panda.set_joint_states(joint_states)
+    assert 100. not in panda.joint_states.position
+
+    joint_states = named_joint_states(panda, np.arange(1, num_joints))
+    with pytest.raises(ValueError):
+        panda.set_joint_states(joint_states)
+
+
+def test_set_joint_states_without_names(panda: Panda):
+
+    # Message order from the joint_remapping table
+    joint_states = random_joint_states(panda, 3)
+    panda.set_joint_states(joint_states)
+
+    for model_idx, message_idx in panda._joint_states_remapping.items():
+        assert panda.joint_states.position[model_idx] == joint_states.position[message_idx]
+        assert panda.joint_states.velocity[model_idx] == joint_states.velocity[message_idx]
+
+
+def test_set_joint_states_without_velocities(panda: Panda):
+
+    panda.set_joint_states(random_joint_states(panda, 4))
+    velocity = list(panda.joint_states.velocity)
+
+    joint_states = random_joint_states(panda, 5)
+    joint_states.velocity = []
+    panda.set_joint_states(joint_states)
+    assert list(panda.joint_states.velocity) == velocity
+
+
+def reachable_target(panda: Panda, seed: int) -> Odometry:
+    # End effector pose of a configuration near the initial one, with the position rounded to the millimeter (in
+    # the middle of a cell of the IK cache)
+
+    joint_states = JointState()
+    joint_states.position = (np.asarray(panda.reset_model()) +
+                             np.random.default_rng(seed).uniform(-0.2, 0.2, panda.num_joints)).tolist()
+    joint_states.velocity = [0.] * panda.num_joints
+    joint_states.effort = [0.] * panda.num_joints
+
+    target = copy.deepcopy(panda.solve_fk(joint_states, remap=False))
+    position = target.pose.pose.position
+    position.x, position.y, position.z = np.round([position.x, position.y, position.z], 3).tolist()
+
+    return target
+
+
+@pytest.fixture
+def ik_cache(panda: Panda):
+
+    panda.invalidate_ik_cache()
+    panda.reset_ik_cache_stats()
+
+    yield panda
+
+    panda._ik_cache_size = panda._node_handle.get_parameter('ik_cache_size').value
+    panda.invalidate_ik_cache()
+
+
+def test_solve_ik_cache_hit(ik_cache: Panda):
+
+    target = reachable_target(ik_cache, 0)
+    solution = ik_cache.solve_ik(target)
+    assert solution is not None
+
+    cached = ik_cache.solve_ik(target)
+    np.testing.assert_array_equal(cached, solution)
+    assert cached is not solution
+    assert ik_cache.ik_cache_stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 1}
+
+
+def test_solve_ik_cache_tolerances(ik_cache: Panda):
+
+    target = reachable_target(ik_cache, 1)
+    assert ik_cache.solve_ik(target) is not None
+
+    # Within a fraction of the quantization step, and with the opposite quaternion: same orientation
+    nearby = copy.deepcopy(target)
+    nearby.pose.pose.position.x += 0.1 * ik_cache._ik_cache_position_tolerance
+    orientation = nearby.pose.pose.orientation
+    orientation.x, orientation.y, orientation.z, orientation.w = -orientation.x, -orientation.y, -orientation.z, -orientation.w
+    ik_cache.solve_ik(nearby)
+    assert ik_cache.ik_cache_stats()['hits'] == 1
+
+    # Further than the tolerance
+    moved = copy.deepcopy(target)
+    moved.pose.pose.position.x += 0.01
+    assert ik_cache.solve_ik(moved) is not None
+    assert ik_cache.ik_cache_stats()['misses'] == 2
+
+
+def test_solve_ik_cache_invalidate(ik_cache: Panda):
+
+    target = reachable_target(ik_cache, 2)
+    ik_cache.solve_ik(target)
+    ik_cache.invalidate_ik_cache()
+    assert ik_cache.ik_cache_stats()['size'] == 0
+
+    ik_cache.solve_ik(target)
+    assert ik_cache.ik_cache_stats()['misses'] == 2
+
+    ik_cache.reset_ik_cache_stats()
+    assert ik_cache.ik_cache_stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0., 'size': 1}
+
+
+def test_solve_ik_cache_evicts_least_recently_used(ik_cache: Panda):
+
+    ik_cache._ik_cache_size = 2
+    targets = [reachable_target(ik_cache, seed) for seed in (3, 4, 5)]
+
+    ik_cache.solve_ik(targets[0])
+    ik_cache.solve_ik(targets[1])
+    # Using the first target makes the second the least recently used
+    ik_cache.solve_ik(targets[0])
+    ik_cache.solve_ik(targets[2])
+    assert ik_cache.ik_cache_stats()['size'] == 2
+
+    ik_cache.reset_ik_cache_stats()
+    ik_cache.solve_ik(targets[0])
+    ik_cache.solve_ik(targets[2])
+    ik_cache.solve_ik(targets[1])
+    assert (ik_cache.ik_cache_stats()['hits'], ik_cache.ik_cache_stats()['misses']) == (2, 1)
+
+
+def test_solve_ik_cache_disabled(ik_cache: Panda):
+
+    ik_cache._ik_cache_size = 0
+    target = reachable_target(ik_cache, 6)
+
+    ik_cache.solve_ik(target)
+    ik_cache.solve_ik(target)
+    assert ik_cache.ik_cache_stats()['misses'] == 2 and ik_cache.ik_cache_stats()['size'] == 0
@@ -0,0 +1,160 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import os
+import numpy as np
+import pytest
+
+# The examples package loads iDynTree from the colcon workspace on import
+if 'COLCON_PREFIX_PATH' not in os.environ:
+    pytest.skip("requires a sourced colcon workspace", allow_module_level=True)
+
+pose_batch = pytest.importorskip('panda_ros2_gazebo.examples.scripts.rbd.pose_batch')
+PoseBatch = pose_batch.PoseBatch
+
+
+def random_rotations(n: int, rng: np.random.Generator) -> np.ndarray:
+
+    # Orthogonal factor of Gaussian matrices, with the sign flipped to det = 1
+    Q, R = np.linalg.qr(rng.normal(size=(n, 3, 3)))
+    Q = Q * np.sign(np.diagonal(R, axis1=-2, axis2=-1))[:, np.newaxis, :]
+    Q[np.linalg.det(Q) < 0., :, 0] *= -1.
+
+    return Q
+
+
+def random_transforms(n: int, seed: int = 0) -> np.ndarray:
+
+    rng = np.random.default_rng(seed)
+    T = np.tile(np.identity(4), (n, 1, 1))
+    T[:, :3, :3] = random_rotations(n, rng)
+    T[:, :3, 3] = rng.uniform(-1., 1., (n, 3))
+
+    return T
+
+
+def rotation_vector(R: np.ndarray) -> np.ndarray:
+
+    # Axis times angle of a rotation matrix (angle away from 0 and pi)
+    angle = np.arccos(np.clip(0.5 * (np.trace(R) - 1.), -1., 1.))
+    axis = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]]) / (2. * np.sin(angle))
+
+    return angle * axis
+
+
+def test_matrices_round_trip():
+
+    T = random_transforms(20)
+    poses = PoseBatch.from_matrices(T)
+
+    assert len(poses) == 20
+    assert poses.position.shape == (20, 3) and poses.quaternion.shape == (20, 4)
+    np.testing.assert_allclose(np.linalg.norm(poses.quaternion, axis=-1), 1.)
+    np.testing.assert_allclose(poses.as_matrices(), T, atol=1e-12)
+    np.testing.assert_allclose(poses.rotation_matrices(), T[:, :3, :3], atol=1e-12)
+
+    single = PoseBatch.from_matrices(T[0])
+    assert len(single) == 1
+    np.testing.assert_allclose(single.as_matrices()[0], T[0], atol=1e-12)
+
+
+def test_identity():
+
+    np.testing.assert_array_equal(PoseBatch.identity(3).as_matrices(), np.tile(np.identity(4), (3, 1, 1)))
+
+
+def test_shapes_are_checked():
+
+    with pytest.raises(ValueError):
+        PoseBatch(np.zeros((2, 3)), np.zeros((3, 4)))
+
+    with pytest.raises(ValueError):
+        PoseBatch(np.zeros((2, 4)), np.zeros((2, 4)))
+
+
+def test_indexing_returns_views():
+
+    poses = PoseBatch.from_matrices(random_transforms(5))
+
+    item = poses[1]
+    assert len(item) == 1
+    item.position[0] = [1., 2., 3.]
+    np.testing.assert_array_equal(poses.position[1], [1., 2., 3.])
+
+    np.testing.assert_array_equal(poses[-1].position, poses.position[-1:])
+    np.testing.assert_array_equal(poses[np.int64(2)].quaternion, poses.quaternion[2:3])
+    assert len(poses[1:4]) == 3
+
+    copy = poses.copy()
+    copy.position[:] = 0.
+    assert not np.any(poses.position == 0.)
+
+
+def test_compose_and_inverse():
+
+    A, B = random_transforms(10), random_transforms(10, seed=1)
+    a, b = PoseBatch.from_matrices(A), PoseBatch.from_matrices(B)
+
+    np.testing.assert_allclose(a.compose(b).as_matrices(), A @ B, atol=1e-12)
+    # A batch of one pose is broadcast
+    np.testing.assert_allclose(a[0].compose(b).as_matrices(), A[0] @ B, atol=1e-12)
+    np.testing.assert_allclose(a.compose(b[0]).as_matrices(), A @ B[0], atol=1e-12)
+
+    np.testing.assert_allclose(a.inverse().as_matrices(), np.linalg.inv(A), atol=1e-12)
+    np.testing.assert_allclose(a.compose(a.inverse()).as_matrices(), np.tile(np.identity(4), (10, 1, 1)), atol=1e-12)
+
+
+def test_error():
+
+    A, B = random_transforms(10), random_transforms(10, seed=1)
+    a, b = PoseBatch.from_matrices(A), PoseBatch.from_matrices(B)
+
+    translation, rotation = a.error(b)
+    np.testing.assert_allclose(translation, B[:, :3, 3] - A[:, :3, 3], atol=1e-12)
+    for i in range(10):
+        # Rotation taking the orientation of a to the one of b, in the world frame
+        expected = rotation_vector(B[i, :3, :3] @ A[i, :3, :3].T)
+        np.testing.assert_allclose(rotation[i], expected, atol=1e-9)
+
+    position_error, rotation_error = a.error_norms(b)
+    np.testing.assert_allclose(position_error, np.linalg.norm(translation, axis=-1))
+    np.testing.assert_allclose(rotation_error, np.linalg.norm(rotation, axis=-1))
+    assert np.all(rotation_error <= np.pi)
+
+
+def test_error_ignores_the_sign_of_the_quaternions():
+
+    a = PoseBatch.from_matrices(random_transforms(5))
+    flipped = PoseBatch(a.position, -a.quaternion)
+
+    position_error, rotation_error = a.error_norms(flipped)
+    np.testing.assert_allclose(position_error, 0.)
+    np.testing.assert_allclose(rotation_error, 0., atol=1e-7)
+
+    translation, rotation = a.error(a)
+    np.testing.assert_array_equal(translation, 0.)
+    np.testing.assert_allclose(rotation, 0., atol=1e-12)
+
+
+def test_messages_round_trip():
+
+    geometry_msgs = pytest.importorskip('geometry_msgs.msg')
+    nav_msgs = pytest.importorskip('nav_msgs.msg')
+
+    poses = PoseBatch.from_matrices(random_transforms(4))
+
+    messages = poses.to_poses()
+    assert all(isinstance(message, geometry_msgs.Pose) for message in messages)
+    loaded = PoseBatch.from_poses(messages)
+    np.testing.assert_array_equal(loaded.position, poses.position)
+    np.testing.assert_array_equal(loaded.quaternion, poses.quaternion)
+
+    odometry = [nav_msgs.Odometry() for _ in range(4)]
+    assert poses.to_odometry(odometry) is odometry
+    loaded = PoseBatch.from_odometry(odometry)
+    np.testing.assert_array_equal(loaded.position, poses.position)
+    np.testing.assert_array_equal(loaded.quaternion, poses.quaternion)
+
+    with pytest.raises(ValueError):
+        poses.to_poses(messages[:2])
@@ -0,0 +1,109 @@
+# Copyright (C) 2021 Bosch LLC CR, North America. All rights reserved.
+# This software may be modified and distributed under the terms of the
+# GNU Lesser General Public License v2.1 or any later version.
+
+import os
+import numpy as np
+import pytest
+
+# The examples package loads iDynTree from the colcon workspace on import
+if 'COLCON_PREFIX_PATH' not in os.environ:
+    pytest.skip("requires a sourced colcon workspace", allow_module_level=True)
+
+rotations = pytest.importorskip('panda_ros2_gazebo.examples.scripts.rbd.rotations')
+# Reference implementation the kernels replace
+Rotation = pytest.importorskip('scipy.spatial.transform').Rotation
+
+
+def random_quaternions(n: int, seed: int = 0) -> np.ndarray:
+
+    quaternion = np.random.default_rng(seed).normal(size=(n, 4))
+
+    return quaternion / np.linalg.norm(quaternion, axis=-1, keepdims=True)
+
+
+def canonical(quaternion: np.ndarray) -> np.ndarray:
+
+    # Same rotation, with w >= 0
+    return np.where(quaternion[..., 3:] < 0., -quaternion, quaternion)
+
+
+def test_quaternion_to_matrix():
+
+    quaternion = random_quaternions(50)
+    expected = Rotation.from_quat(quaternion).as_matrix()
+
+    np.testing.assert_allclose(rotations.quaternion_to_matrix(quaternion), expected, atol=1e-12)
+    np.testing.assert_allclose(rotations.quaternion_to_matrix(quaternion[0]), expected[0], atol=1e-12)
+    assert rotations.quaternion_to_matrix(quaternion.reshape(5, 10, 4)).shape == (5, 10, 3, 3)
+
+
+def test_matrix_to_quaternion():
+
+    quaternion = canonical(random_quaternions(50))
+    # Including the rotations by pi, where w = 0 and the pivot is another component
+    quaternion[:3] = [[1., 0., 0., 0.], [0., 1., 0., 0.], [0., 0., 1., 0.]]
+    matrix = Rotation.from_quat(quaternion).as_matrix()
+
+    np.testing.assert_allclose(rotations.matrix_to_quaternion(matrix), quaternion, atol=1e-12)
+    for i in range(10):
+        np.testing.assert_allclose(rotations.matrix_to_quaternion(matrix[i]), quaternion[i], atol=1e-12)
+
+
+def test_quaternion_multiply_and_rotate():
+
+    a, b = random_quaternions(20), random_quaternions(20, seed=1)
+    vector = np.random.default_rng(2).normal(size=(20, 3))
+
+    expected = (Rotation.from_quat(a) * Rotation.from_quat(b)).as_quat()
+    np.testing.assert_allclose(canonical(rotations.quaternion_multiply(a, b)), canonical(expected), atol=1e-12)
+
+    np.testing.assert_allclose(rotations.quaternion_rotate(a, vector), Rotation.from_quat(a).apply(vector), atol=1e-12)
+    # A single quaternion is broadcast
+    np.testing.assert_allclose(rotations.quaternion_rotate(a[0], vector), Rotation.from_quat(a[0]).apply(vector),
+                               atol=1e-12)
+
+
+@pytest.mark.parametrize('seq', ['xyz', 'XYZ', 'zyx', 'ZYZ', 'xy', 'y', 'Z'])
+@pytest.mark.parametrize('degrees', [False, True])
+def test_euler_to_quaternion(seq: str, degrees: bool):
+
+    scale = 180. if degrees else np.pi
+    angles = np.random.default_rng(3).uniform(-scale, scale, (20, len(seq)))
+    expected = canonical(Rotation.from_euler(seq, angles, degrees=degrees).as_quat())
+
+    np.testing.assert_allclose(rotations.euler_to_quaternion(seq, angles, degrees), expected, atol=1e-12)
+    # A single set of angles takes the scalar path
+    np.testing.assert_allclose(rotations.euler_to_quaternion(seq, angles[0], degrees), expected[0], atol=1e-12)
+
+
+def test_euler_to_quaternion_scalar_angle():
+
+    expected = canonical(Rotation.from_euler('y', 90, degrees=True).as_quat())
+
+    np.testing.assert_allclose(rotations.euler_to_quaternion('y', 90, degrees=True), expected, atol=1e-12)
+    np.testing.assert_allclose(rotations.euler_to_quaternion('y', [90, 90], degrees=True), [expected, expected],
+                               atol=1e-12)
+
+
+def test_euler_to_quaternion_checks_the_sequence():
+
+    with pytest.raises(ValueError):
+        rotations.euler_to_quaternion('xYz', [0., 0., 0.])
+
+    with pytest.raises(ValueError):
+        rotations.euler_to_quaternion('xyzx', [0., 0., 0., 0.])
+
+    with pytest.raises(ValueError):
+        rotations.euler_to_quaternion('xyz', np.zeros((5, 2)))
+
+
+def test_constant_quaternion():
+
+    quaternion = rotations.constant_quaternion(seq="xyz", angles=[0, 90, 90], degrees=True)
+
+    np.testing.assert_allclose(quaternion, rotations.euler_to_quaternion('xyz', [0, 90, 90], degrees=True))
+    # Shared between the calls, and read-only
+    assert rotations.constant_quaternion(seq="xyz", angles=[0, 90, 90], degrees=True) is quaternion
+    with pytest.raises(ValueError):
+        quaternion[0] = 1.
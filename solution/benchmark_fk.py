@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Compare the FK backends: the generic product of DH transforms ('chain') and the
+closed-form module generated by fk_codegen.py ('generated').
+
+Usage (from the root of the repository):
+    python -m solution.benchmark_fk
+"""
+import timeit
+import numpy as np
+
+from solution.solveFK import FK
+
+
+def chain_product(fk, q):
+    # Reference: one fresh 4x4 per link, multiplied together
+    theta = list(q[:7]) + [fk.ee_theta]
+    T0e = np.identity(4)
+    for (a, alpha, d), theta_i in zip(fk.dh_params, theta):
+        T0e = T0e @ fk.build_dh_transform(a, alpha, d, theta_i)
+    return T0e
+
+
+def time_call(function, number):
+    # Best of 5 repetitions, in seconds per call
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main():
+    rng = np.random.default_rng(0)
+    chain, generated = FK(), FK(backend='generated')
+    q = rng.uniform(-2., 2., 7)
+
+    print('{:<36}{:>14}{:>14}'.format('', 'chain', 'generated'))
+
+    reference = time_call(lambda: chain_product(chain, q), 2000)
+    print('{:<36}{:>11.1f} us'.format('forward (DH matrix products)', reference * 1e6))
+
+    rows = [('forward', lambda fk: (lambda: fk.forward(q)), 2000),
+            ('forward_with_jacobian', lambda fk: (lambda: fk.forward_with_jacobian(q)), 2000)]
+    for name, make, number in rows:
+        t_chain = time_call(make(chain), number)
+        t_generated = time_call(make(generated), number)
+        print('{:<36}{:>11.1f} us{:>11.1f} us{:>8.1f}x'.format(
+            name, t_chain * 1e6, t_generated * 1e6, t_chain / t_generated))
+
+    for N in (1000, 100000):
+        Q = rng.uniform(-2., 2., (N, 7))
+        for name, method in (('forward_batch', 'forward_batch'),
+                             ('forward_with_jacobian_batch', 'forward_with_jacobian_batch')):
+            t_chain = time_call(lambda: getattr(chain, method)(Q), 1)
+            t_generated = time_call(lambda: getattr(generated, method)(Q), 1)
+            print('{:<36}{:>11.1f} ms{:>11.1f} ms{:>8.1f}x'.format(
+                '{} N={}'.format(name, N), t_chain * 1e3, t_generated * 1e3, t_chain / t_generated))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Compare the IK solver strategies ('dls', 'lm', 'analytical' and 'staged') on the five targets of
+assignment/inverse_kinematics.py and on random reachable poses.
+
+Usage (from the root of the repository):
+    python -m solution.benchmark_ik [number_of_random_poses]
+"""
+import sys
+from math import pi
+import numpy as np
+
+from solution.solveIK import IK
+from solution.transformation_utils import transformation
+
+ASSIGNMENT_TARGETS = [
+    transformation.transform(np.array([-.2, -.3, .5]), np.array([0, pi, pi])),
+    transformation.transform(np.array([.5, 0, .2]), np.array([0, pi, pi])),
+    transformation.transform(np.array([.7, 0.0, .3]), np.array([0, pi, pi])),
+    transformation.transform(np.array([-.5, -.1, 0.2]), np.array([0, pi/2, pi])),
+    transformation.transform(np.array([.4, .1, 0.2]), np.array([pi/2, pi/2, pi])),
+]
+
+
+def run(ik, targets, solver):
+    return [ik.inverse(target, ik.neutral, solver=solver, return_telemetry=True)[2] for target in targets]
+
+
+def summary(name, telemetry):
+    iterations = np.array([t.iterations for t in telemetry])
+    success = np.array([t.success for t in telemetry])
+    wall_time = np.array([t.wall_time for t in telemetry])
+    converged = np.median(iterations[success]) if success.any() else np.nan
+    print('{:<12}{:>10.0%}{:>12.1f}{:>14.1f}{:>12.2f} ms'.format(
+        name, success.mean(), np.median(iterations), converged, np.median(wall_time) * 1e3))
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    n_random = int(args[0]) if args else 500
+
+    ik = IK()
+    rng = np.random.default_rng(0)
+    _, random_targets = ik.fk.forward_batch(rng.uniform(ik.lower, ik.upper, (n_random, 7)))
+
+    for title, targets in (('assignment targets', ASSIGNMENT_TARGETS),
+                           ('{} random reachable poses'.format(n_random), random_targets)):
+        print(title)
+        print('{:<12}{:>10}{:>12}{:>14}{:>15}'.format('', 'success', 'median it', 'converged it', 'median time'))
+        for solver in ('dls', 'lm', 'analytical', 'staged'):
+            summary(solver, run(ik, targets, solver))
+
+        telemetry = run(ik, targets[:5], 'lm')
+        for i, t in enumerate(telemetry):
+            print('  lm #{}: {} iterations, |dp| = {:.1e} m, |dr| = {:.1e} rad{}'.format(
+                i, t.iterations, t.position_error, t.rotation_error, '' if t.success else ' (failed)'))
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+"""
+Generate a closed-form forward kinematics module for a DH chain.
+
+The chain products of FK are expanded ahead of time into straight-line NumPy
+code: the sines and cosines of the joint angles are computed once, products
+with the constant DH factors (cos/sin of alpha, a, d) are folded, terms that
+vanish are dropped and every shared subexpression is stored in a variable,
+computed once. The variables that end up unused are not emitted.
+The generated functions work on a single configuration (7,) as well as on a
+batch (N, 7).
+
+Usage (from the root of the repository):
+    python -m solution.fk_codegen [output_file]
+"""
+import os
+import re
+import sys
+import numpy as np
+
+from solution.solveFK import FK
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'panda_fk_generated.py')
+
+HEADER = '''\
+#!/usr/bin/env python
+# Generated by solution/fk_codegen.py from the DH parameters of FK. Do not edit.
+# Regenerate with: python -m solution.fk_codegen
+import math
+import numpy as np
+
+DH_PARAMS = {dh_params!r}
+JOINT_OFFSETS = {joint_offsets!r}
+EE_THETA = {ee_theta!r}
+'''
+
+
+def _snap(value):
+    # Remove the round-off of cos/sin of multiples of pi/2, so that those
+    # factors can be folded
+    value = float(value)
+    for exact in (0., 1., -1.):
+        if abs(value - exact) < 1e-12:
+            return exact
+    return value
+
+
+class _Emitter():
+    """
+    Straight-line code builder. A value is either a float constant or the name
+    of a variable holding an array (or scalar) expression, possibly negated
+    ('-name'). An expression is only emitted once: combining the same sum of
+    products again (up to the order of the terms and factors, and to the
+    sign) returns the variable already holding it.
+    """
+
+    _NAME = re.compile(r'[A-Za-z_]\w*')
+
+    def __init__(self, indent='    '):
+        self.indent = indent
+        self.lines = []
+        self._count = 0
+        self._memo = {}
+
+    def emit(self, line):
+        self.lines.append(self.indent + line)
+
+    def assign(self, name, expression):
+        self.emit('{} = {}'.format(name, expression))
+        return name
+
+    def combine(self, terms):
+        """
+        Sum of products (coefficient, value, value...). Constants are folded,
+        and a new variable is only introduced when the result is not already
+        a constant or an existing variable
+        """
+
+        constant = 0.
+        products = []
+        for coef, *factors in terms:
+            coef = float(coef)
+            names = []
+            for factor in factors:
+                if isinstance(factor, str) and factor.startswith('-'):
+                    coef = -coef
+                    names.append(factor[1:])
+                elif isinstance(factor, str):
+                    names.append(factor)
+                else:
+                    coef *= factor
+            if coef == 0.:
+                continue
+            if names:
+                products.append((coef, names))
+            else:
+                constant += coef
+
+        constant = _snap(constant)
+        if not products:
+            return constant
+        if constant == 0. and len(products) == 1 and abs(products[0][0]) == 1. and len(products[0][1]) == 1:
+            # Existing variable, up to its sign
+            coef, (name,) = products[0]
+            return name if coef == 1. else '-' + name
+
+        key = (constant, tuple(sorted((tuple(sorted(names)), coef) for coef, names in products)))
+        negated = (-constant, tuple((names, -coef) for names, coef in key[1]))
+        if key in self._memo:
+            return self._memo[key]
+        if negated in self._memo:
+            return '-' + self._memo[negated]
+
+        expression = ''
+        for coef, names in products:
+            product = '*'.join(names)
+            if coef == 1.:
+                term = product
+            elif coef == -1.:
+                term = '-' + product
+            else:
+                term = '{!r}*{}'.format(coef, product)
+            if expression and not term.startswith('-'):
+                expression += ' + ' + term
+            elif expression:
+                expression += ' - ' + term[1:]
+            else:
+                expression = term
+        if constant > 0.:
+            expression += ' + {!r}'.format(constant)
+        elif constant < 0.:
+            expression += ' - {!r}'.format(-constant)
+
+        self._count += 1
+        self._memo[key] = self.assign('t{}'.format(self._count), expression)
+        return self._memo[key]
+
+    def prune(self):
+        """
+        Drop the assignments of variables that no later line reads
+        """
+
+        used = set()
+        lines = []
+        for line in reversed(self.lines):
+            target, _, expression = line.strip().partition(' = ')
+            if expression and self._NAME.fullmatch(target):
+                if target not in used:
+                    continue
+            else:
+                expression = line
+            used.update(self._NAME.findall(expression))
+            lines.append(line)
+        self.lines = lines[::-1]
+
+
+def _expand_chain(emitter, fk, trig):
+    """
+    Emit the propagation of the frame axes and origins down the chain and
+    return the values of every cumulative frame as (x, y, z, p) triples.
+    trig is the module providing cos and sin ('math' or 'np')
+    """
+
+    n_links = len(fk.a)
+    for i in range(7):
+        emitter.assign('c{}'.format(i + 1), '{}.cos(q[{}])'.format(trig, i))
+        emitter.assign('s{}'.format(i + 1), '{}.sin(q[{}])'.format(trig, i))
+
+    x, y, z, p = [1., 0., 0.], [0., 1., 0.], [0., 0., 1.], [0., 0., 0.]
+    frames = []
+    for i in range(n_links):
+        ca, sa = _snap(fk.cos_alpha[i]), _snap(fk.sin_alpha[i])
+        a, d = _snap(fk.a[i]), _snap(fk.d[i])
+        if i < 7:
+            c, s = 'c{}'.format(i + 1), 's{}'.format(i + 1)
+        else:
+            c, s = _snap(np.cos(fk.ee_theta)), _snap(np.sin(fk.ee_theta))
+
+        u = [emitter.combine([(ca, y[k]), (sa, z[k])]) for k in range(3)]
+        z = [emitter.combine([(ca, z[k]), (-sa, y[k])]) for k in range(3)]
+        p = [emitter.combine([(1., p[k]), (a, x[k]), (d, z[k])]) for k in range(3)]
+        x, y = ([emitter.combine([(1., c, x[k]), (1., s, u[k])]) for k in range(3)],
+                [emitter.combine([(1., c, u[k]), (-1., s, x[k])]) for k in range(3)])
+        frames.append((x, y, z, p))
+    return frames
+
+
+def _joint_positions(emitter, fk, frames):
+    # Joint centres: frame origin plus the offset expressed in the frame
+    positions = []
+    for i in range(7):
+        x, y, z, p = frames[i]
+        ox, oy, oz = fk.offsets[i]
+        positions.append([emitter.combine([(1., p[k]), (ox, x[k]), (oy, y[k]), (oz, z[k])])
+                          for k in range(3)])
+    return positions
+
+
+def _jacobian(emitter, frames):
+    # Column i: [z_i x (p_e - o_i); z_i]
+    pe = frames[-1][3]
+    columns = []
+    for i in range(7):
+        _, _, z, p = frames[i]
+        lever = [emitter.combine([(1., pe[k]), (-1., p[k])]) for k in range(3)]
+        linear = [emitter.combine([(1., z[1], lever[2]), (-1., z[2], lever[1])]),
+                  emitter.combine([(1., z[2], lever[0]), (-1., z[0], lever[2])]),
+                  emitter.combine([(1., z[0], lever[1]), (-1., z[1], lever[0])])]
+        columns.append(linear + list(z))
+    return columns
+
+
+def _matrix_literal(frame):
+    # 4x4 homogeneous transform of a frame as a nested list literal
+    x, y, z, p = frame
+    rows = ['[{}, {}, {}, {}]'.format(x[k], y[k], z[k], p[k]) for k in range(3)]
+    return '[{}, [0., 0., 0., 1.]]'.format(', '.join(rows))
+
+
+def _emit_batch_frame(emitter, target, frame):
+    for column, values in enumerate(frame):
+        for row, value in enumerate(values):
+            emitter.emit('{}[{}, {}] = {}'.format(target, row, column, value))
+    emitter.emit('{}[3, 3] = 1.'.format(target))
+
+
+def _function(name, doc, preamble, emitter):
+    emitter.prune()
+    return '\n\ndef {}(q):\n    """\n    {}\n    """\n\n{}\n{}\n'.format(
+        name, doc, preamble, '\n'.join(emitter.lines))
+
+
+def generate(fk=None):
+    """
+    Return the source code of the closed-form FK module for the DH chain of fk
+    """
+
+    fk = FK() if fk is None else fk
+    source = [HEADER.format(dh_params=[[float(v) for v in row] for row in fk.dh_params],
+                            joint_offsets=[[float(v) for v in row] for row in fk.joint_offsets],
+                            ee_theta=float(fk.ee_theta))]
+
+    # Single configuration: plain Python floats, results built from literals
+    single = '    # q is a list of 7 floats'
+
+    emitter = _Emitter()
+    frames = _expand_chain(emitter, fk, 'math')
+    positions = _joint_positions(emitter, fk, frames)
+    emitter.emit('jointPositions = np.array([{}])'.format(
+        ', '.join('[{}, {}, {}]'.format(*position) for position in positions)))
+    emitter.emit('T0e = np.array({})'.format(_matrix_literal(frames[-1])))
+    emitter.emit('return jointPositions, T0e')
+    source.append(_function('_forward_single', 'forward for a single configuration', single, emitter))
+
+    emitter = _Emitter()
+    frames = _expand_chain(emitter, fk, 'math')
+    columns = _jacobian(emitter, frames)
+    emitter.emit('T0e = np.array({})'.format(_matrix_literal(frames[-1])))
+    emitter.emit('frames = np.array([{}])'.format(
+        ', '.join(_matrix_literal(frame) for frame in frames[:7])))
+    emitter.emit('J = np.array([{}])'.format(', '.join(
+        '[{}]'.format(', '.join(str(column[row]) for column in columns)) for row in range(6))))
+    emitter.emit('return T0e, frames, J')
+    source.append(_function('_forward_with_jacobian_single', 'forward_with_jacobian for a single configuration', single, emitter))
+
+    # Batch: every expression is an array of size N, results are built with the
+    # batch dimension last so that the writes are contiguous
+    batch = '    # q is a 7 x N array\n    N = q.shape[1]'
+
+    emitter = _Emitter()
+    frames = _expand_chain(emitter, fk, 'np')
+    positions = _joint_positions(emitter, fk, frames)
+    emitter.emit('jointPositions = np.empty((7, 3, N))')
+    for i, position in enumerate(positions):
+        for k in range(3):
+            emitter.emit('jointPositions[{}, {}] = {}'.format(i, k, position[k]))
+    emitter.emit('T0e = np.zeros((4, 4, N))')
+    _emit_batch_frame(emitter, 'T0e', frames[-1])
+    emitter.emit('return np.moveaxis(jointPositions, -1, 0), np.moveaxis(T0e, -1, 0)')
+    source.append(_function('_forward_batch', 'forward for a batch of configurations', batch, emitter))
+
+    emitter = _Emitter()
+    frames = _expand_chain(emitter, fk, 'np')
+    columns = _jacobian(emitter, frames)
+    emitter.emit('T0e = np.zeros((4, 4, N))')
+    _emit_batch_frame(emitter, 'T0e', frames[-1])
+    emitter.emit('frames = np.zeros((7, 4, 4, N))')
+    for i in range(7):
+        _emit_batch_frame(emitter, 'frames[{}]'.format(i), frames[i])
+    emitter.emit('J = np.empty((6, 7, N))')
+    for i, column in enumerate(columns):
+        for row in range(6):
+            emitter.emit('J[{}, {}] = {}'.format(row, i, column[row]))
+    emitter.emit('return np.moveaxis(T0e, -1, 0), np.moveaxis(frames, -1, 0), np.moveaxis(J, -1, 0)')
+    source.append(_function('_forward_with_jacobian_batch', 'forward_with_jacobian for a batch of configurations', batch, emitter))
+
+    source.append('''
+
+def forward(q):
+    """
+    Closed-form equivalent of FK.forward for q of shape (7,) or (N, 7)
+    """
+
+    q = np.asarray(q, dtype=float)
+    if q.ndim == 1:
+        return _forward_single(q.tolist())
+    return _forward_batch(q.T)
+
+
+def forward_with_jacobian(q):
+    """
+    Closed-form equivalent of FK.forward_with_jacobian for q of shape (7,) or (N, 7)
+    """
+
+    q = np.asarray(q, dtype=float)
+    if q.ndim == 1:
+        return _forward_with_jacobian_single(q.tolist())
+    return _forward_with_jacobian_batch(q.T)
+
+
+def jacobian(q):
+    """
+    Geometric Jacobian (6, 7) or (N, 6, 7)
+    """
+
+    return forward_with_jacobian(q)[2]
+''')
+    return ''.join(source)
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    output = args[0] if args else DEFAULT_OUTPUT
+    with open(output, 'w') as f:
+        f.write(generate())
+    print('Wrote {}'.format(output))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Offline IK database: joint solutions precomputed on a grid of end effector
+positions (with a fixed orientation) covering a small region of the
+workspace, such as the pick and delivery areas of the pick and place
+examples. At run time, the solution of any pose in the region is read from
+the table by trilinear interpolation, which is a good seed (or, after one or
+two refining iterations, the solution).
+
+The table is stored as <name>.npy, which is memory-mapped when loaded, with
+the grid description in <name>.npz.
+
+Usage (from the root of the repository):
+    python -m solution.ik_database [output_directory] [points_per_meter]
+"""
+import os
+import sys
+import time
+import numpy as np
+from concurrent import futures
+
+from solution.solveIK import IK
+from solution.transformation_utils import transformation
+
+# Rotation from the end effector of FK to the end_effector_frame of the URDF
+# (panda_ros2_gazebo/description/models/panda/panda.urdf), in which the ROS
+# examples express their targets
+ROS_END_EFFECTOR_FRAME = transformation.pitch(-np.pi / 2) @ transformation.roll(np.pi)
+
+
+def _solve_points(positions, rotation, reference):
+    # Runs in a worker process of IKDatabase.build. The points are consecutive
+    # grid points, each one is solved on the branch nearest to the solution of
+    # the previous one: closed-form with the q7 of reference first, then the
+    # numeric solver
+    ik = IK()
+    solutions = np.full((len(positions), 7), np.nan)
+    target = np.identity(4)
+    target[:3, :3] = rotation
+    previous = reference
+    for i, position in enumerate(positions):
+        target[:3, 3] = position
+        candidates = ik.inverse_analytical(target, q7=reference[6], reference=previous)
+        if len(candidates):
+            solutions[i] = previous = candidates[0]
+            continue
+        q_set, success = ik.inverse(target, previous, solver='lm', keep_last=1)
+        if success:
+            solutions[i] = previous = q_set[-1]
+    return solutions
+
+
+class IKDatabase():
+
+    def __init__(self, lower, upper, rotation, solutions, frame_offset=None):
+        """
+        INPUTS:
+        lower, upper - corners [x, y, z] of the region
+
+        rotation - 3x3 orientation of the end effector, in the frame of the targets
+
+        solutions - nx x ny x nz x 7 array of joint angles (NaN where IK failed)
+
+        frame_offset - 4x4 transform from the end effector of FK to the frame
+        the targets are given in (identity by default)
+        """
+
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.rotation = np.asarray(rotation, dtype=float)
+        self.solutions = solutions
+        self.frame_offset = np.identity(4) if frame_offset is None else np.asarray(frame_offset, dtype=float)
+        self.shape = np.array(solutions.shape[:3])
+        self.step = (self.upper - self.lower) / np.maximum(self.shape - 1, 1)
+        self.orientation_tol = 1e-3 # [rad] targets rotated further away are not looked up
+        self.max_spread = 0.5 # [rad] cells whose corners differ more than this are not interpolated
+
+    @staticmethod
+    def grid(lower, upper, shape):
+        """
+        Grid positions, as a nx x ny x nz x 3 array
+        """
+
+        axes = [np.linspace(l, u, n) for l, u, n in zip(lower, upper, shape)]
+        return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+
+    @classmethod
+    def build(cls, lower, upper, shape, rotation, path=None, frame_offset=None, reference=None,
+              workers=None, chunk_size=64):
+        """
+        Solve the IK of every grid point in a process pool
+
+        INPUTS:
+        lower, upper, rotation, frame_offset - see __init__
+
+        shape - number of grid points (nx, ny, nz)
+
+        path - if given, the table is written to <path>.npy as it is computed
+        (memory-mapped) and the grid description to <path>.npz
+
+        reference - configuration whose branch the solutions should follow. By
+        default, the most manipulable solution at the centre of the region,
+        which keeps the grid away from singularities (where the solutions of
+        neighbouring points can be far apart)
+
+        workers - number of worker processes (default: one per CPU)
+
+        OUTPUTS:
+        database - IKDatabase
+        """
+
+        ik = IK()
+        lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+        frame_offset = np.identity(4) if frame_offset is None else np.asarray(frame_offset, dtype=float)
+        # Orientation of the end effector of FK
+        fk_rotation = np.asarray(rotation, dtype=float) @ frame_offset[:3, :3].T
+
+        if reference is None:
+            centre = np.identity(4)
+            centre[:3, :3] = fk_rotation
+            centre[:3, 3] = 0.5 * (lower + upper)
+            candidates = ik.inverse_analytical(centre, q7=np.linspace(ik.lower[6], ik.upper[6], 64))
+            if len(candidates):
+                _, _, J = ik.fk.forward_with_jacobian_batch(candidates)
+                reference = candidates[np.argmax(np.linalg.det(J @ J.transpose(0, 2, 1)))]
+            else:
+                reference = ik.neutral
+        reference = np.asarray(reference, dtype=float)[:7]
+
+        # FK end effector positions of the grid points
+        positions = cls.grid(lower, upper, shape).reshape(-1, 3) - fk_rotation @ frame_offset[:3, 3]
+
+        if path is None:
+            solutions = np.empty(tuple(shape) + (7,))
+        else:
+            solutions = np.lib.format.open_memmap(path + '.npy', mode='w+', shape=tuple(shape) + (7,))
+        flat = solutions.reshape(-1, 7)
+
+        chunks = range(0, len(positions), chunk_size)
+        with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = {executor.submit(_solve_points, positions[i:i + chunk_size], fk_rotation, reference): i
+                    for i in chunks}
+            for job in futures.as_completed(jobs):
+                i = jobs[job]
+                flat[i:i + chunk_size] = job.result()
+
+        database = cls(lower, upper, rotation, solutions, frame_offset)
+        if path is not None:
+            solutions.flush()
+            database.save(path, table=False)
+        return database
+
+    def save(self, path, table=True):
+        """
+        Write the database to <path>.npz (grid) and <path>.npy (table)
+        """
+
+        np.savez(path + '.npz', lower=self.lower, upper=self.upper, rotation=self.rotation,
+                 frame_offset=self.frame_offset)
+        if table:
+            np.save(path + '.npy', np.asarray(self.solutions))
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Read a database written by save or build. The table is memory-mapped
+        unless mmap_mode is None
+        """
+
+        with np.load(path + '.npz') as grid:
+            return cls(grid['lower'], grid['upper'], grid['rotation'],
+                       np.load(path + '.npy', mmap_mode=mmap_mode), grid['frame_offset'])
+
+    def coverage(self):
+        """
+        Fraction of the grid points with a solution
+        """
+
+        return float(np.mean(np.isfinite(self.solutions[..., 0])))
+
+    def contains(self, target):
+        """
+        True if the 4x4 pose target is in the region, with the orientation of the database
+        """
+
+        target = np.asarray(target, dtype=float)
+        if np.any(target[:3, 3] < self.lower) or np.any(target[:3, 3] > self.upper):
+            return False
+        cos_angle = 0.5 * (np.trace(self.rotation.T @ target[:3, :3]) - 1.)
+        return cos_angle >= np.cos(self.orientation_tol)
+
+    def seed(self, target):
+        """
+        Joint angles interpolated (trilinearly) at the position of target
+
+        INPUTS:
+        target - 4x4 pose, in the frame of the database
+
+        OUTPUTS:
+        q - 1x7 vector of joint angles, or None if target is outside of the
+        region or no corner of its grid cell has a solution
+        """
+
+        if not self.contains(target):
+            return None
+
+        # Cell of the target and position within it
+        x = (np.asarray(target, dtype=float)[:3, 3] - self.lower) / self.step
+        i = np.minimum(x.astype(int), np.maximum(self.shape - 2, 0))
+        t = x - i
+
+        corners = self.solutions[i[0]:i[0] + 2, i[1]:i[1] + 2, i[2]:i[2] + 2]
+        weights = np.ones(corners.shape[:3])
+        for axis in range(3):
+            w = np.array([1. - t[axis], t[axis]])[:corners.shape[axis]]
+            weights *= w.reshape([-1 if a == axis else 1 for a in range(3)])
+
+        q = np.tensordot(weights, corners, axes=3)
+        if np.all(np.isfinite(q)) and np.all(np.ptp(corners, axis=(0, 1, 2)) <= self.max_spread):
+            return q
+
+        # Corners on different branches (or without a solution): nearest corner
+        # with a solution
+        valid = np.isfinite(corners[..., 0])
+        if not valid.any():
+            return None
+        weights[~valid] = -1.
+        return corners[np.unravel_index(np.argmax(weights), weights.shape)].copy()
+
+    def solve(self, target, ik, solver='lm'):
+        """
+        Refine the interpolated seed of target with ik
+
+        OUTPUTS:
+        q - 1x7 vector of joint angles, or None if the target is not covered
+
+        success - True if q solves the target
+        """
+
+        q = self.seed(target)
+        if q is None:
+            return None, False
+        q_set, success = ik.inverse(transformation.compose(target, transformation.inverse(self.frame_offset)),
+                                    q, solver=solver, keep_last=1)
+        return q_set[-1], success
+
+
+# Regions of the pick and place / pick and insert examples, in the base frame
+# of the robot and the end_effector_frame of the URDF: (lower, upper, rotation)
+REGIONS = {
+    # sample_new_cube_pose, shifted by 0.02 in y, from the grab to the hover height
+    'pick_n_place_pick': ([0.3, -0.08, 0.03], [0.7, 0.32, 0.30],
+                          transformation.yaw(np.pi / 2)[:3, :3] @ transformation.pitch(np.pi / 2)[:3, :3]),
+    # Stack of delivered cubes
+    'pick_n_place_deliver': ([0.25, 0.45, 0.0], [0.35, 0.55, 0.45],
+                             transformation.yaw(np.pi / 2)[:3, :3] @ transformation.pitch(np.pi / 2)[:3, :3]),
+    # sample_new_sparkplug_pose, up to twice the hover height
+    'pick_n_insert_pick': ([0.5, -0.2, 0.05], [0.6, 0.2, 0.40], transformation.pitch(np.pi / 2)[:3, :3]),
+    # Holes of the tray
+    'pick_n_insert_tray': ([0.19, -0.06, 0.05], [0.31, 0.06, 0.60], transformation.pitch(np.pi / 2)[:3, :3]),
+}
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    directory = args[0] if args else '.'
+    density = float(args[1]) if len(args) > 1 else 50.
+
+    for name, (lower, upper, rotation) in REGIONS.items():
+        shape = [max(int(round((u - l) * density)) + 1, 2) for l, u in zip(lower, upper)]
+        start = time.perf_counter()
+        database = IKDatabase.build(lower, upper, shape, rotation, path=os.path.join(directory, name),
+                                    frame_offset=ROS_END_EFFECTOR_FRAME)
+        print('{}: {} points, {:.0%} solved in {:.1f} s'.format(
+            name, int(np.prod(shape)), database.coverage(), time.perf_counter() - start))
+
+if __name__ == "__main__":
+    main()
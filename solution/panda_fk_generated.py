@@ -0,0 +1,605 @@
+#!/usr/bin/env python
+# Generated by solution/fk_codegen.py from the DH parameters of FK. Do not edit.
+# Regenerate with: python -m solution.fk_codegen
+import math
+import numpy as np
+
+DH_PARAMS = [[0.0, 0.0, 0.333], [0.0, -1.5707963267948966, 0.0], [0.0, 1.5707963267948966, 0.316], [0.0825, 1.5707963267948966, 0.0], [-0.0825, -1.5707963267948966, 0.384], [0.0, 1.5707963267948966, 0.0], [0.088, 1.5707963267948966, 0.0], [0.0, 0.0, 0.21]]
+JOINT_OFFSETS = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+EE_THETA = -0.7853981633974483
+
+
+def _forward_single(q):
+    """
+    forward for a single configuration
+    """
+
+    # q is a list of 7 floats
+    c1 = math.cos(q[0])
+    s1 = math.sin(q[0])
+    c2 = math.cos(q[1])
+    s2 = math.sin(q[1])
+    c3 = math.cos(q[2])
+    s3 = math.sin(q[2])
+    c4 = math.cos(q[3])
+    s4 = math.sin(q[3])
+    c5 = math.cos(q[4])
+    s5 = math.sin(q[4])
+    c6 = math.cos(q[5])
+    s6 = math.sin(q[5])
+    c7 = math.cos(q[6])
+    s7 = math.sin(q[6])
+    t1 = c2*c1
+    t2 = c2*s1
+    t3 = -s2*c1
+    t4 = -s2*s1
+    t5 = -0.316*t3
+    t6 = -0.316*t4
+    t7 = 0.316*c2 + 0.333
+    t8 = c3*t1 - s3*s1
+    t9 = c3*t2 + s3*c1
+    t10 = -c3*s2
+    t11 = -c3*s1 - s3*t1
+    t12 = c3*c1 - s3*t2
+    t13 = s3*s2
+    t14 = t5 + 0.0825*t8
+    t15 = t6 + 0.0825*t9
+    t16 = t7 + 0.0825*t10
+    t17 = c4*t8 - s4*t3
+    t18 = c4*t9 - s4*t4
+    t19 = c4*t10 + s4*c2
+    t20 = -c4*t3 - s4*t8
+    t21 = -c4*t4 - s4*t9
+    t22 = c4*c2 - s4*t10
+    t23 = t14 - 0.0825*t17 + 0.384*t20
+    t24 = t15 - 0.0825*t18 + 0.384*t21
+    t25 = t16 - 0.0825*t19 + 0.384*t22
+    t26 = c5*t17 + s5*t11
+    t27 = c5*t18 + s5*t12
+    t28 = c5*t19 + s5*t13
+    t29 = c5*t11 - s5*t17
+    t30 = c5*t12 - s5*t18
+    t31 = c5*t13 - s5*t19
+    t32 = c6*t26 + s6*t20
+    t33 = c6*t27 + s6*t21
+    t34 = c6*t28 + s6*t22
+    t35 = c6*t20 - s6*t26
+    t36 = c6*t21 - s6*t27
+    t37 = c6*t22 - s6*t28
+    t38 = t23 + 0.088*t32
+    t39 = t24 + 0.088*t33
+    t40 = t25 + 0.088*t34
+    t41 = c7*t32 - s7*t29
+    t42 = c7*t33 - s7*t30
+    t43 = c7*t34 - s7*t31
+    t44 = -c7*t29 - s7*t32
+    t45 = -c7*t30 - s7*t33
+    t46 = -c7*t31 - s7*t34
+    t47 = t38 - 0.21*t35
+    t48 = t39 - 0.21*t36
+    t49 = t40 - 0.21*t37
+    t50 = 0.7071067811865476*t41 - 0.7071067811865475*t44
+    t51 = 0.7071067811865476*t42 - 0.7071067811865475*t45
+    t52 = 0.7071067811865476*t43 - 0.7071067811865475*t46
+    t53 = 0.7071067811865476*t44 + 0.7071067811865475*t41
+    t54 = 0.7071067811865476*t45 + 0.7071067811865475*t42
+    t55 = 0.7071067811865476*t46 + 0.7071067811865475*t43
+    jointPositions = np.array([[0.0, 0.0, 0.333], [0.0, 0.0, 0.333], [t5, t6, t7], [t14, t15, t16], [t23, t24, t25], [t23, t24, t25], [t38, t39, t40]])
+    T0e = np.array([[t50, t53, -t35, t47], [t51, t54, -t36, t48], [t52, t55, -t37, t49], [0., 0., 0., 1.]])
+    return jointPositions, T0e
+
+
+def _forward_with_jacobian_single(q):
+    """
+    forward_with_jacobian for a single configuration
+    """
+
+    # q is a list of 7 floats
+    c1 = math.cos(q[0])
+    s1 = math.sin(q[0])
+    c2 = math.cos(q[1])
+    s2 = math.sin(q[1])
+    c3 = math.cos(q[2])
+    s3 = math.sin(q[2])
+    c4 = math.cos(q[3])
+    s4 = math.sin(q[3])
+    c5 = math.cos(q[4])
+    s5 = math.sin(q[4])
+    c6 = math.cos(q[5])
+    s6 = math.sin(q[5])
+    c7 = math.cos(q[6])
+    s7 = math.sin(q[6])
+    t1 = c2*c1
+    t2 = c2*s1
+    t3 = -s2*c1
+    t4 = -s2*s1
+    t5 = -0.316*t3
+    t6 = -0.316*t4
+    t7 = 0.316*c2 + 0.333
+    t8 = c3*t1 - s3*s1
+    t9 = c3*t2 + s3*c1
+    t10 = -c3*s2
+    t11 = -c3*s1 - s3*t1
+    t12 = c3*c1 - s3*t2
+    t13 = s3*s2
+    t14 = t5 + 0.0825*t8
+    t15 = t6 + 0.0825*t9
+    t16 = t7 + 0.0825*t10
+    t17 = c4*t8 - s4*t3
+    t18 = c4*t9 - s4*t4
+    t19 = c4*t10 + s4*c2
+    t20 = -c4*t3 - s4*t8
+    t21 = -c4*t4 - s4*t9
+    t22 = c4*c2 - s4*t10
+    t23 = t14 - 0.0825*t17 + 0.384*t20
+    t24 = t15 - 0.0825*t18 + 0.384*t21
+    t25 = t16 - 0.0825*t19 + 0.384*t22
+    t26 = c5*t17 + s5*t11
+    t27 = c5*t18 + s5*t12
+    t28 = c5*t19 + s5*t13
+    t29 = c5*t11 - s5*t17
+    t30 = c5*t12 - s5*t18
+    t31 = c5*t13 - s5*t19
+    t32 = c6*t26 + s6*t20
+    t33 = c6*t27 + s6*t21
+    t34 = c6*t28 + s6*t22
+    t35 = c6*t20 - s6*t26
+    t36 = c6*t21 - s6*t27
+    t37 = c6*t22 - s6*t28
+    t38 = t23 + 0.088*t32
+    t39 = t24 + 0.088*t33
+    t40 = t25 + 0.088*t34
+    t41 = c7*t32 - s7*t29
+    t42 = c7*t33 - s7*t30
+    t43 = c7*t34 - s7*t31
+    t44 = -c7*t29 - s7*t32
+    t45 = -c7*t30 - s7*t33
+    t46 = -c7*t31 - s7*t34
+    t47 = t38 - 0.21*t35
+    t48 = t39 - 0.21*t36
+    t49 = t40 - 0.21*t37
+    t50 = 0.7071067811865476*t41 - 0.7071067811865475*t44
+    t51 = 0.7071067811865476*t42 - 0.7071067811865475*t45
+    t52 = 0.7071067811865476*t43 - 0.7071067811865475*t46
+    t53 = 0.7071067811865476*t44 + 0.7071067811865475*t41
+    t54 = 0.7071067811865476*t45 + 0.7071067811865475*t42
+    t55 = 0.7071067811865476*t46 + 0.7071067811865475*t43
+    t56 = t49 - 0.333
+    t57 = c1*t56
+    t58 = s1*t56
+    t59 = -s1*t48 - c1*t47
+    t60 = t47 - t5
+    t61 = t48 - t6
+    t62 = t49 - t7
+    t63 = -t4*t62 - c2*t61
+    t64 = c2*t60 + t3*t62
+    t65 = -t3*t61 + t4*t60
+    t66 = t47 - t14
+    t67 = t48 - t15
+    t68 = t49 - t16
+    t69 = -t12*t68 + t13*t67
+    t70 = -t13*t66 + t11*t68
+    t71 = -t11*t67 + t12*t66
+    t72 = t47 - t23
+    t73 = t48 - t24
+    t74 = t49 - t25
+    t75 = t21*t74 - t22*t73
+    t76 = t22*t72 - t20*t74
+    t77 = t20*t73 - t21*t72
+    t78 = -t30*t74 + t31*t73
+    t79 = -t31*t72 + t29*t74
+    t80 = -t29*t73 + t30*t72
+    t81 = t47 - t38
+    t82 = t48 - t39
+    t83 = t49 - t40
+    t84 = -t36*t83 + t37*t82
+    t85 = -t37*t81 + t35*t83
+    t86 = -t35*t82 + t36*t81
+    T0e = np.array([[t50, t53, -t35, t47], [t51, t54, -t36, t48], [t52, t55, -t37, t49], [0., 0., 0., 1.]])
+    frames = np.array([[[c1, -s1, 0.0, 0.0], [s1, c1, 0.0, 0.0], [0.0, 0.0, 1.0, 0.333], [0., 0., 0., 1.]], [[t1, t3, -s1, 0.0], [t2, t4, c1, 0.0], [-s2, -c2, 0.0, 0.333], [0., 0., 0., 1.]], [[t8, t11, -t3, t5], [t9, t12, -t4, t6], [t10, t13, c2, t7], [0., 0., 0., 1.]], [[t17, t20, -t11, t14], [t18, t21, -t12, t15], [t19, t22, -t13, t16], [0., 0., 0., 1.]], [[t26, t29, t20, t23], [t27, t30, t21, t24], [t28, t31, t22, t25], [0., 0., 0., 1.]], [[t32, t35, -t29, t23], [t33, t36, -t30, t24], [t34, t37, -t31, t25], [0., 0., 0., 1.]], [[t41, t44, -t35, t38], [t42, t45, -t36, t39], [t43, t46, -t37, t40], [0., 0., 0., 1.]]])
+    J = np.array([[-t48, t57, t63, t69, t75, t78, t84], [t47, t58, t64, t70, t76, t79, t85], [0.0, t59, t65, t71, t77, t80, t86], [0.0, -s1, -t3, -t11, t20, -t29, -t35], [0.0, c1, -t4, -t12, t21, -t30, -t36], [1.0, 0.0, c2, -t13, t22, -t31, -t37]])
+    return T0e, frames, J
+
+
+def _forward_batch(q):
+    """
+    forward for a batch of configurations
+    """
+
+    # q is a 7 x N array
+    N = q.shape[1]
+    c1 = np.cos(q[0])
+    s1 = np.sin(q[0])
+    c2 = np.cos(q[1])
+    s2 = np.sin(q[1])
+    c3 = np.cos(q[2])
+    s3 = np.sin(q[2])
+    c4 = np.cos(q[3])
+    s4 = np.sin(q[3])
+    c5 = np.cos(q[4])
+    s5 = np.sin(q[4])
+    c6 = np.cos(q[5])
+    s6 = np.sin(q[5])
+    c7 = np.cos(q[6])
+    s7 = np.sin(q[6])
+    t1 = c2*c1
+    t2 = c2*s1
+    t3 = -s2*c1
+    t4 = -s2*s1
+    t5 = -0.316*t3
+    t6 = -0.316*t4
+    t7 = 0.316*c2 + 0.333
+    t8 = c3*t1 - s3*s1
+    t9 = c3*t2 + s3*c1
+    t10 = -c3*s2
+    t11 = -c3*s1 - s3*t1
+    t12 = c3*c1 - s3*t2
+    t13 = s3*s2
+    t14 = t5 + 0.0825*t8
+    t15 = t6 + 0.0825*t9
+    t16 = t7 + 0.0825*t10
+    t17 = c4*t8 - s4*t3
+    t18 = c4*t9 - s4*t4
+    t19 = c4*t10 + s4*c2
+    t20 = -c4*t3 - s4*t8
+    t21 = -c4*t4 - s4*t9
+    t22 = c4*c2 - s4*t10
+    t23 = t14 - 0.0825*t17 + 0.384*t20
+    t24 = t15 - 0.0825*t18 + 0.384*t21
+    t25 = t16 - 0.0825*t19 + 0.384*t22
+    t26 = c5*t17 + s5*t11
+    t27 = c5*t18 + s5*t12
+    t28 = c5*t19 + s5*t13
+    t29 = c5*t11 - s5*t17
+    t30 = c5*t12 - s5*t18
+    t31 = c5*t13 - s5*t19
+    t32 = c6*t26 + s6*t20
+    t33 = c6*t27 + s6*t21
+    t34 = c6*t28 + s6*t22
+    t35 = c6*t20 - s6*t26
+    t36 = c6*t21 - s6*t27
+    t37 = c6*t22 - s6*t28
+    t38 = t23 + 0.088*t32
+    t39 = t24 + 0.088*t33
+    t40 = t25 + 0.088*t34
+    t41 = c7*t32 - s7*t29
+    t42 = c7*t33 - s7*t30
+    t43 = c7*t34 - s7*t31
+    t44 = -c7*t29 - s7*t32
+    t45 = -c7*t30 - s7*t33
+    t46 = -c7*t31 - s7*t34
+    t47 = t38 - 0.21*t35
+    t48 = t39 - 0.21*t36
+    t49 = t40 - 0.21*t37
+    t50 = 0.7071067811865476*t41 - 0.7071067811865475*t44
+    t51 = 0.7071067811865476*t42 - 0.7071067811865475*t45
+    t52 = 0.7071067811865476*t43 - 0.7071067811865475*t46
+    t53 = 0.7071067811865476*t44 + 0.7071067811865475*t41
+    t54 = 0.7071067811865476*t45 + 0.7071067811865475*t42
+    t55 = 0.7071067811865476*t46 + 0.7071067811865475*t43
+    jointPositions = np.empty((7, 3, N))
+    jointPositions[0, 0] = 0.0
+    jointPositions[0, 1] = 0.0
+    jointPositions[0, 2] = 0.333
+    jointPositions[1, 0] = 0.0
+    jointPositions[1, 1] = 0.0
+    jointPositions[1, 2] = 0.333
+    jointPositions[2, 0] = t5
+    jointPositions[2, 1] = t6
+    jointPositions[2, 2] = t7
+    jointPositions[3, 0] = t14
+    jointPositions[3, 1] = t15
+    jointPositions[3, 2] = t16
+    jointPositions[4, 0] = t23
+    jointPositions[4, 1] = t24
+    jointPositions[4, 2] = t25
+    jointPositions[5, 0] = t23
+    jointPositions[5, 1] = t24
+    jointPositions[5, 2] = t25
+    jointPositions[6, 0] = t38
+    jointPositions[6, 1] = t39
+    jointPositions[6, 2] = t40
+    T0e = np.zeros((4, 4, N))
+    T0e[0, 0] = t50
+    T0e[1, 0] = t51
+    T0e[2, 0] = t52
+    T0e[0, 1] = t53
+    T0e[1, 1] = t54
+    T0e[2, 1] = t55
+    T0e[0, 2] = -t35
+    T0e[1, 2] = -t36
+    T0e[2, 2] = -t37
+    T0e[0, 3] = t47
+    T0e[1, 3] = t48
+    T0e[2, 3] = t49
+    T0e[3, 3] = 1.
+    return np.moveaxis(jointPositions, -1, 0), np.moveaxis(T0e, -1, 0)
+
+
+def _forward_with_jacobian_batch(q):
+    """
+    forward_with_jacobian for a batch of configurations
+    """
+
+    # q is a 7 x N array
+    N = q.shape[1]
+    c1 = np.cos(q[0])
+    s1 = np.sin(q[0])
+    c2 = np.cos(q[1])
+    s2 = np.sin(q[1])
+    c3 = np.cos(q[2])
+    s3 = np.sin(q[2])
+    c4 = np.cos(q[3])
+    s4 = np.sin(q[3])
+    c5 = np.cos(q[4])
+    s5 = np.sin(q[4])
+    c6 = np.cos(q[5])
+    s6 = np.sin(q[5])
+    c7 = np.cos(q[6])
+    s7 = np.sin(q[6])
+    t1 = c2*c1
+    t2 = c2*s1
+    t3 = -s2*c1
+    t4 = -s2*s1
+    t5 = -0.316*t3
+    t6 = -0.316*t4
+    t7 = 0.316*c2 + 0.333
+    t8 = c3*t1 - s3*s1
+    t9 = c3*t2 + s3*c1
+    t10 = -c3*s2
+    t11 = -c3*s1 - s3*t1
+    t12 = c3*c1 - s3*t2
+    t13 = s3*s2
+    t14 = t5 + 0.0825*t8
+    t15 = t6 + 0.0825*t9
+    t16 = t7 + 0.0825*t10
+    t17 = c4*t8 - s4*t3
+    t18 = c4*t9 - s4*t4
+    t19 = c4*t10 + s4*c2
+    t20 = -c4*t3 - s4*t8
+    t21 = -c4*t4 - s4*t9
+    t22 = c4*c2 - s4*t10
+    t23 = t14 - 0.0825*t17 + 0.384*t20
+    t24 = t15 - 0.0825*t18 + 0.384*t21
+    t25 = t16 - 0.0825*t19 + 0.384*t22
+    t26 = c5*t17 + s5*t11
+    t27 = c5*t18 + s5*t12
+    t28 = c5*t19 + s5*t13
+    t29 = c5*t11 - s5*t17
+    t30 = c5*t12 - s5*t18
+    t31 = c5*t13 - s5*t19
+    t32 = c6*t26 + s6*t20
+    t33 = c6*t27 + s6*t21
+    t34 = c6*t28 + s6*t22
+    t35 = c6*t20 - s6*t26
+    t36 = c6*t21 - s6*t27
+    t37 = c6*t22 - s6*t28
+    t38 = t23 + 0.088*t32
+    t39 = t24 + 0.088*t33
+    t40 = t25 + 0.088*t34
+    t41 = c7*t32 - s7*t29
+    t42 = c7*t33 - s7*t30
+    t43 = c7*t34 - s7*t31
+    t44 = -c7*t29 - s7*t32
+    t45 = -c7*t30 - s7*t33
+    t46 = -c7*t31 - s7*t34
+    t47 = t38 - 0.21*t35
+    t48 = t39 - 0.21*t36
+    t49 = t40 - 0.21*t37
+    t50 = 0.7071067811865476*t41 - 0.7071067811865475*t44
+    t51 = 0.7071067811865476*t42 - 0.7071067811865475*t45
+    t52 = 0.7071067811865476*t43 - 0.7071067811865475*t46
+    t53 = 0.7071067811865476*t44 + 0.7071067811865475*t41
+    t54 = 0.7071067811865476*t45 + 0.7071067811865475*t42
+    t55 = 0.7071067811865476*t46 + 0.7071067811865475*t43
+    t56 = t49 - 0.333
+    t57 = c1*t56
+    t58 = s1*t56
+    t59 = -s1*t48 - c1*t47
+    t60 = t47 - t5
+    t61 = t48 - t6
+    t62 = t49 - t7
+    t63 = -t4*t62 - c2*t61
+    t64 = c2*t60 + t3*t62
+    t65 = -t3*t61 + t4*t60
+    t66 = t47 - t14
+    t67 = t48 - t15
+    t68 = t49 - t16
+    t69 = -t12*t68 + t13*t67
+    t70 = -t13*t66 + t11*t68
+    t71 = -t11*t67 + t12*t66
+    t72 = t47 - t23
+    t73 = t48 - t24
+    t74 = t49 - t25
+    t75 = t21*t74 - t22*t73
+    t76 = t22*t72 - t20*t74
+    t77 = t20*t73 - t21*t72
+    t78 = -t30*t74 + t31*t73
+    t79 = -t31*t72 + t29*t74
+    t80 = -t29*t73 + t30*t72
+    t81 = t47 - t38
+    t82 = t48 - t39
+    t83 = t49 - t40
+    t84 = -t36*t83 + t37*t82
+    t85 = -t37*t81 + t35*t83
+    t86 = -t35*t82 + t36*t81
+    T0e = np.zeros((4, 4, N))
+    T0e[0, 0] = t50
+    T0e[1, 0] = t51
+    T0e[2, 0] = t52
+    T0e[0, 1] = t53
+    T0e[1, 1] = t54
+    T0e[2, 1] = t55
+    T0e[0, 2] = -t35
+    T0e[1, 2] = -t36
+    T0e[2, 2] = -t37
+    T0e[0, 3] = t47
+    T0e[1, 3] = t48
+    T0e[2, 3] = t49
+    T0e[3, 3] = 1.
+    frames = np.zeros((7, 4, 4, N))
+    frames[0][0, 0] = c1
+    frames[0][1, 0] = s1
+    frames[0][2, 0] = 0.0
+    frames[0][0, 1] = -s1
+    frames[0][1, 1] = c1
+    frames[0][2, 1] = 0.0
+    frames[0][0, 2] = 0.0
+    frames[0][1, 2] = 0.0
+    frames[0][2, 2] = 1.0
+    frames[0][0, 3] = 0.0
+    frames[0][1, 3] = 0.0
+    frames[0][2, 3] = 0.333
+    frames[0][3, 3] = 1.
+    frames[1][0, 0] = t1
+    frames[1][1, 0] = t2
+    frames[1][2, 0] = -s2
+    frames[1][0, 1] = t3
+    frames[1][1, 1] = t4
+    frames[1][2, 1] = -c2
+    frames[1][0, 2] = -s1
+    frames[1][1, 2] = c1
+    frames[1][2, 2] = 0.0
+    frames[1][0, 3] = 0.0
+    frames[1][1, 3] = 0.0
+    frames[1][2, 3] = 0.333
+    frames[1][3, 3] = 1.
+    frames[2][0, 0] = t8
+    frames[2][1, 0] = t9
+    frames[2][2, 0] = t10
+    frames[2][0, 1] = t11
+    frames[2][1, 1] = t12
+    frames[2][2, 1] = t13
+    frames[2][0, 2] = -t3
+    frames[2][1, 2] = -t4
+    frames[2][2, 2] = c2
+    frames[2][0, 3] = t5
+    frames[2][1, 3] = t6
+    frames[2][2, 3] = t7
+    frames[2][3, 3] = 1.
+    frames[3][0, 0] = t17
+    frames[3][1, 0] = t18
+    frames[3][2, 0] = t19
+    frames[3][0, 1] = t20
+    frames[3][1, 1] = t21
+    frames[3][2, 1] = t22
+    frames[3][0, 2] = -t11
+    frames[3][1, 2] = -t12
+    frames[3][2, 2] = -t13
+    frames[3][0, 3] = t14
+    frames[3][1, 3] = t15
+    frames[3][2, 3] = t16
+    frames[3][3, 3] = 1.
+    frames[4][0, 0] = t26
+    frames[4][1, 0] = t27
+    frames[4][2, 0] = t28
+    frames[4][0, 1] = t29
+    frames[4][1, 1] = t30
+    frames[4][2, 1] = t31
+    frames[4][0, 2] = t20
+    frames[4][1, 2] = t21
+    frames[4][2, 2] = t22
+    frames[4][0, 3] = t23
+    frames[4][1, 3] = t24
+    frames[4][2, 3] = t25
+    frames[4][3, 3] = 1.
+    frames[5][0, 0] = t32
+    frames[5][1, 0] = t33
+    frames[5][2, 0] = t34
+    frames[5][0, 1] = t35
+    frames[5][1, 1] = t36
+    frames[5][2, 1] = t37
+    frames[5][0, 2] = -t29
+    frames[5][1, 2] = -t30
+    frames[5][2, 2] = -t31
+    frames[5][0, 3] = t23
+    frames[5][1, 3] = t24
+    frames[5][2, 3] = t25
+    frames[5][3, 3] = 1.
+    frames[6][0, 0] = t41
+    frames[6][1, 0] = t42
+    frames[6][2, 0] = t43
+    frames[6][0, 1] = t44
+    frames[6][1, 1] = t45
+    frames[6][2, 1] = t46
+    frames[6][0, 2] = -t35
+    frames[6][1, 2] = -t36
+    frames[6][2, 2] = -t37
+    frames[6][0, 3] = t38
+    frames[6][1, 3] = t39
+    frames[6][2, 3] = t40
+    frames[6][3, 3] = 1.
+    J = np.empty((6, 7, N))
+    J[0, 0] = -t48
+    J[1, 0] = t47
+    J[2, 0] = 0.0
+    J[3, 0] = 0.0
+    J[4, 0] = 0.0
+    J[5, 0] = 1.0
+    J[0, 1] = t57
+    J[1, 1] = t58
+    J[2, 1] = t59
+    J[3, 1] = -s1
+    J[4, 1] = c1
+    J[5, 1] = 0.0
+    J[0, 2] = t63
+    J[1, 2] = t64
+    J[2, 2] = t65
+    J[3, 2] = -t3
+    J[4, 2] = -t4
+    J[5, 2] = c2
+    J[0, 3] = t69
+    J[1, 3] = t70
+    J[2, 3] = t71
+    J[3, 3] = -t11
+    J[4, 3] = -t12
+    J[5, 3] = -t13
+    J[0, 4] = t75
+    J[1, 4] = t76
+    J[2, 4] = t77
+    J[3, 4] = t20
+    J[4, 4] = t21
+    J[5, 4] = t22
+    J[0, 5] = t78
+    J[1, 5] = t79
+    J[2, 5] = t80
+    J[3, 5] = -t29
+    J[4, 5] = -t30
+    J[5, 5] = -t31
+    J[0, 6] = t84
+    J[1, 6] = t85
+    J[2, 6] = t86
+    J[3, 6] = -t35
+    J[4, 6] = -t36
+    J[5, 6] = -t37
+    return np.moveaxis(T0e, -1, 0), np.moveaxis(frames, -1, 0), np.moveaxis(J, -1, 0)
+
+
+def forward(q):
+    """
+    Closed-form equivalent of FK.forward for q of shape (7,) or (N, 7)
+    """
+
+    q = np.asarray(q, dtype=float)
+    if q.ndim == 1:
+        return _forward_single(q.tolist())
+    return _forward_batch(q.T)
+
+
+def forward_with_jacobian(q):
+    """
+    Closed-form equivalent of FK.forward_with_jacobian for q of shape (7,) or (N, 7)
+    """
+
+    q = np.asarray(q, dtype=float)
+    if q.ndim == 1:
+        return _forward_with_jacobian_single(q.tolist())
+    return _forward_with_jacobian_batch(q.T)
+
+
+def jacobian(q):
+    """
+    Geometric Jacobian (6, 7) or (N, 6, 7)
+    """
+
+    return forward_with_jacobian(q)[2]
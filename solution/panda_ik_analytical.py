@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Closed-form inverse kinematics of the Panda for a given value of q7.
+
+With q7 fixed, frame 6 follows from the target, and the remaining joints are
+found geometrically (in the spirit of He and Liu, "Analytical Inverse
+Kinematics for Franka Emika Panda", 2021):
+
+- the origin of frame 6 (where the axes of joints 5 and 6 meet) and the
+  shoulder (origin of frames 1 and 2) are at a distance that only depends on
+  q4, which gives two candidates for q4;
+- the shoulder seen from frame 6 then gives q5 (two branches) and q6;
+- the rotation of frame 3 is Rz(q1) Ry(q2) Rz(q3), from which q1, q2, q3 are
+  read as ZYZ Euler angles (two branches).
+
+This relies on the Panda's twist angles (alpha) in FK.dh_params; the lengths
+are taken from FK. Branches that exist are exact (to round-off); solve can
+still check them with the forward kinematics (verify=True).
+"""
+import numpy as np
+
+from solution.transformation_utils import transformation
+
+
+def _dh(a, alpha, d, theta):
+    # Batch of modified DH transforms, shape theta.shape + (4, 4)
+    ct, st = np.cos(theta), np.sin(theta)
+    ca, sa = np.cos(alpha), np.sin(alpha)
+    T = np.zeros(np.shape(theta) + (4, 4))
+    T[..., 0, 0], T[..., 0, 1], T[..., 0, 3] = ct, -st, a
+    T[..., 1, 0], T[..., 1, 1], T[..., 1, 2], T[..., 1, 3] = st * ca, ct * ca, -sa, -d * sa
+    T[..., 2, 0], T[..., 2, 1], T[..., 2, 2], T[..., 2, 3] = st * sa, ct * sa, ca, d * ca
+    T[..., 3, 3] = 1.
+    return T
+
+
+class AnalyticalIK():
+
+    def __init__(self, fk, lower, upper, tolerance=1e-6):
+        """
+        INPUTS:
+        fk - FK instance providing the DH parameters
+
+        lower, upper - joint limits
+
+        tolerance - [m, rad] pose error above which a candidate is rejected
+        """
+
+        self.fk = fk
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.tolerance = tolerance
+
+        a, alpha, d = np.asarray(fk.dh_params, dtype=float).T
+        self.dh = a, alpha, d
+        self.shoulder = np.array([0., 0., d[0]])
+        self.d3, self.a4, self.a5, self.d5 = d[2], a[3], a[4], d[4]
+
+        # |shoulder - wrist|^2 = k0 + k_cos cos(q4) + k_sin sin(q4)
+        self.k0 = self.d3**2 + self.a4**2 + self.a5**2 + self.d5**2
+        k_cos = 2. * (self.a5 * self.a4 + self.d5 * self.d3)
+        k_sin = 2. * (self.a5 * self.d3 - self.d5 * self.a4)
+        self.k_norm = np.hypot(k_cos, k_sin)
+        self.k_phase = np.arctan2(k_sin, k_cos)
+
+        # End effector relative to frame 7
+        self.T7e_inv = transformation.inverse(_dh(a[7], alpha[7], d[7], fk.ee_theta))
+
+    def _link(self, i, theta):
+        a, alpha, d = self.dh
+        return _dh(a[i], alpha[i], d[i], theta)
+
+    def candidates(self, target, q7):
+        """
+        All 8 branches of every q7, as a M x 8 x 7 array (NaN where a branch
+        does not exist). They are not checked against the limits nor the target
+        """
+
+        q7 = np.atleast_1d(np.asarray(q7, dtype=float))
+        M = len(q7)
+        T06 = np.asarray(target, dtype=float) @ self.T7e_inv @ transformation.inverse(self._link(6, q7))
+
+        # Shoulder seen from frame 6
+        p = (np.swapaxes(T06[:, :3, :3], -1, -2) @ (self.shoulder - T06[:, :3, 3])[..., np.newaxis])[..., 0]
+
+        # q4: two branches (M, 2)
+        with np.errstate(invalid='ignore'):
+            elbow = np.arccos((np.sum(p**2, axis=-1) - self.k0) / self.k_norm)
+        q4 = self.k_phase + np.stack((elbow, -elbow), axis=-1)
+        q4 = (q4 + np.pi) % (2 * np.pi) - np.pi
+
+        # Shoulder seen from frame 4, relative to the wrist: v_x along x4, v_y along z5
+        s4, c4 = np.sin(q4), np.cos(q4)
+        v_x = -self.d3 * s4 - self.a4 * c4 - self.a5
+        v_y = -self.d3 * c4 + self.a4 * s4 - self.d5
+
+        # q5, q6: two branches of the sign of cos(q5) (M, 2, 2)
+        s5 = (p[:, 2, np.newaxis] / v_x)[..., np.newaxis]
+        with np.errstate(invalid='ignore'):
+            c5 = np.sqrt(1. - s5**2) * np.array([1., -1.])
+        q5 = np.arctan2(s5, c5) * np.ones((1, 2, 2))
+        q6 = np.arctan2(v_y[..., np.newaxis], v_x[..., np.newaxis] * c5) - np.arctan2(p[:, 1], p[:, 0])[:, np.newaxis, np.newaxis]
+        # Joint 6 is the only one whose range is not within [-pi, pi]
+        q6 = (q6 - self.lower[5]) % (2 * np.pi) + self.lower[5]
+        q4 = q4[..., np.newaxis] * np.ones((1, 1, 2))
+
+        # q1, q2, q3 from the rotation of frame 3 (M, 2, 2, 2)
+        T36 = self._link(3, q4) @ self._link(4, q5) @ self._link(5, q6)
+        R = (T06[:, np.newaxis, np.newaxis] @ transformation.inverse(T36))[..., :3, :3]
+        s2 = np.hypot(R[..., 0, 2], R[..., 1, 2])[..., np.newaxis] * np.array([1., -1.])
+        q2 = np.arctan2(s2, R[..., 2, 2, np.newaxis])
+        sign = np.sign(s2)
+        q1 = np.arctan2(sign * R[..., 1, 2, np.newaxis], sign * R[..., 0, 2, np.newaxis])
+        q3 = np.arctan2(sign * R[..., 2, 1, np.newaxis], -sign * R[..., 2, 0, np.newaxis])
+
+        # q2 = 0: only q1 + q3 is defined, it is given to q1
+        aligned = np.abs(s2) < 1e-9
+        q1 = np.where(aligned, np.arctan2(R[..., 1, 0], R[..., 0, 0])[..., np.newaxis], q1)
+        q3 = np.where(aligned, 0., q3)
+
+        Q = np.empty((M, 2, 2, 2, 7))
+        Q[..., 0], Q[..., 1], Q[..., 2] = q1, q2, q3
+        Q[..., 3] = q4[..., np.newaxis]
+        Q[..., 4] = q5[..., np.newaxis]
+        Q[..., 5] = q6[..., np.newaxis]
+        Q[..., 6] = q7[:, np.newaxis, np.newaxis, np.newaxis]
+        return Q.reshape(M, 8, 7)
+
+    def solve(self, target, q7, reference=None, verify=False):
+        """
+        Solutions of target for the given value(s) of q7
+
+        INPUTS:
+        target - 4x4 numpy array of the desired end effector pose
+
+        q7 - a value, or an array of values to sweep
+
+        reference - optional 1x7 vector of joint angles. Solutions are sorted by
+        distance to it
+
+        verify - drop the candidates whose forward kinematics is further than
+        tolerance from target
+
+        OUTPUTS:
+        solutions - K x 7 array of the solutions within the joint limits (K may be 0)
+        """
+
+        Q = self.candidates(target, q7).reshape(-1, 7)
+        Q = Q[np.all(np.isfinite(Q), axis=1)]
+        Q = Q[np.all((Q >= self.lower) & (Q <= self.upper), axis=1)]
+        if verify and len(Q):
+            _, T0e = self.fk.forward_batch(Q)
+            error = np.abs(T0e - target).max(axis=(1, 2))
+            Q = Q[error < self.tolerance]
+        if reference is not None and len(Q):
+            Q = Q[np.argsort(np.linalg.norm(Q - np.asarray(reference, dtype=float)[:7], axis=1))]
+        return Q
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Reachability map of the Panda: a voxel grid of the end effector positions
+reached by the arm, with, for each voxel, the set of approach directions (z
+axis of the end effector) reached there. It is built by sampling random
+configurations within the joint limits through the batched forward kinematics.
+
+The directions are binned into 64 cells of the sphere (the nearest of 64
+Fibonacci points), so the set of a voxel is a 64-bit mask. Queries test one
+bit of a grid dilated by a safety margin, in position and in angle, so that
+only targets clearly out of reach are rejected.
+
+File layout (.npz): lower (3,), voxel_size (), masks (nx, ny, nz) uint64,
+directions (64, 3), and the grid dilated by the margins the map was saved
+with: dilated (nx, ny, nz) uint64, position_margin (), angle_margin (). The
+ROS examples (panda_ros2_gazebo, scripts/rbd/reachability.py) only read the
+dilated grid, so the margins are chosen here.
+
+Usage (from the root of the repository):
+    python -m solution.reachability [output_file] [number_of_samples] [position_margin] [angle_margin]
+"""
+import sys
+import time
+import numpy as np
+
+from solution.solveFK import FK
+from solution.solveIK import IK
+
+
+def fibonacci_sphere(n):
+    """
+    n nearly evenly spread unit vectors, as a n x 3 array
+    """
+
+    i = np.arange(n) + 0.5
+    z = 1. - 2. * i / n
+    azimuth = np.pi * (1. + 5.**0.5) * i
+    r = np.sqrt(1. - z**2)
+    return np.stack((r * np.cos(azimuth), r * np.sin(azimuth), z), axis=-1)
+
+
+class ReachabilityMap():
+
+    def __init__(self, lower, voxel_size, masks, directions):
+        self.lower = np.asarray(lower, dtype=float)
+        self.voxel_size = float(voxel_size)
+        self.masks = np.asarray(masks, dtype=np.uint64)
+        self.directions = np.asarray(directions, dtype=float)
+        self.shape = np.array(self.masks.shape)
+        self.set_margin()
+
+    @classmethod
+    def build(cls, samples=2000000, voxel_size=0.025, lower=(-1.1, -1.1, -0.8), upper=(1.1, 1.1, 1.5),
+              chunk_size=100000, random_state=0):
+        """
+        Sample random configurations within the joint limits
+
+        INPUTS:
+        samples - number of configurations
+
+        voxel_size - [m] edge of the voxels
+
+        lower, upper - corners of the mapped box, in the base frame
+        """
+
+        fk = FK(backend='generated')
+        rng = np.random.default_rng(random_state)
+        lower = np.asarray(lower, dtype=float)
+        shape = np.ceil((np.asarray(upper, dtype=float) - lower) / voxel_size).astype(int)
+        masks = np.zeros(shape, dtype=np.uint64)
+        directions = fibonacci_sphere(64)
+
+        for start in range(0, samples, chunk_size):
+            Q = IK.lower + rng.random((min(chunk_size, samples - start), 7)) * (IK.upper - IK.lower)
+            _, T0e = fk.forward_batch(Q)
+            index = np.floor((T0e[:, :3, 3] - lower) / voxel_size).astype(int)
+            inside = np.all((index >= 0) & (index < shape), axis=-1)
+            bins = np.argmax(T0e[inside, :3, 2] @ directions.T, axis=-1).astype(np.uint64)
+            index = index[inside]
+            np.bitwise_or.at(masks, (index[:, 0], index[:, 1], index[:, 2]), np.uint64(1) << bins)
+
+        return cls(lower, voxel_size, masks, directions)
+
+    def save(self, path):
+        np.savez(path, lower=self.lower, voxel_size=self.voxel_size, masks=self.masks, directions=self.directions,
+                 dilated=self._dilated, position_margin=self.position_margin, angle_margin=self.angle_margin)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            reachability = cls(data['lower'], data['voxel_size'], data['masks'], data['directions'])
+            if 'position_margin' in data:
+                reachability.set_margin(float(data['position_margin']), float(data['angle_margin']))
+            return reachability
+
+    def set_margin(self, position_margin=0.05, angle_margin=0.35):
+        """
+        Safety margin of the queries: a target is only rejected if no sample
+        came within position_margin [m] of it with an approach direction
+        within angle_margin [rad] of its own (up to the size of the bins)
+        """
+
+        self.position_margin = position_margin
+        self.angle_margin = angle_margin
+
+        # Spatial dilation: union of the masks of the voxels within the margin
+        r = int(np.ceil(position_margin / self.voxel_size))
+        padded = np.pad(self.masks, r)
+        dilated = np.zeros_like(self.masks)
+        nx, ny, nz = self.shape
+        for dx in range(-r, r + 1):
+            for dy in range(-r, r + 1):
+                for dz in range(-r, r + 1):
+                    if dx**2 + dy**2 + dz**2 <= r**2:
+                        dilated |= padded[r + dx:r + dx + nx, r + dy:r + dy + ny, r + dz:r + dz + nz]
+
+        # Angular dilation: each bin also sets the bins whose centres are within
+        # the margin plus the spacing of the bins
+        spacing = np.sqrt(4. * np.pi / len(self.directions))
+        cos_angle = self.directions @ self.directions.T
+        neighbours = cos_angle >= np.cos(min(angle_margin + spacing, np.pi))
+        self._dilated = np.zeros_like(dilated)
+        for b in range(len(self.directions)):
+            neighbour_mask = np.uint64(np.sum(np.uint64(1) << np.flatnonzero(neighbours[b]).astype(np.uint64)))
+            self._dilated |= np.where((dilated >> np.uint64(b)) & np.uint64(1), neighbour_mask, np.uint64(0))
+        self._any = self._dilated != 0
+
+    def reachable_position(self, position):
+        """
+        False if position [x, y, z] is clearly out of reach, whatever the orientation
+        """
+
+        index = np.floor((np.asarray(position, dtype=float) - self.lower) / self.voxel_size).astype(int)
+        if np.any(index < 0) or np.any(index >= self.shape):
+            return False
+        return bool(self._any[index[0], index[1], index[2]])
+
+    def reachable(self, target):
+        """
+        False if the 4x4 end effector pose target is clearly out of reach
+        """
+
+        target = np.asarray(target, dtype=float)
+        index = np.floor((target[:3, 3] - self.lower) / self.voxel_size).astype(int)
+        if np.any(index < 0) or np.any(index >= self.shape):
+            return False
+        b = np.argmax(self.directions @ target[:3, 2])
+        return bool((int(self._dilated[index[0], index[1], index[2]]) >> int(b)) & 1)
+
+    def reachable_batch(self, targets):
+        """
+        Vectorized reachable for a N x 4 x 4 stack of poses, returns a N boolean array
+        """
+
+        targets = np.asarray(targets, dtype=float).reshape(-1, 4, 4)
+        index = np.floor((targets[:, :3, 3] - self.lower) / self.voxel_size).astype(int)
+        inside = np.all((index >= 0) & (index < self.shape), axis=-1)
+        index[~inside] = 0
+        bins = np.argmax(targets[:, :3, 2] @ self.directions.T, axis=-1).astype(np.uint64)
+        bits = (self._dilated[index[:, 0], index[:, 1], index[:, 2]] >> bins) & np.uint64(1)
+        return inside & (bits == 1)
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    output = args[0] if args else 'panda_reachability.npz'
+    samples = int(float(args[1])) if len(args) > 1 else 2000000
+    position_margin = float(args[2]) if len(args) > 2 else 0.05
+    angle_margin = float(args[3]) if len(args) > 3 else 0.35
+
+    start = time.perf_counter()
+    reachability = ReachabilityMap.build(samples)
+    reachability.set_margin(position_margin, angle_margin)
+    reachability.save(output)
+    print('Wrote {} ({} samples, {:.0%} of the voxels reached, {:.1f} s)'.format(
+        output, samples, np.mean(reachability.masks != 0), time.perf_counter() - start))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""
+Warm-start seeds for IK: a bounded store of solved target poses, indexed by a
+KD-tree, that returns the joint solution of the nearest stored pose.
+
+Poses are compared with a single distance that mixes position and orientation:
+each pose is mapped to the 12-vector [p, w * R / sqrt(2)], where R is the
+flattened rotation matrix. The Euclidean distance between two such vectors is
+sqrt(|dp|^2 + (w * chord)^2), with chord = 2 sin(angle / 2) ~ angle for small
+rotations, so orientation_weight is the number of meters one radian counts for.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class SeedStore():
+
+    # Number of entries added or replaced since the KD-tree was built that are
+    # scanned linearly before it is rebuilt
+    rebuild_after = 64
+
+    def __init__(self, capacity=1000, orientation_weight=0.1, merge_distance=1e-4):
+        """
+        INPUTS:
+        capacity - maximum number of stored poses. When full, the least
+        recently used entry is evicted
+
+        orientation_weight - [m/rad] weight of the orientation in the pose distance
+
+        merge_distance - a pose closer than this to a stored one replaces its
+        solution instead of taking a new entry
+        """
+
+        self.capacity = int(capacity)
+        self.orientation_weight = float(orientation_weight)
+        self.merge_distance = float(merge_distance)
+
+        self._features = np.empty((self.capacity, 12))
+        self._solutions = np.empty((self.capacity, 7))
+        self._last_used = np.empty(self.capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self._tree = None
+        # Entries added or replaced since the tree was built (stale in the tree, if it has them)
+        self._changed = []
+        self._is_changed = np.zeros(self.capacity, dtype=bool)
+
+    def __len__(self):
+        return self._size
+
+    def features(self, targets):
+        """
+        Map 4x4 poses (or a N x 4 x 4 stack) to their 12-vectors
+        """
+
+        targets = np.asarray(targets, dtype=float)
+        position = targets[..., :3, 3]
+        rotation = targets[..., :3, :3].reshape(targets.shape[:-2] + (9,))
+        return np.concatenate((position, rotation * (self.orientation_weight / np.sqrt(2))), axis=-1)
+
+    def _mark_changed(self, i):
+        if not self._is_changed[i]:
+            self._is_changed[i] = True
+            self._changed.append(i)
+
+    def _nearest(self, features, max_distance=np.inf):
+        # Nearest entries of a N x 12 array of features: (distances, indices),
+        # with index -1 where nothing is within max_distance. The tree holds a
+        # snapshot of the entries, the ones changed since are scanned linearly,
+        # and it is only rebuilt once more than rebuild_after have changed
+        if len(self._changed) > self.rebuild_after:
+            self._tree = cKDTree(self._features[:self._size], copy_data=True)
+            self._is_changed[self._changed] = False
+            self._changed = []
+
+        n = len(features)
+        distance = np.full(n, np.inf)
+        index = np.full(n, -1)
+
+        if self._tree is not None:
+            # The nearest entry of the snapshot that did not change since: it
+            # is among the len(changed) + 1 nearest ones
+            k = min(len(self._changed) + 1, self._tree.n)
+            d, i = self._tree.query(features, k=k, distance_upper_bound=max_distance)
+            d, i = d.reshape(n, k), i.reshape(n, k)
+            valid = i < self._tree.n
+            valid[valid] = ~self._is_changed[i[valid]]
+            first = np.argmax(valid, axis=1)
+            found = valid[np.arange(n), first]
+            distance[found] = d[found, first[found]]
+            index[found] = i[found, first[found]]
+
+        if self._changed:
+            changed = np.array(self._changed)
+            d = np.linalg.norm(features[:, np.newaxis] - self._features[changed], axis=-1)
+            j = np.argmin(d, axis=1)
+            d = d[np.arange(n), j]
+            closer = (d < distance) & (d <= max_distance)
+            distance[closer] = d[closer]
+            index[closer] = changed[j[closer]]
+
+        return distance, index
+
+    def add(self, target, q):
+        """
+        Store the joint solution q of the 4x4 pose target
+        """
+
+        feature = self.features(target)
+        self._clock += 1
+
+        if self._size:
+            distance, i = self._nearest(feature[np.newaxis], self.merge_distance)
+            if i[0] >= 0:
+                self._solutions[i[0]] = q[:7]
+                self._last_used[i[0]] = self._clock
+                return
+
+        if self._size < self.capacity:
+            i = self._size
+            self._size += 1
+        else:
+            i = np.argmin(self._last_used)
+        self._features[i] = feature
+        self._solutions[i] = q[:7]
+        self._last_used[i] = self._clock
+        self._mark_changed(i)
+
+    def lookup(self, target, max_distance=np.inf):
+        """
+        Joint solution of the stored pose nearest to target, or None if the
+        store is empty or nothing is within max_distance
+
+        OUTPUTS:
+        q - 1x7 vector of joint angles (a copy)
+
+        distance - pose distance to the stored pose
+        """
+
+        if not self._size:
+            return None, np.inf
+        distance, i = self._nearest(self.features(target)[np.newaxis], max_distance)
+        distance, i = distance[0], i[0]
+        if i < 0:
+            return None, np.inf
+        self._clock += 1
+        self._last_used[i] = self._clock
+        return self._solutions[i].copy(), distance
+
+    def lookup_batch(self, targets, default, max_distance=np.inf):
+        """
+        Seeds for a N x 4 x 4 stack of targets. Rows without a stored pose
+        within max_distance get default
+
+        OUTPUTS:
+        seeds - N x 7 array
+        """
+
+        seeds = np.tile(np.asarray(default, dtype=float)[:7], (len(targets), 1))
+        if not self._size:
+            return seeds
+        _, index = self._nearest(self.features(targets).reshape(-1, 12), max_distance)
+        found = index >= 0
+        seeds[found] = self._solutions[index[found]]
+        self._clock += 1
+        self._last_used[index[found]] = self._clock
+        return seeds
+
+    def clear(self):
+        self._size = 0
+        self._tree = None
+        self._is_changed[self._changed] = False
+        self._changed = []
+
+    def save(self, path):
+        """
+        Write the store to a .npz file
+        """
+
+        np.savez(path,
+                 features=self._features[:self._size],
+                 solutions=self._solutions[:self._size],
+                 last_used=self._last_used[:self._size],
+                 capacity=self.capacity,
+                 orientation_weight=self.orientation_weight,
+                 merge_distance=self.merge_distance)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        """
+        Read a store written by save. With a smaller capacity, only the most
+        recently used entries are kept
+        """
+
+        with np.load(path) as data:
+            store = cls(capacity=int(data['capacity']) if capacity is None else capacity,
+                        orientation_weight=float(data['orientation_weight']),
+                        merge_distance=float(data['merge_distance']))
+            keep = np.argsort(data['last_used'])[-store.capacity:]
+            n = len(keep)
+            store._features[:n] = data['features'][keep]
+            store._solutions[:n] = data['solutions'][keep]
+            store._last_used[:n] = data['last_used'][keep]
+        store._size = n
+        for i in range(n):
+            store._mark_changed(i)
+        store._clock = int(store._last_used[:n].max()) if n else 0
+        return store
@@ -1,53 +1,126 @@
 #!/usr/bin/env python
+import numpy as np
+from math import pi
 
 class FK():
 
-    def __init__(self):
-        # Define geometric parameters for computing the forward kinematics. 
+    # Rotation about z of the end effector frame relative to frame 7
+    ee_theta = -pi/4
+
+    def __init__(self, incremental=False, backend='chain'):
+        # Define geometric parameters for computing the forward kinematics.
         # The required parameters are provided in the assignment description document.
         self.dh_params = self.init_dh_params()
         self.joint_offsets = self.init_joint_offsets()
 
+        # Constant per-link factors of the DH transforms, computed once here
+        # instead of on every call
+        dh = np.asarray(self.dh_params, dtype=float)
+        self.a = dh[:, 0].copy()
+        self.d = dh[:, 2].copy()
+        self.cos_alpha = np.cos(dh[:, 1])
+        self.sin_alpha = np.sin(dh[:, 1])
+        self.offsets = np.asarray(self.joint_offsets, dtype=float)
+
+        # Buffers used by forward. In incremental mode, the transforms of the
+        # joints that did not change since the previous call are reused
+        self._workspace = self.workspace(incremental=incremental)
+
+        # 'chain' multiplies the DH transforms, 'generated' uses the closed-form
+        # expressions of panda_fk_generated.py (see fk_codegen.py)
+        self.backend = backend
+        self._generated = None
+        if backend == 'generated':
+            from solution import panda_fk_generated
+            if not np.allclose(panda_fk_generated.DH_PARAMS, self.dh_params) or \
+                    not np.allclose(panda_fk_generated.JOINT_OFFSETS, self.joint_offsets) or \
+                    not np.isclose(panda_fk_generated.EE_THETA, self.ee_theta):
+                raise RuntimeError("panda_fk_generated.py is out of date, regenerate it with `python -m solution.fk_codegen`")
+            self._generated = panda_fk_generated
+        elif backend != 'chain':
+            raise ValueError(backend)
+
+    def __reduce__(self):
+        # Pickled as its constructor arguments (the buffers are rebuilt and the
+        # generated module imported again), e.g. for the worker processes of
+        # IK.inverse_multistart
+        return (type(self), (self._workspace.incremental, self.backend))
+
     def init_dh_params(self):
         """
         Initialize dh parameters from all intermediate frames in the form [a, alpha, d]
         (refer to assignment description)
         """
 
-        dh_params = []
+        # Modified (Craig) DH convention, one row per joint. The last row is the
+        # fixed transform from frame 7 to the end effector (rotated by -pi/4 about z)
+        dh_params = [[0.,       0.,    0.333],
+                     [0.,      -pi/2,  0.],
+                     [0.,       pi/2,  0.316],
+                     [0.0825,   pi/2,  0.],
+                     [-0.0825, -pi/2,  0.384],
+                     [0.,       pi/2,  0.],
+                     [0.088,    pi/2,  0.],
+                     [0.,       0.,    0.21]]
         return dh_params
 
     def init_joint_offsets(self):
         """
         Initialize joint position offsets
         relative to intermediate frames defined using
-        DH conventions 
+        DH conventions
         (refer to assignment description)
         """
 
-        joint_offsets = []
+        # The joint centres lie at the origins of the intermediate frames
+        joint_offsets = [[0., 0., 0.] for _ in range(7)]
         return joint_offsets
 
-    def build_dh_transform(self, a, alpha, d, theta):
+    def workspace(self, incremental=False):
+        """
+        Create a new set of preallocated FK buffers (see FKWorkspace)
+        """
+
+        return FKWorkspace(self, incremental=incremental)
+
+    def cache_stats(self):
+        """
+        Prefix cache statistics of forward (see FKWorkspace.cache_stats)
+        """
+
+        return self._workspace.cache_stats()
+
+    def build_dh_transform(self, a, alpha, d, theta, out=None):
         """
         Construct transformation matrix T,
         using DH parameters and conventions
+
+        If out (a 4x4 array) is given, T is written into it instead of a new array
         """
-        
+
         T = []
         # YOUR CODE STARTS HERE
-    
+        ct, st = np.cos(theta), np.sin(theta)
+        ca, sa = np.cos(alpha), np.sin(alpha)
+        T = np.empty((4, 4)) if out is None else out
+        T[0] = ct,      -st,      0.,   a
+        T[1] = st * ca,  ct * ca, -sa, -d * sa
+        T[2] = st * sa,  ct * sa,  ca,  d * ca
+        T[3] = 0.,       0.,       0.,  1.
         # YOUR CODE ENDS HERE
         return T
 
-    def forward(self, q):
+    def forward(self, q, out=None):
         """
         INPUT:
         q - 1x7 vector of joint angles [q0, q1, q2, q3, q4, q5, q6]
 
+        out - optional (jointPositions, T0e) pair of 7x3 and 4x4 arrays to write
+              the result into. Without it, new arrays are returned
+
         OUTPUTS:
         jointPositions - 7 x 3 matrix, where each row corresponds to a rotational joint of the robot
-                         Each row contains the [x,y,z] coordinates in the world frame of the respective 
+                         Each row contains the [x,y,z] coordinates in the world frame of the respective
                          joint's center in meters. The base of the robot is located at [0,0,0].
 
         T0e - a homogeneous transformation matrix,
@@ -57,9 +130,263 @@ class FK():
         jointPositions = []
         T0e = []
         # YOUR CODE STARTS HERE
-    
+        if self._generated is not None:
+            jointPositions, T0e = self._generated.forward(np.asarray(q, dtype=float)[:7])
+            if out is not None:
+                out[0][...] = jointPositions
+                out[1][...] = T0e
+                jointPositions, T0e = out
+        elif out is None:
+            jointPositions, T0e = self._workspace.forward(q)
+            jointPositions, T0e = jointPositions.copy(), T0e.copy()
+        else:
+            jointPositions, T0e = self._workspace.forward(q, out=out)
         # YOUR CODE ENDS HERE
         return jointPositions, T0e
 
+    def forward_batch(self, Q):
+        """
+        Vectorized version of forward over a batch of configurations
+
+        INPUT:
+        Q - N x 7 array of joint angles, one configuration per row
+
+        OUTPUTS:
+        jointPositions - N x 7 x 3 array of joint centres, as returned by forward for each row
+
+        T0e - N x 4 x 4 array of end effector transforms
+        """
+
+        if self._generated is not None:
+            return self._generated.forward(np.atleast_2d(np.asarray(Q, dtype=float))[:, :7])
+
+        frames = self._chain_batch(Q)
+        jointPositions = np.einsum('nijk,ik->nij', frames[:, :7, :3, :3], self.offsets) + frames[:, :7, :3, 3]
+        return jointPositions, frames[:, -1]
+
+    def forward_with_jacobian(self, q):
+        """
+        Forward kinematics and geometric Jacobian from a single pass over the chain
+
+        INPUT:
+        q - 1x7 vector of joint angles [q0, q1, q2, q3, q4, q5, q6]
+
+        OUTPUTS:
+        T0e - 4 x 4 homogeneous transformation of the end effector in the world frame
+
+        frames - 7 x 4 x 4 transformations of the intermediate frames of the joints,
+                 whose z axes are the joint axes
+
+        J - 6 x 7 geometric Jacobian, linear velocity rows first
+        """
+
+        if self._generated is not None:
+            return self._generated.forward_with_jacobian(np.asarray(q, dtype=float)[:7])
+
+        T0e, frames, J = self._workspace.forward_with_jacobian(q)
+        return T0e.copy(), frames.copy(), J.copy()
+
+    def forward_with_jacobian_batch(self, Q):
+        """
+        Vectorized version of forward_with_jacobian over a batch of configurations
+
+        INPUT:
+        Q - N x 7 array of joint angles, one configuration per row
+
+        OUTPUTS:
+        T0e - N x 4 x 4 array of end effector transforms
+
+        frames - N x 7 x 4 x 4 array of the intermediate frames of the joints
+
+        J - N x 6 x 7 array of geometric Jacobians
+        """
+
+        if self._generated is not None:
+            return self._generated.forward_with_jacobian(np.atleast_2d(np.asarray(Q, dtype=float))[:, :7])
+
+        frames = self._chain_batch(Q)
+        z = frames[:, :7, :3, 2]
+        lever = frames[:, -1:, :3, 3] - frames[:, :7, :3, 3]
+
+        J = np.empty((len(frames), 6, 7))
+        J[:, :3] = np.cross(z, lever).transpose(0, 2, 1)
+        J[:, 3:] = z.transpose(0, 2, 1)
+        return frames[:, -1], frames[:, :7], J
+
+    def _chain_batch(self, Q):
+        """
+        N x 8 x 4 x 4 cumulative transforms of the intermediate frames (the last
+        one being the end effector) of a batch of configurations
+        """
+
+        Q = np.atleast_2d(np.asarray(Q, dtype=float))[:, :7]
+        N = Q.shape[0]
+        n_links = len(self.a)
+
+        theta = np.empty((n_links, N))
+        theta[:7] = Q.T
+        theta[7:] = self.ee_theta
+        ct, st = np.cos(theta), np.sin(theta)
+
+        # Propagate the frame axes x, y, z and origin p (each 3 x N) down the chain.
+        # Right-multiplying by a DH transform only mixes the columns of the
+        # current frame, which is much cheaper than stacked 4x4 matmuls
+        x = np.zeros((3, N)); x[0] = 1.
+        y = np.zeros((3, N)); y[1] = 1.
+        z = np.zeros((3, N)); z[2] = 1.
+        p = np.zeros((3, N))
+
+        # Built with the batch dimension last so that every write is contiguous
+        frames = np.zeros((n_links, 4, 4, N))
+        frames[:, 3, 3] = 1.
+        for i in range(n_links):
+            ca, sa = self.cos_alpha[i], self.sin_alpha[i]
+            u = ca * y + sa * z
+            p = p + self.a[i] * x
+            z = ca * z - sa * y
+            p = p + self.d[i] * z
+            x, y = ct[i] * x + st[i] * u, ct[i] * u - st[i] * x
+            frames[i, :3, 0] = x
+            frames[i, :3, 1] = y
+            frames[i, :3, 2] = z
+            frames[i, :3, 3] = p
+        return np.moveaxis(frames, -1, 0)
+
+
+class FKWorkspace():
+    """
+    Preallocated buffers for evaluating the forward kinematics of an FK instance.
+
+    The constant entries of every link transform are filled in once on
+    construction, so a call to forward only updates the joint dependent entries
+    and multiplies in place, without allocating new arrays. A workspace is not
+    thread safe; use one per thread.
+
+    In incremental mode the cumulative transforms of the previous call are kept,
+    and the chain is only recomputed from the first joint whose angle changed.
+    This pays off when only the distal joints move between calls.
+    """
+
+    def __init__(self, fk, incremental=False):
+        self.fk = fk
+        self.incremental = incremental
+        n_links = len(fk.a)
+
+        self.theta = np.zeros(n_links)
+        self.theta[7:] = fk.ee_theta
+        self.cos_theta = np.cos(self.theta)
+        self.sin_theta = np.sin(self.theta)
+
+        # Link transforms A[i] and cumulative transforms T[i] = A[0] ... A[i]
+        self.A = np.zeros((n_links, 4, 4))
+        self.A[:, 0, 3] = fk.a
+        self.A[:, 1, 2] = -fk.sin_alpha
+        self.A[:, 1, 3] = -fk.d * fk.sin_alpha
+        self.A[:, 2, 2] = fk.cos_alpha
+        self.A[:, 2, 3] = fk.d * fk.cos_alpha
+        self.A[:, 3, 3] = 1.
+        self._update_links(slice(None))
+        self.T = np.zeros((n_links, 4, 4))
+
+        self._offset_buffer = np.zeros((7, 3, 1))
+        self.J = np.zeros((6, 7))
+        self.jointPositions = np.zeros((7, 3))
+        self.T0e = self.T[-1]
+
+        # The prefix in T is only valid after a first full evaluation
+        self._valid = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.joints_reused = 0
+        self.joints_computed = 0
+
+    def cache_stats(self):
+        """
+        OUTPUTS:
+        stats - dictionary with the number of calls that reused part of the chain
+                (hits) or recomputed all of it (misses), the total number of joint
+                transforms reused and computed, and the hit rate
+        """
+
+        calls = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'joints_reused': self.joints_reused,
+                'joints_computed': self.joints_computed,
+                'hit_rate': self.hits / calls if calls else 0.}
+
+    def invalidate(self):
+        """
+        Force the next call to recompute the whole chain
+        """
+
+        self._valid = False
+
+    def _update_links(self, joints):
+        # Write the entries of A that depend on theta for the given joints
+        ct, st = self.cos_theta[joints], self.sin_theta[joints]
+        A = self.A[joints]
+        A[:, 0, 0] = ct
+        np.negative(st, out=A[:, 0, 1])
+        np.multiply(st, self.fk.cos_alpha[joints], out=A[:, 1, 0])
+        np.multiply(ct, self.fk.cos_alpha[joints], out=A[:, 1, 1])
+        np.multiply(st, self.fk.sin_alpha[joints], out=A[:, 2, 0])
+        np.multiply(ct, self.fk.sin_alpha[joints], out=A[:, 2, 1])
+
+    def forward(self, q, out=None):
+        """
+        Same as FK.forward, but the returned arrays are the workspace's own
+        buffers (or the ones in out) and are overwritten by the next call
+        """
+
+        # Index of the first joint to recompute; 7 if nothing changed
+        first = 0
+        if self.incremental and self._valid:
+            changed = np.flatnonzero(self.theta[:7] != q[:7])
+            first = int(changed[0]) if changed.size else 7
+
+        if first > 0:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.joints_reused += first
+        self.joints_computed += 7 - first
+
+        if first < 7:
+            self.theta[first:7] = q[first:7]
+            np.cos(self.theta[first:7], out=self.cos_theta[first:7])
+            np.sin(self.theta[first:7], out=self.sin_theta[first:7])
+            self._update_links(slice(first, 7))
+
+            if first == 0:
+                self.T[0] = self.A[0]
+            for i in range(max(first, 1), len(self.T)):
+                np.matmul(self.T[i - 1], self.A[i], out=self.T[i])
+            self._valid = True
+
+        jointPositions, T0e = (self.jointPositions, self.T0e) if out is None else out
+        np.matmul(self.T[:7, :3, :3], self.fk.offsets[:, :, np.newaxis], out=self._offset_buffer)
+        np.add(self._offset_buffer[:, :, 0], self.T[:7, :3, 3], out=jointPositions)
+        if T0e is not self.T0e:
+            T0e[...] = self.T0e
+        return jointPositions, T0e
+
+    def forward_with_jacobian(self, q):
+        """
+        Same as FK.forward_with_jacobian, returning the workspace's own buffers
+        """
+
+        self.forward(q)
+
+        # Column i: [z_i x (p_e - o_i); z_i], with z_i and o_i the axis and
+        # origin of the frame of joint i
+        z = self.T[:7, :3, 2]
+        self.J[:3] = np.cross(z, self.T0e[:3, 3] - self.T[:7, :3, 3]).T
+        self.J[3:] = z.T
+        return self.T0e, self.T[:7], self.J
+
 if __name__ == "__main__":
     pass
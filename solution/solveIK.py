@@ -5,8 +5,49 @@ path_ws = os.path.abspath('../../..')
 sys.path.append(path_ws)
 sys.path.append(path_ws + '/advance_robotics_assignment/')
 sys.path.append(path_ws + '/advance_robotics_assignment/franka_ros_interface')
+import time
 import numpy as np
+from collections import deque, namedtuple
+from concurrent import futures
 from solution.solveFK import FK
+from solution.panda_ik_analytical import AnalyticalIK
+
+def halton(n, dim, skip=1):
+    """
+    First n points (after skipping the first skip ones) of the Halton sequence in [0, 1]^dim
+    """
+
+    primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37][:dim]
+    points = np.zeros((n, dim))
+    for j, base in enumerate(primes):
+        for i in range(n):
+            k, f = i + skip, 1.
+            while k > 0:
+                f /= base
+                points[i, j] += f * (k % base)
+                k //= base
+    return points
+
+# IK of a worker process of IK.inverse_multistart (see _init_worker)
+_worker_ik = None
+
+def _init_worker(cls, settings):
+    # Rebuild the IK of inverse_multistart in a worker process, once per process
+    global _worker_ik
+    _worker_ik = cls()
+    vars(_worker_ik).update(settings)
+
+def _solve_from_seed(target, seed, ik=None):
+    # Runs in a worker process of IK.inverse_multistart, or in the calling
+    # process with its ik
+    ik = _worker_ik if ik is None else ik
+    q_set, success = ik.inverse(target, seed)
+    _, T0e = ik.fk.forward(q_set[-1])
+    translate_vec, rotate_vec = ik.cal_target_transform_vec(target, T0e)
+    return q_set[-1], success, np.linalg.norm(translate_vec) + np.linalg.norm(rotate_vec)
+
+# Outcome of one call to IK.inverse
+IKTelemetry = namedtuple('IKTelemetry', ['solver', 'success', 'iterations', 'position_error', 'rotation_error', 'wall_time', 'timed_out'])
 
 class IK:
 
@@ -16,8 +57,74 @@ class IK:
 
     fk = FK()
 
-    def __init__(self):
-        pass
+    # SOLVER PARAMETERS
+    linear_tol = 1e-4 # [m]
+    angular_tol = 1e-3 # [rad]
+    max_steps = 500
+    min_step_size = 1e-5 # stop when the joint update becomes smaller than this
+    max_step_size = 0.2 # [rad] far from the target, updates are scaled down to this norm
+    damping = 1e-3 # damping of the pseudo-inverse, avoids huge steps near singularities
+
+    # SOLVER STRATEGY
+    # 'dls': fixed damping (solve_ik), iterated until the step vanishes
+    # 'lm': Levenberg-Marquardt damping adapted to the progress, with a backtracking
+    #       line search on the pose error, stopped as soon as the tolerances are met
+    # 'analytical': closed-form solution nearest to the initial guess, over a sweep
+    #       of q7 (see inverse_analytical). Falls back to analytical_fallback
+    # 'staged': position-only damped steps (3-row Jacobian) until the position error
+    #       is below staged_switch_distance, then full pose refinement with staged_refine
+    solver = 'dls'
+    analytical = AnalyticalIK(fk, lower, upper)
+    analytical_q7_samples = 16
+    analytical_fallback = 'lm'
+    staged_switch_distance = 0.1 # [m] position error at which 'staged' switches to the full pose
+    staged_max_position_steps = 50 # the switch happens after at most this many position-only steps
+    staged_max_step_size = 0.5 # [rad] of the position-only steps
+    staged_refine = 'lm'
+    lm_damping = 1e-2 # initial damping (added to the diagonal of J J^T)
+    lm_damping_min = 1e-8
+    lm_damping_max = 1e2
+    lm_max_step_size = 0.5 # [rad]
+    lm_max_backtracks = 6
+    lm_sufficient_decrease = 1e-4 # Armijo constant of the line search
+    deadline_margin = 2e-5 # [s] slack kept in a deadline on top of the measured cost of the final check
+    path_max_joint_step = 0.2 # [rad] inverse_path reports larger joint jumps between waypoints as breaks
+
+    # Seed used when no initial guess is given and the seed store has nothing close
+    neutral = np.array([0, 0, 0, -np.pi/2, 0, np.pi/2, np.pi/4])
+    warm_start_distance = 0.1 # [m] stored poses further than this (see SeedStore) are not used as seeds
+
+    def __init__(self, seed_store=None, database=None, reachability=None):
+        # Optional SeedStore: supplies initial guesses and records the solutions
+        self.seed_store = seed_store
+        # Optional IKDatabase: supplies initial guesses for the targets in its region
+        self.database = database
+        # Optional ReachabilityMap: targets clearly out of reach fail without iterating
+        self.reachability = reachability
+
+        # Process pool of inverse_multistart, created on first use
+        self._executor = None
+        self._executor_workers = None
+        self._executor_settings = None
+        self._pending = []
+
+        # Durations of a solver step, of a closed-form solve and of the final
+        # check of a solution, for the deadline-bound solves (see _deadline_start)
+        self._step_estimate, self._analytical_estimate, self._check_estimate = self._time_deadline_costs()
+
+    def close(self):
+        """
+        Shut down the worker processes of inverse_multistart, if any
+        """
+
+        if self._executor is not None:
+            # shutdown(cancel_futures=True) needs Python 3.9, the jobs that did
+            # not start are cancelled here instead
+            for future in self._pending:
+                future.cancel()
+            self._pending = []
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     @staticmethod
     def calcJacobian(q):
@@ -29,9 +136,9 @@ class IK:
         J - the Jacobian matrix 
         """
 
-        J = []       
+        J = []
         # YOUR CODE STARTS HERE
-
+        _, _, J = IK.fk.forward_with_jacobian(q)
         # YOUR CODE ENDS HERE
         return J
 
@@ -59,11 +166,69 @@ class IK:
         translate_vec = []
         rotate_vec = []
         # YOUR CODE STARTS HERE
+        translate_vec = target[:3, 3] - current[:3, 3]
 
+        # Axis-angle of the rotation taking the current orientation to the target one
+        R = target[:3, :3] @ current[:3, :3].T
+        skew = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+        sin_angle = 0.5 * np.linalg.norm(skew)
+        cos_angle = np.clip(0.5 * (np.trace(R) - 1.), -1., 1.)
+        angle = np.arctan2(sin_angle, cos_angle)
+
+        if sin_angle > 1e-6:
+            rotate_vec = angle / (2. * sin_angle) * skew
+        elif cos_angle > 0.:
+            # Small rotation: the skew part is the rotation vector
+            rotate_vec = 0.5 * skew
+        else:
+            # Rotation by pi: the axis is the dominant column of R + I
+            B = R + np.identity(3)
+            axis = B[:, np.argmax(np.diag(B))]
+            rotate_vec = angle * axis / np.linalg.norm(axis)
         ## YOUR CODE ENDS HERE
 
         return translate_vec, rotate_vec
 
+    @staticmethod
+    def cal_target_transform_vec_batch(targets, currents):
+        """
+        Vectorized version of cal_target_transform_vec
+
+        INPUTS:
+        targets - N x 4 x 4 array of target end effector poses
+
+        currents - N x 4 x 4 array of current end effector poses
+
+        OUTPUTS:
+        translate_vec - N x 3 array of translation vectors
+
+        rotate_vec - N x 3 array of rotation vectors
+        """
+
+        translate_vec = targets[:, :3, 3] - currents[:, :3, 3]
+
+        R = targets[:, :3, :3] @ currents[:, :3, :3].transpose(0, 2, 1)
+        skew = np.stack((R[:, 2, 1] - R[:, 1, 2],
+                         R[:, 0, 2] - R[:, 2, 0],
+                         R[:, 1, 0] - R[:, 0, 1]), axis=-1)
+        sin_angle = 0.5 * np.linalg.norm(skew, axis=-1)
+        cos_angle = np.clip(0.5 * (np.trace(R, axis1=1, axis2=2) - 1.), -1., 1.)
+        angle = np.arctan2(sin_angle, cos_angle)
+
+        # angle / sin(angle) tends to 1 for small rotations
+        scale = np.ones_like(angle)
+        regular = sin_angle > 1e-6
+        scale[regular] = angle[regular] / sin_angle[regular]
+        rotate_vec = 0.5 * scale[:, np.newaxis] * skew
+
+        # Rotations by pi: the axis is the dominant column of R + I
+        for i in np.flatnonzero(~regular & (cos_angle < 0.)):
+            B = R[i] + np.identity(3)
+            axis = B[:, np.argmax(np.diag(B))]
+            rotate_vec[i] = angle[i] * axis / np.linalg.norm(axis)
+
+        return translate_vec, rotate_vec
+
     def check_joint_constraints(self,q,target):
         """
         Check if the given candidate solution respects the joint limits.
@@ -81,7 +246,15 @@ class IK:
         success = False
 
         # YOUR CODE STARTS HERE
-     
+        q = np.asarray(q)[:7]
+        within_limits = np.all(q >= self.lower) and np.all(q <= self.upper)
+
+        _, T0e = self.fk.forward(q)
+        translate_vec, rotate_vec = self.cal_target_transform_vec(target, T0e)
+
+        success = bool(within_limits
+                       and np.linalg.norm(translate_vec) <= self.linear_tol
+                       and np.linalg.norm(rotate_vec) <= self.angular_tol)
         # YOUR CODE ENDS HERE
 
         return success
@@ -104,12 +277,204 @@ class IK:
 
         dq = []
         # YOUR CODE STARTS HERE
-     
+        # A single pass over the chain gives both the current pose and the Jacobian
+        T0e, _, J = IK.fk.forward_with_jacobian(q)
+        translate_vec, rotate_vec = IK.cal_target_transform_vec(target, T0e)
+        error = np.concatenate((translate_vec, rotate_vec))
+
+        # Damped pseudo-inverse: the step is proportional to the pose error,
+        # so it decays to zero as the target is reached
+        dq = J.T @ np.linalg.solve(J @ J.T + IK.damping**2 * np.identity(6), error)
+
+        step_size = np.linalg.norm(dq)
+        if step_size > IK.max_step_size:
+            dq *= IK.max_step_size / step_size
         # YOUR CODE ENDS HERE
 
         return dq
 
-    def inverse(self, target, initial_guess):
+    def warm_start(self, target):
+        """
+        Initial guess for target: interpolated from the database, or the solution
+        of the nearest pose in the seed store, or the neutral configuration
+        """
+
+        if self.database is not None:
+            q = self.database.seed(target @ self.database.frame_offset)
+            if q is not None:
+                return q
+        if self.seed_store is not None:
+            q, _ = self.seed_store.lookup(target, self.warm_start_distance)
+            if q is not None:
+                return q
+        return self.neutral.copy()
+
+    def pose_error(self, q, target):
+        """
+        Norms of the position [m] and rotation [rad] errors of configuration q
+        """
+
+        _, T0e = self.fk.forward(np.asarray(q)[:7])
+        translate_vec, rotate_vec = self.cal_target_transform_vec(target, T0e)
+        return np.linalg.norm(translate_vec), np.linalg.norm(rotate_vec)
+
+    def inverse_analytical(self, target, q7=None, reference=None):
+        """
+        Closed-form solutions of the inverse kinematics
+
+        INPUTS:
+        target - 4x4 numpy array representing the desired transformation from
+        end effector to world
+
+        q7 - value (or array of values) of the last joint. By default, the q7 of
+        reference and analytical_q7_samples values across its range are tried
+
+        reference - optional 1x7 vector of joint angles to rank the solutions by
+
+        OUTPUTS:
+        solutions - K x 7 array of solutions within the joint limits, nearest to
+        reference first. Empty if target is out of reach for these q7
+        """
+
+        if q7 is None:
+            q7 = np.linspace(self.lower[6], self.upper[6], self.analytical_q7_samples)
+            if reference is not None:
+                q7 = np.append(reference[6], q7)
+        return self.analytical.solve(target, q7, reference)
+
+    def _steps_analytical(self, q, target):
+        solutions = self.inverse_analytical(target, reference=q)
+        if len(solutions):
+            yield solutions[0], 1
+        else:
+            yield from self._steps(q, target, self.analytical_fallback)
+
+    def _reachable(self, target):
+        # False for the targets that the reachability map rules out. Checked
+        # once by the entry points, before dispatching to _steps (which
+        # recurses for 'staged' and the 'analytical' fallback)
+        return self.reachability is None or self.reachability.reachable(target)
+
+    def _steps(self, q, target, solver):
+        """
+        Iterates of solver from q (excluding q), as a generator of
+        (q, number of iterations so far)
+        """
+
+        if solver == 'analytical':
+            return self._steps_analytical(q, target)
+        if solver == 'staged':
+            return self._steps_staged(q, target)
+        if solver == 'lm':
+            return self._steps_lm(q, target)
+        if solver == 'dls':
+            return self._steps_dls(q, target)
+        raise ValueError(solver)
+
+    def _steps_staged(self, q, target):
+        # Position-only phase: damped pseudo-inverse of the 3 position rows
+        iterations = 0
+        while iterations < self.staged_max_position_steps:
+            T0e, _, J = self.fk.forward_with_jacobian(q)
+            error = target[:3, 3] - T0e[:3, 3]
+            if np.linalg.norm(error) <= self.staged_switch_distance:
+                break
+            iterations += 1
+
+            Jp = J[:3]
+            dq = Jp.T @ np.linalg.solve(Jp @ Jp.T + self.damping**2 * np.identity(3), error)
+            step_size = np.linalg.norm(dq)
+            if step_size > self.staged_max_step_size:
+                dq *= self.staged_max_step_size / step_size
+
+            q_next = np.clip(q + dq, self.lower, self.upper)
+            step_size = np.linalg.norm(q_next - q)
+            q = q_next
+            yield q, iterations
+            if step_size < self.min_step_size:
+                break
+
+        # Full pose refinement
+        for q, refine_iterations in self._steps(q, target, self.staged_refine):
+            yield q, iterations + refine_iterations
+
+    def _steps_dls(self, q, target):
+        for iterations in range(1, self.max_steps + 1):
+            dq = self.solve_ik(q, target)
+            q_next = np.clip(q + dq, self.lower, self.upper)
+            step_size = np.linalg.norm(q_next - q)
+            q = q_next
+            yield q, iterations
+
+            # Converged, or stuck against the joint limits
+            if step_size < self.min_step_size:
+                break
+
+    def _steps_lm(self, q, target):
+        # Levenberg-Marquardt iterations. Rejected steps count as iterations
+        # (Jacobian evaluations) but yield nothing
+        damping = self.lm_damping
+        identity = np.identity(6)
+
+        T0e, _, J = self.fk.forward_with_jacobian(q)
+        error = np.concatenate(self.cal_target_transform_vec(target, T0e))
+        cost = error @ error
+
+        iterations = 0
+        while iterations < self.max_steps:
+            if np.linalg.norm(error[:3]) <= self.linear_tol and np.linalg.norm(error[3:]) <= self.angular_tol:
+                break
+            iterations += 1
+
+            dq = J.T @ np.linalg.solve(J @ J.T + damping * identity, error)
+
+            # Joints held at a limit by the step are removed from it, so that the
+            # line search runs along a feasible direction
+            blocked = ((q <= self.lower) & (dq < 0)) | ((q >= self.upper) & (dq > 0))
+            if blocked.any():
+                Jf = J * ~blocked
+                dq = Jf.T @ np.linalg.solve(Jf @ Jf.T + damping * identity, error)
+
+            step_size = np.linalg.norm(dq)
+            if step_size > self.lm_max_step_size:
+                dq *= self.lm_max_step_size / step_size
+
+            # The cost |e|^2 decreases at rate 2 e^T J dq along dq
+            slope = 2. * error @ (J @ dq)
+            alpha = 1.
+            for _ in range(self.lm_max_backtracks):
+                q_next = np.clip(q + alpha * dq, self.lower, self.upper)
+                _, T0e = self.fk.forward(q_next)
+                error_next = np.concatenate(self.cal_target_transform_vec(target, T0e))
+                cost_next = error_next @ error_next
+                if cost_next <= cost - self.lm_sufficient_decrease * alpha * slope:
+                    break
+                alpha *= 0.5
+            else:
+                # No decrease along dq: damp more, towards gradient descent
+                if damping >= self.lm_damping_max:
+                    break
+                damping = min(damping * 10., self.lm_damping_max)
+                continue
+
+            # Trust the Gauss-Newton model more when the full step was accepted
+            if alpha == 1.:
+                damping = max(damping / 3., self.lm_damping_min)
+            else:
+                damping = min(damping * 2., self.lm_damping_max)
+
+            step_size = np.linalg.norm(q_next - q)
+            q = q_next
+            yield q, iterations
+            if step_size < self.min_step_size:
+                break
+
+            T0e, _, J = self.fk.forward_with_jacobian(q)
+            error = np.concatenate(self.cal_target_transform_vec(target, T0e))
+            cost = error @ error
+
+    def inverse(self, target, initial_guess=None, solver=None, return_telemetry=False, keep_last=None,
+                deadline_s=None):
         """
         Solve the inverse kinematics of the robot arm
 
@@ -118,23 +483,554 @@ class IK:
         end effector to world
 
         initial_guess - 1x7 vector of joint angles [q0, q1, q2, q3, q4, q5, q6], which
-        is the "initial guess" from which to proceed with the solution process (has set up for you)
+        is the "initial guess" from which to proceed with the solution process (has set up for you).
+        If None, it is taken from warm_start
+
+        solver - 'dls', 'lm', 'analytical' or 'staged' (see SOLVER STRATEGY), defaults to IK.solver
+
+        return_telemetry - also return an IKTelemetry
+
+        keep_last - if given, only the last keep_last iterates are kept (in a deque)
+
+        deadline_s - wall-clock budget in seconds, which includes the final check
+        of the solution. The iterations stop when the next one and that check are
+        not expected to fit in it (judging by the last iteration, or for the first
+        one by the step cost measured at construction). When the budget runs out,
+        the iterate with the lowest pose error visited so far is appended to q, so
+        that it is the one returned for every solver. If the budget does not even
+        cover the check, initial_guess is returned unchecked: success is False and
+        the errors of the telemetry are NaN
 
         OUTPUTS:
-        q - 1x7 vector of joint angles [q0, q1, q2, q3, q4, q5, q6], giving the
-        solution if success is True or the closest guess if success is False.
+        q - list of the 1x7 vectors of joint angles [q0, q1, q2, q3, q4, q5, q6] visited
+        by the solver, starting from initial_guess. The last one gives the solution
+        if success is True or the closest guess if success is False.
 
         success - True if IK is successfully solved. Otherwise False
+
+        telemetry - IKTelemetry, only if return_telemetry is True
         """
 
+        start = time.perf_counter()
+        solver = self.solver if solver is None else solver
+        if initial_guess is None:
+            initial_guess = self.warm_start(target)
         q = initial_guess
         success = False
 
         # YOUR CODE STARTS HERE
-    
+        q = np.array(initial_guess, dtype=float)[:7]
+        q_set = [q] if keep_last is None else deque([q], maxlen=keep_last)
+        iterations = 0
+        timed_out = False
+        checked = True
+        end = None if deadline_s is None else start + deadline_s
+        if end is not None:
+            best_q = q
+            best_cost, previous, timed_out, checked = self._deadline_start(q, target, end, solver)
+        steps = iter(()) if timed_out or not self._reachable(target) else self._steps(q, target, solver)
+        for q, iterations in steps:
+            q_set.append(q)
+            if end is not None:
+                cost = self._pose_cost(q, target)
+                if cost < best_cost:
+                    best_q, best_cost = q, cost
+                # Stop when another iteration as long as the last one (or a
+                # step, if longer), and the final check, would not fit
+                now = time.perf_counter()
+                if now + max(now - previous, self._step_estimate) + self._check_estimate + self.deadline_margin > end:
+                    timed_out = True
+                    break
+                previous = now
+        if timed_out and best_q is not q:
+            q = best_q
+            q_set.append(q)
+
+        if not checked:
+            position_error = rotation_error = np.nan
+        elif return_telemetry:
+            # Same test as check_joint_constraints, sharing the forward kinematics
+            position_error, rotation_error = self.pose_error(q, target)
+            success = bool(self.within_limits(q)
+                           and position_error <= self.linear_tol
+                           and rotation_error <= self.angular_tol)
+        else:
+            success = self.check_joint_constraints(q, target)
+        if success and self.seed_store is not None:
+            self.seed_store.add(target, q)
+        if return_telemetry:
+            telemetry = IKTelemetry(solver, success, iterations, position_error, rotation_error,
+                                    time.perf_counter() - start, timed_out)
+        q = q_set
         # YOUR CODE ENDS HERE
 
+        if return_telemetry:
+            return q, success, telemetry
         return q, success
 
+    def _pose_cost(self, q, target):
+        # Squared norm of the pose error vector of q, as minimized by the solvers
+        _, T0e = self.fk.forward(q)
+        error = np.concatenate(self.cal_target_transform_vec(target, T0e))
+        return error @ error
+
+    def _time_deadline_costs(self):
+        # Median durations of a solver step (forward kinematics and Jacobian,
+        # and the pose cost of the iterate), of the closed-form solve, which is
+        # the single step of 'analytical', and of the final check of a
+        # solution. Measured once, so that the deadline-bound solves do not pay
+        # for it
+        _, target = self.fk.forward(self.neutral)
+        steps, analytical, checks = [], [], []
+        for _ in range(3):
+            start = time.perf_counter()
+            self.fk.forward_with_jacobian(self.neutral)
+            self._pose_cost(self.neutral, target)
+            middle = time.perf_counter()
+            self.check_joint_constraints(self.neutral, target)
+            end = time.perf_counter()
+            self.inverse_analytical(target, reference=self.neutral)
+            steps.append(middle - start)
+            checks.append(end - middle)
+            analytical.append(time.perf_counter() - end)
+        return float(np.median(steps)), float(np.median(analytical)), float(np.median(checks))
+
+    def _deadline_start(self, q, target, end, solver):
+        # Start of a deadline-bound solve from q: the cost of q (the first best
+        # iterate), the time, whether the budget runs out before the first
+        # iteration (which needs the cost of q, a step and the final check),
+        # and whether it still covers the final check
+        now = time.perf_counter()
+        if now + self._check_estimate + self.deadline_margin > end:
+            return np.inf, now, True, False
+        step = self._analytical_estimate if solver == 'analytical' else self._step_estimate
+        if now + step + 2 * self._check_estimate + self.deadline_margin > end:
+            return np.inf, now, True, True
+        return self._pose_cost(q, target), time.perf_counter(), False, True
+
+    def inverse_anytime(self, target, initial_guess=None, deadline_s=None, solver=None):
+        """
+        inverse within a wall-clock budget, for callers that must not overrun
+        their tick. Only the last iterate is kept
+
+        INPUTS:
+        target, initial_guess, solver, deadline_s - see inverse
+
+        OUTPUTS:
+        q - 1x7 vector of joint angles, the best so far when the budget ran out
+
+        success - True if q solves the target within the tolerances
+
+        residual - (position error [m], rotation error [rad]) of q
+        """
+
+        q_set, success, telemetry = self.inverse(target, initial_guess, solver, return_telemetry=True,
+                                                 keep_last=1, deadline_s=deadline_s)
+        return q_set[-1], success, (telemetry.position_error, telemetry.rotation_error)
+
+    def iter_inverse(self, target, initial_guess=None, solver=None, every=1, min_step=0., deadline_s=None):
+        """
+        Generator version of inverse: yields the iterates as the solver goes,
+        without keeping them. The initial guess and the final iterate are
+        always yielded. The generator returns success (as the StopIteration value)
+
+        INPUTS:
+        target, initial_guess, solver - see inverse
+
+        every - only yield every k-th iterate
+
+        min_step - [rad] only yield an iterate if it is at least this far (in
+        joint space) from the last one yielded
+
+        deadline_s - wall-clock budget in seconds (see inverse). The time spent
+        by the caller between iterates counts. When the budget runs out, the
+        final iterate yielded is the one with the lowest pose error
+
+        OUTPUTS:
+        q - 1x7 vectors of joint angles
+        """
+
+        start = time.perf_counter()
+        end = None if deadline_s is None else start + deadline_s
+        solver = self.solver if solver is None else solver
+        if initial_guess is None:
+            initial_guess = self.warm_start(target)
+        q = last = np.array(initial_guess, dtype=float)[:7]
+        timed_out = False
+        checked = True
+        if end is not None:
+            best_q = q
+            best_cost, previous, timed_out, checked = self._deadline_start(q, target, end, solver)
+        steps = iter(()) if timed_out or not self._reachable(target) else self._steps(q, target, solver)
+        yield q
+
+        for i, (q, _) in enumerate(steps, 1):
+            if i % every == 0 and np.linalg.norm(q - last) >= min_step:
+                last = q
+                yield q
+            if end is not None:
+                cost = self._pose_cost(q, target)
+                if cost < best_cost:
+                    best_q, best_cost = q, cost
+                now = time.perf_counter()
+                if now + max(now - previous, self._step_estimate) + self._check_estimate + self.deadline_margin > end:
+                    timed_out = True
+                    break
+                previous = now
+        if timed_out:
+            q = best_q
+        if q is not last:
+            yield q
+
+        if not checked:
+            return False
+        success = self.check_joint_constraints(q, target)
+        if success and self.seed_store is not None:
+            self.seed_store.add(target, q)
+        return success
+
+    def inverse_batch(self, targets, seeds=None):
+        """
+        Solve the inverse kinematics of many targets at once. The update of
+        solve_ik is applied to the whole stack of configurations, and rows are
+        masked out as soon as they converge.
+
+        INPUTS:
+        targets - N x 4 x 4 array of target end effector poses
+
+        seeds - N x 7 array of initial guesses, or a single 1x7 guess used for all targets.
+        If None, they are looked up in the seed store. They are projected into
+        the joint limits with project_to_limits
+
+        OUTPUTS:
+        q - N x 7 array of solutions (or closest guesses where success is False)
+
+        success - N boolean array, True where IK is successfully solved
+
+        iterations - N integer array with the number of iterations of each target
+        """
+
+        targets = np.asarray(targets, dtype=float).reshape(-1, 4, 4)
+        N = len(targets)
+        if seeds is None:
+            seeds = self.neutral if self.seed_store is None else self.seed_store.lookup_batch(targets, self.neutral, self.warm_start_distance)
+        q = np.array(np.broadcast_to(self.project_to_limits(seeds), (N, 7)))
+
+        iterations = np.zeros(N, dtype=int)
+        active = np.ones(N, dtype=bool) if self.reachability is None else self.reachability.reachable_batch(targets)
+        identity = self.damping**2 * np.identity(6)
+
+        for _ in range(self.max_steps):
+            rows = np.flatnonzero(active)
+            if rows.size == 0:
+                break
+
+            T0e, _, J = self.fk.forward_with_jacobian_batch(q[rows])
+            translate_vec, rotate_vec = self.cal_target_transform_vec_batch(targets[rows], T0e)
+            error = np.concatenate((translate_vec, rotate_vec), axis=-1)
+
+            # Rows already within tolerance are done
+            reached = (np.linalg.norm(translate_vec, axis=-1) <= self.linear_tol) & \
+                      (np.linalg.norm(rotate_vec, axis=-1) <= self.angular_tol)
+
+            # Damped pseudo-inverse step of every row, from stacked 6x6 systems
+            JT = J.transpose(0, 2, 1)
+            dq = (JT @ np.linalg.solve(J @ JT + identity, error[..., np.newaxis]))[..., 0]
+            step_size = np.linalg.norm(dq, axis=-1)
+            too_long = step_size > self.max_step_size
+            dq[too_long] *= (self.max_step_size / step_size[too_long])[:, np.newaxis]
+
+            q_next = np.clip(q[rows] + dq, self.lower, self.upper)
+            stalled = np.linalg.norm(q_next - q[rows], axis=-1) < self.min_step_size
+
+            moving = ~reached
+            q[rows[moving]] = q_next[moving]
+            iterations[rows[moving]] += 1
+            active[rows[reached | stalled]] = False
+
+        success = self.check_joint_constraints_batch(q, targets)
+        if self.seed_store is not None:
+            for i in np.flatnonzero(success):
+                self.seed_store.add(targets[i], q[i])
+        return q, success, iterations
+
+    def inverse_path(self, poses, q0, solver='lm'):
+        """
+        Solve the inverse kinematics along a dense path of poses by continuation.
+        Each waypoint is seeded with the previous solution plus the joint step
+        predicted by the Jacobian for the move between the waypoints, from which
+        solver only has a small correction to make (one to three iterations
+        when the waypoints are close)
+
+        INPUTS:
+        poses - N x 4 x 4 array of target end effector poses, in order
+
+        q0 - 1x7 vector of joint angles, initial guess of the first pose (which
+        is solved from it without prediction)
+
+        solver - 'dls', 'lm', 'analytical' or 'staged' (see SOLVER STRATEGY)
+
+        OUTPUTS:
+        q - N x 7 array of solutions (or closest guesses where success is False)
+
+        success - N boolean array, True where IK is successfully solved
+
+        iterations - N integer array with the number of corrector iterations of each pose
+
+        breaks - indices of the waypoints where continuity breaks: a joint moved
+        by more than path_max_joint_step from the previous waypoint, or the
+        corrector failed (typically against a joint limit, where the branch of
+        the path ends) and the waypoint was solved again from the nearest
+        closed-form solution, or not at all
+        """
+
+        poses = np.asarray(poses, dtype=float).reshape(-1, 4, 4)
+        N = len(poses)
+        q = np.zeros((N, 7))
+        success = np.zeros(N, dtype=bool)
+        iterations = np.zeros(N, dtype=int)
+        breaks = []
+
+        q_prev = self.project_to_limits(np.asarray(q0, dtype=float)[:7])
+        for k, target in enumerate(poses):
+            q_k = q_prev
+            if k > 0:
+                # Predictor: tangent step of the damped pseudo-inverse for the
+                # displacement between the waypoints
+                _, _, J = self.fk.forward_with_jacobian(q_prev)
+                translate_vec, rotate_vec = self.cal_target_transform_vec(target, poses[k - 1])
+                dq = J.T @ np.linalg.solve(J @ J.T + self.damping**2 * np.identity(6),
+                                           np.concatenate((translate_vec, rotate_vec)))
+                q_k = np.clip(q_prev + dq, self.lower, self.upper)
+
+            # Corrector
+            if self._reachable(target):
+                for q_k, iterations[k] in self._steps(q_k, target, solver):
+                    pass
+
+            success[k] = continuous = self.check_joint_constraints(q_k, target)
+            if not success[k]:
+                solutions = self.inverse_analytical(target, reference=q_prev)
+                if len(solutions):
+                    q_k, success[k] = solutions[0], True
+            if success[k]:
+                self._record(target, q_k)
+            if not continuous or (k > 0 and np.max(np.abs(q_k - q_prev)) > self.path_max_joint_step):
+                breaks.append(k)
+            q[k] = q_prev = q_k
+
+        return q, success, iterations, breaks
+
+    def sample_seeds(self, num_seeds, strategy='random', random_state=None):
+        """
+        Draw initial guesses within the joint limits
+
+        INPUTS:
+        num_seeds - number of seeds
+
+        strategy - 'random' (uniform) or 'halton' (low-discrepancy sequence)
+
+        random_state - seed or numpy Generator for the 'random' strategy
+
+        OUTPUTS:
+        seeds - num_seeds x 7 array
+        """
+
+        if strategy == 'random':
+            samples = np.random.default_rng(random_state).random((num_seeds, 7))
+        elif strategy == 'halton':
+            samples = halton(num_seeds, 7)
+        else:
+            raise ValueError(strategy)
+        return self.lower + samples * (self.upper - self.lower)
+
+    def inverse_multistart(self, target, initial_guess=None, num_seeds=8, seeds='random',
+                           workers=None, deadline_s=None, random_state=None):
+        """
+        Run inverse from several seeds in parallel worker processes and return
+        as soon as one of them converges
+
+        INPUTS:
+        target - 4x4 numpy array representing the desired transformation from
+        end effector to world
+
+        initial_guess - optional 1x7 vector tried as the first seed. If None and
+        a seed store is attached, its nearest solution is tried first
+
+        num_seeds - number of seeds drawn by the 'random' and 'halton' strategies
+
+        seeds - 'random', 'halton', or a K x 7 array of user supplied seeds (projected
+        into the joint limits with project_to_limits)
+
+        workers - number of worker processes (default: one per CPU). With 0, the
+        seeds are tried one after the other in this process. The workers solve
+        with the class of this instance and the settings assigned to it (solver,
+        tolerances, reachability map, fk...), but without its seed store and
+        database
+
+        deadline_s - wall-clock budget in seconds. When it runs out, the best
+        result found so far is returned
+
+        random_state - seed or numpy Generator for the 'random' strategy
+
+        OUTPUTS:
+        q - 1x7 vector of joint angles of the first converged seed, or of the one
+        with the lowest pose error if none converged
+
+        success - True if IK is successfully solved. Otherwise False
+        """
+
+        if isinstance(seeds, str):
+            seeds = self.sample_seeds(num_seeds, seeds, random_state)
+        seeds = np.atleast_2d(np.asarray(seeds, dtype=float))[:, :7]
+        if initial_guess is None and self.seed_store is not None:
+            initial_guess = self.seed_store.lookup(target, self.warm_start_distance)[0]
+        if initial_guess is not None:
+            seeds = np.vstack((np.asarray(initial_guess, dtype=float)[:7], seeds))
+
+        # User supplied seeds outside the limits are repaired, and seeds that
+        # coincide after that are only tried once
+        seeds = self.project_to_limits(seeds)
+        _, first = np.unique(seeds.round(6), axis=0, return_index=True)
+        seeds = seeds[np.sort(first)]
+
+        start = time.perf_counter()
+        best_q, best_error = seeds[0], np.inf
+        if not self._reachable(target):
+            return best_q, False
+
+        if workers == 0:
+            for seed in seeds:
+                q, success, error = _solve_from_seed(target, seed, self)
+                if success:
+                    return self._record(target, q), True
+                if error < best_error:
+                    best_q, best_error = q, error
+                if deadline_s is not None and time.perf_counter() - start > deadline_s:
+                    break
+            return best_q, False
+
+        executor = self._get_executor(workers)
+        pending = [executor.submit(_solve_from_seed, target, seed) for seed in seeds]
+        self._pending = pending
+        try:
+            remaining = None if deadline_s is None else max(deadline_s - (time.perf_counter() - start), 0.)
+            for future in futures.as_completed(pending, timeout=remaining):
+                q, success, error = future.result()
+                if success:
+                    return self._record(target, q), True
+                if error < best_error:
+                    best_q, best_error = q, error
+        except futures.TimeoutError:
+            pass
+        finally:
+            # Seeds that did not start yet are dropped; running ones finish in the background
+            for future in pending:
+                future.cancel()
+
+        return best_q, False
+
+    def _record(self, target, q):
+        if self.seed_store is not None:
+            self.seed_store.add(target, q)
+        return q
+
+    def _worker_settings(self):
+        # Settings of this instance (solver, tolerances, reachability map,
+        # FK backend...) set on it rather than on its class, which the worker
+        # processes of inverse_multistart apply to their IK. The seed store
+        # and the database stay in this process, which records the results
+        return {name: value for name, value in vars(self).items()
+                if not name.startswith('_') and name not in ('seed_store', 'database')}
+
+    def _get_executor(self, workers):
+        # The pool is created again when the settings were reassigned since
+        settings = self._worker_settings()
+        if self._executor is None or self._executor_workers != workers or \
+                self._executor_settings.keys() != settings.keys() or \
+                any(value is not self._executor_settings[name] for name, value in settings.items()):
+            self.close()
+            self._executor = futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                         initargs=(type(self), settings))
+            self._executor_workers = workers
+            self._executor_settings = settings
+        return self._executor
+
+    def joint_margins(self, q):
+        """
+        Distance of each joint to its nearest limit
+
+        INPUTS:
+        q - N x 7 array (or 1x7 vector) of joint angles
+
+        OUTPUTS:
+        margins - array of the shape of q, positive inside the limits and
+        negative (by the amount of the violation) outside
+        """
+
+        q = np.asarray(q, dtype=float)[..., :7]
+        return np.minimum(q - self.lower, self.upper - q)
+
+    def within_limits(self, q, margin=0.):
+        """
+        Boolean mask of the configurations whose joints are all at least margin
+        inside the limits
+
+        INPUTS:
+        q - N x 7 array (or 1x7 vector) of joint angles
+
+        OUTPUTS:
+        mask - N boolean array (a single boolean for a 1x7 vector)
+        """
+
+        return np.all(self.joint_margins(q) >= margin, axis=-1)
+
+    def project_to_limits(self, q, margin=0., wrap=True):
+        """
+        Nearest configurations within the limits
+
+        INPUTS:
+        q - N x 7 array (or 1x7 vector) of joint angles
+
+        margin - [rad] distance to keep from the limits
+
+        wrap - first replace each angle by its equivalent (modulo 2 pi) nearest
+        to the middle of the joint range, which repairs candidates that are only
+        off by a full turn
+
+        OUTPUTS:
+        q - new array of the shape of q
+        """
+
+        q = np.array(q, dtype=float)[..., :7]
+        lower, upper = self.lower + margin, self.upper - margin
+        if wrap:
+            middle = 0.5 * (lower + upper)
+            q = middle + (q - middle + np.pi) % (2 * np.pi) - np.pi
+        return np.clip(q, lower, upper)
+
+    def check_joint_constraints_batch(self, q, targets):
+        """
+        Vectorized version of check_joint_constraints
+
+        INPUTS:
+        q - N x 7 array of candidate solutions
+
+        targets - N x 4 x 4 array of target end effector poses
+
+        OUTPUTS:
+        success - N boolean array
+        """
+
+        q = np.atleast_2d(q)[:, :7]
+        within_limits = self.within_limits(q)
+
+        _, T0e = self.fk.forward_batch(q)
+        translate_vec, rotate_vec = self.cal_target_transform_vec_batch(targets, T0e)
+
+        return within_limits & \
+            (np.linalg.norm(translate_vec, axis=-1) <= self.linear_tol) & \
+            (np.linalg.norm(rotate_vec, axis=-1) <= self.angular_tol)
+
 if __name__ == "__main__":
     pass
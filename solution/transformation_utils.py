@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import numpy as np
 
 # Note: Complete the following subfunctions to generate valid transformation matrices 
 # from a translation vector and Euler angles, or a sequence of 
@@ -12,7 +13,10 @@ class transformation():
         """
 
         # YOUR CODE STARTS HERE
-    
+        return np.array([[1, 0, 0, d[0]],
+                         [0, 1, 0, d[1]],
+                         [0, 0, 1, d[2]],
+                         [0, 0, 0, 1]], dtype=float)
         # YOUR CODE ENDS HERE
     
     @staticmethod
@@ -22,7 +26,11 @@ class transformation():
         """
 
         # YOUR CODE STARTS HERE
-    
+        c, s = np.cos(a), np.sin(a)
+        return np.array([[1, 0, 0, 0],
+                         [0, c, -s, 0],
+                         [0, s, c, 0],
+                         [0, 0, 0, 1]])
         # YOUR CODE ENDS HERE
 
     @staticmethod
@@ -32,7 +40,11 @@ class transformation():
         """
 
         # YOUR CODE STARTS HERE
-    
+        c, s = np.cos(a), np.sin(a)
+        return np.array([[c, 0, s, 0],
+                         [0, 1, 0, 0],
+                         [-s, 0, c, 0],
+                         [0, 0, 0, 1]])
         # YOUR CODE ENDS HERE
 
     @staticmethod
@@ -42,7 +54,11 @@ class transformation():
         """
 
         # YOUR CODE STARTS HERE
-    
+        c, s = np.cos(a), np.sin(a)
+        return np.array([[c, -s, 0, 0],
+                         [s, c, 0, 0],
+                         [0, 0, 1, 0],
+                         [0, 0, 0, 1]])
         # YOUR CODE ENDS HERE
 
     @staticmethod
@@ -53,8 +69,90 @@ class transformation():
         """
 
         # YOUR CODE STARTS HERE
-    
+        # Closed form of trans(d) @ roll(r) @ pitch(p) @ yaw(y)
+        cr, cp, cy = np.cos(rpy[0]), np.cos(rpy[1]), np.cos(rpy[2])
+        sr, sp, sy = np.sin(rpy[0]), np.sin(rpy[1]), np.sin(rpy[2])
+        return np.array([[cp * cy, -cp * sy, sp, d[0]],
+                         [cr * sy + sr * sp * cy, cr * cy - sr * sp * sy, -sr * cp, d[1]],
+                         [sr * sy - cr * sp * cy, sr * cy + cr * sp * sy, cr * cp, d[2]],
+                         [0, 0, 0, 1]], dtype=float)
         # YOUR CODE ENDS HERE
+
+    @staticmethod
+    def transform_batch(d, rpy):
+        """
+        Closed-form transform for arrays of translations d (..., 3) and
+        roll-pitch-yaw euler angles rpy (..., 3), returns a (..., 4, 4) array.
+        Equal to trans(d) @ roll(r) @ pitch(p) @ yaw(y) for each pair
+        """
+
+        d, rpy = np.asarray(d, dtype=float), np.asarray(rpy, dtype=float)
+        c, s = np.cos(rpy), np.sin(rpy)
+        cr, cp, cy = c[..., 0], c[..., 1], c[..., 2]
+        sr, sp, sy = s[..., 0], s[..., 1], s[..., 2]
+
+        # np.broadcast rather than np.broadcast_shapes, which needs NumPy 1.20
+        T = np.zeros(np.broadcast(d[..., 0], rpy[..., 0]).shape + (4, 4))
+        T[..., 0, 0] = cp * cy
+        T[..., 0, 1] = -cp * sy
+        T[..., 0, 2] = sp
+        T[..., 1, 0] = cr * sy + sr * sp * cy
+        T[..., 1, 1] = cr * cy - sr * sp * sy
+        T[..., 1, 2] = -sr * cp
+        T[..., 2, 0] = sr * sy - cr * sp * cy
+        T[..., 2, 1] = sr * cy + cr * sp * sy
+        T[..., 2, 2] = cr * cp
+        T[..., :3, 3] = d
+        T[..., 3, 3] = 1.
+        return T
+
+    @staticmethod
+    def rpy(T):
+        """
+        Roll-pitch-yaw euler angles of a homogenous transformation (or of a
+        (..., 4, 4) array of them), the inverse of transform: pitch is in
+        [-pi/2, pi/2], and at pitch = +-pi/2 the rotation is given to yaw
+        """
+
+        R = np.asarray(T, dtype=float)[..., :3, :3]
+        pitch = np.arcsin(np.clip(R[..., 0, 2], -1., 1.))
+        roll = np.arctan2(-R[..., 1, 2], R[..., 2, 2])
+        yaw = np.arctan2(-R[..., 0, 1], R[..., 0, 0])
+
+        # Gimbal lock: only roll + yaw (or yaw - roll) is defined
+        locked = np.abs(R[..., 0, 2]) > 1. - 1e-12
+        roll = np.where(locked, 0., roll)
+        yaw = np.where(locked, np.arctan2(R[..., 1, 0], R[..., 1, 1]), yaw)
+        return np.stack((roll, pitch, yaw), axis=-1)
+
+    @staticmethod
+    def inverse(T):
+        """
+        Inverse of a homogenous transformation (or a (..., 4, 4) array of them),
+        from the transpose of the rotation: [R^T, -R^T d]
+        """
+
+        T = np.asarray(T, dtype=float)
+        Ti = np.zeros_like(T)
+        R = np.swapaxes(T[..., :3, :3], -1, -2)
+        Ti[..., :3, :3] = R
+        Ti[..., :3, 3:] = -R @ T[..., :3, 3:]
+        Ti[..., 3, 3] = 1.
+        return Ti
+
+    @staticmethod
+    def compose(A, B):
+        """
+        Product A @ B of homogenous transformations (or broadcast (..., 4, 4)
+        arrays of them), from the rotation and translation blocks only
+        """
+
+        A, B = np.asarray(A, dtype=float), np.asarray(B, dtype=float)
+        T = np.zeros(np.broadcast(A[..., 0, 0], B[..., 0, 0]).shape + (4, 4))
+        T[..., :3, :3] = A[..., :3, :3] @ B[..., :3, :3]
+        T[..., :3, 3:] = A[..., :3, :3] @ B[..., :3, 3:] + A[..., :3, 3:]
+        T[..., 3, 3] = 1.
+        return T
     
 if __name__ == "__main__":
     pass
@@ -0,0 +1,120 @@
+import numpy as np
+from math import pi
+import pytest
+
+from solution.ik_database import IKDatabase
+from solution.solveIK import IK
+from solution.transformation_utils import transformation
+
+ROTATION = transformation.transform(np.zeros(3), np.array([0, pi, pi]))[:3, :3]
+LOWER, UPPER = np.array([0.45, -0.05, 0.2]), np.array([0.55, 0.05, 0.3])
+
+
+def pose(position, rotation=ROTATION):
+    target = np.identity(4)
+    target[:3, :3] = rotation
+    target[:3, 3] = position
+    return target
+
+
+def linear_database(shape=(3, 4, 5)):
+    # Joint angles that are a linear function of the position, which trilinear
+    # interpolation reproduces exactly
+    grid = IKDatabase.grid(LOWER, UPPER, shape)
+    solutions = np.concatenate((grid, grid[..., :2], grid[..., :2]), axis=-1)
+    return IKDatabase(LOWER, UPPER, ROTATION, solutions)
+
+
+def linear_solution(position):
+    return np.concatenate((position, position[:2], position[:2]))
+
+
+def test_grid():
+    grid = IKDatabase.grid(LOWER, UPPER, (3, 4, 5))
+    assert grid.shape == (3, 4, 5, 3)
+    np.testing.assert_allclose(grid[0, 0, 0], LOWER)
+    np.testing.assert_allclose(grid[-1, -1, -1], UPPER)
+    np.testing.assert_allclose(grid[1, 0, 0], [0.5, -0.05, 0.2])
+
+
+def test_seed_interpolates():
+    database = linear_database()
+    for position in np.random.default_rng(0).uniform(LOWER, UPPER, (20, 3)):
+        np.testing.assert_allclose(database.seed(pose(position)), linear_solution(position), atol=1e-12)
+    # On the upper faces of the region
+    np.testing.assert_allclose(database.seed(pose(UPPER)), linear_solution(UPPER), atol=1e-12)
+
+
+def test_seed_outside_the_region():
+    database = linear_database()
+    assert database.seed(pose(UPPER + 0.01)) is None
+    assert database.seed(pose(LOWER - [0., 0., 0.01])) is None
+    # Same position, rotated away from the orientation of the database
+    rotated = transformation.transform(np.zeros(3), np.array([0, pi, pi + 0.01]))[:3, :3]
+    assert not database.contains(pose(LOWER, rotated))
+    assert database.seed(pose(LOWER, rotated)) is None
+
+
+def test_seed_falls_back_to_the_nearest_corner():
+    database = linear_database(shape=(2, 2, 2))
+    position = LOWER + [0.1, 0.2, 0.3] * (UPPER - LOWER)
+
+    # A corner without a solution
+    database.solutions[0, 0, 0] = np.nan
+    # The nearest corner with a solution, weighted by the interpolation
+    np.testing.assert_allclose(database.seed(pose(position)), database.solutions[0, 0, 1])
+
+    # Corners on different branches
+    database = linear_database(shape=(2, 2, 2))
+    database.solutions[1, 1, 1, 6] += 1.
+    np.testing.assert_allclose(database.seed(pose(position)), database.solutions[0, 0, 0])
+
+    database.solutions[...] = np.nan
+    assert database.seed(pose(position)) is None
+
+
+def test_save_load_round_trip(tmp_path):
+    database = linear_database()
+    path = str(tmp_path / 'region')
+    database.save(path)
+
+    loaded = IKDatabase.load(path)
+    assert isinstance(loaded.solutions, np.memmap)
+    for name in ('lower', 'upper', 'rotation', 'frame_offset', 'solutions'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(database, name))
+    position = 0.5 * (LOWER + UPPER)
+    np.testing.assert_allclose(loaded.seed(pose(position)), database.seed(pose(position)))
+    assert not isinstance(IKDatabase.load(path, mmap_mode=None).solutions, np.memmap)
+
+
+@pytest.fixture(scope='module')
+def built(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('database') / 'region')
+    return IKDatabase.build(LOWER, UPPER, (3, 3, 2), ROTATION, path=path, workers=1, chunk_size=4), path
+
+
+def test_build_solves_the_grid(built):
+    database, path = built
+    assert database.coverage() == 1.
+    ik = IK()
+    grid = IKDatabase.grid(LOWER, UPPER, (3, 3, 2))
+    for index in np.ndindex(3, 3, 2):
+        assert ik.check_joint_constraints(database.solutions[index], pose(grid[index]))
+    np.testing.assert_array_equal(IKDatabase.load(path).solutions, database.solutions)
+
+
+def test_solve_refines_the_seed(built):
+    database, _ = built
+    ik = IK()
+    for position in np.random.default_rng(1).uniform(LOWER, UPPER, (5, 3)):
+        q, success = database.solve(pose(position), ik)
+        assert success and ik.check_joint_constraints(q, pose(position))
+    assert database.solve(pose(UPPER + 0.1), ik) == (None, False)
+
+
+def test_ik_warm_starts_from_the_database(built):
+    database, _ = built
+    ik = IK(database=database)
+    position = 0.5 * (LOWER + UPPER)
+    np.testing.assert_allclose(ik.warm_start(pose(position)), database.seed(pose(position)))
+    np.testing.assert_array_equal(ik.warm_start(pose(UPPER + 0.1)), ik.neutral)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from solution.panda_ik_analytical import AnalyticalIK
+from solution.solveFK import FK
+from solution.solveIK import IK
+from tests.test_solveIK import TARGETS, UNREACHABLE
+
+
+def random_configurations(n, seed=0):
+    # Away from the limits, where the branches of the solution stay within them
+    lower, upper = IK.lower + 0.1, IK.upper - 0.1
+    return lower + np.random.default_rng(seed).random((n, 7)) * (upper - lower)
+
+
+@pytest.fixture(scope='module')
+def analytical():
+    return AnalyticalIK(FK(), IK.lower, IK.upper)
+
+
+def test_solutions_reproduce_the_target(analytical):
+    fk = FK()
+    for q in random_configurations(20):
+        _, target = fk.forward(q)
+        solutions = analytical.solve(target, q[6])
+        assert len(solutions)
+        _, T0e = fk.forward_batch(solutions)
+        np.testing.assert_allclose(T0e, np.broadcast_to(target, T0e.shape), atol=1e-8)
+        assert np.all((solutions >= IK.lower) & (solutions <= IK.upper))
+        np.testing.assert_allclose(solutions[:, 6], q[6])
+
+
+def test_configuration_is_among_the_candidates(analytical):
+    fk = FK()
+    for q in random_configurations(20, seed=1):
+        _, target = fk.forward(q)
+        candidates = analytical.candidates(target, q[6])
+        assert candidates.shape == (1, 8, 7)
+        distance = np.linalg.norm(candidates[0] - q, axis=1)
+        assert np.nanmin(distance) < 1e-8
+
+
+def test_solutions_sorted_by_reference(analytical):
+    fk = FK()
+    q = random_configurations(1, seed=2)[0]
+    _, target = fk.forward(q)
+    solutions = analytical.solve(target, np.linspace(IK.lower[6], IK.upper[6], 5), reference=q)
+    distance = np.linalg.norm(solutions - q, axis=1)
+    assert np.all(np.diff(distance) >= 0.)
+
+
+def test_unreachable_target_has_no_solution(analytical):
+    assert analytical.solve(UNREACHABLE, np.linspace(IK.lower[6], IK.upper[6], 5)).shape == (0, 7)
+
+
+def test_inverse_analytical():
+    ik = IK()
+    for target in TARGETS:
+        solutions = ik.inverse_analytical(target, reference=ik.neutral)
+        assert len(solutions)
+        assert all(ik.check_joint_constraints(q, target) for q in solutions)
+        q_set, success = ik.inverse(target, ik.neutral, solver='analytical')
+        assert success
+        np.testing.assert_allclose(q_set[-1], solutions[0])
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from solution.reachability import ReachabilityMap, fibonacci_sphere
+from solution.solveFK import FK
+from solution.solveIK import IK
+from tests.test_solveIK import TARGETS, UNREACHABLE
+
+
+@pytest.fixture(scope='module')
+def reachability():
+    # The map the examples use (the defaults of build and set_margin)
+    return ReachabilityMap.build()
+
+
+def sampled_poses(n, random_state=0):
+    # The first n configurations drawn by build with random_state
+    Q = IK.lower + np.random.default_rng(random_state).random((n, 7)) * (IK.upper - IK.lower)
+    return FK().forward_batch(Q)[1]
+
+
+def test_fibonacci_sphere():
+    directions = fibonacci_sphere(64)
+    assert directions.shape == (64, 3)
+    np.testing.assert_allclose(np.linalg.norm(directions, axis=1), 1.)
+    np.testing.assert_allclose(directions.mean(axis=0), 0., atol=0.02)
+
+
+def test_sampled_poses_are_reachable(reachability):
+    poses = sampled_poses(1000)
+    assert reachability.reachable_batch(poses).all()
+    assert all(reachability.reachable(T) for T in poses[:100])
+    assert all(reachability.reachable_position(T[:3, 3]) for T in poses[:100])
+
+    # Even without a safety margin
+    reachability.set_margin(0., 0.)
+    try:
+        assert reachability.reachable_batch(poses).all()
+    finally:
+        reachability.set_margin()
+
+
+def test_new_poses_are_reachable(reachability):
+    # Poses the map did not sample are covered by the safety margin
+    assert reachability.reachable_batch(sampled_poses(20000, random_state=1)).all()
+    assert reachability.reachable_batch(np.array(TARGETS)).all()
+
+
+def test_far_targets_are_rejected(reachability):
+    assert not reachability.reachable(UNREACHABLE)
+    assert not reachability.reachable_position(UNREACHABLE[:3, 3])
+    # Outside of the mapped box
+    far = np.identity(4)
+    far[:3, 3] = [5., 0., 0.]
+    assert not reachability.reachable(far)
+    np.testing.assert_array_equal(reachability.reachable_batch(np.array([far, UNREACHABLE, TARGETS[0]])),
+                                  [False, False, True])
+
+
+def test_reachable_batch_matches_reachable(reachability):
+    rng = np.random.default_rng(2)
+    targets = np.tile(np.identity(4), (200, 1, 1))
+    targets[:, :3, 3] = rng.uniform(-1.2, 1.5, (200, 3))
+    targets[:, :3, 2] = fibonacci_sphere(200)
+    np.testing.assert_array_equal(reachability.reachable_batch(targets), [reachability.reachable(T) for T in targets])
+
+
+def test_save_load_round_trip(reachability, tmp_path):
+    path = str(tmp_path / 'reachability.npz')
+    reachability.set_margin(0.1, 0.2)
+    try:
+        reachability.save(path)
+    finally:
+        reachability.set_margin()
+    loaded = ReachabilityMap.load(path)
+    assert (loaded.position_margin, loaded.angle_margin) == (0.1, 0.2)
+    np.testing.assert_array_equal(loaded.masks, reachability.masks)
+    reachability.set_margin(0.1, 0.2)
+    try:
+        np.testing.assert_array_equal(loaded._dilated, reachability._dilated)
+    finally:
+        reachability.set_margin()
+
+
+def test_ik_rejects_unreachable_targets(reachability):
+    ik = IK(reachability=reachability)
+    q_set, success, telemetry = ik.inverse(UNREACHABLE, ik.neutral, return_telemetry=True)
+    assert not success and telemetry.iterations == 0
+    np.testing.assert_array_equal(q_set, [ik.neutral])
+
+    q, success, iterations = ik.inverse_batch(np.array([TARGETS[0], UNREACHABLE]), ik.neutral)
+    np.testing.assert_array_equal(success, [True, False])
+    assert iterations[1] == 0
+
+    for target in TARGETS:
+        assert ik.inverse(target, ik.neutral)[1]
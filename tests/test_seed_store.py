@@ -0,0 +1,147 @@
+import numpy as np
+from math import pi
+import pytest
+
+from solution.seed_store import SeedStore
+from solution.solveIK import IK
+from solution.transformation_utils import transformation
+
+
+def pose(x, y=0., z=0.3, yaw=0.):
+    return transformation.transform(np.array([x, y, z]), np.array([0, pi, yaw]))
+
+
+def random_poses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.array([transformation.transform(rng.uniform(-0.8, 0.8, 3), rng.uniform(-pi, pi, 3)) for _ in range(n)])
+
+
+def test_lookup_returns_nearest_solution():
+    store = SeedStore()
+    assert store.lookup(pose(0.5)) == (None, np.inf)
+    store.add(pose(0.5), np.full(7, 1.))
+    store.add(pose(0.7), np.full(7, 2.))
+    q, distance = store.lookup(pose(0.52))
+    np.testing.assert_array_equal(q, np.full(7, 1.))
+    assert distance == pytest.approx(0.02)
+    # Nothing within max_distance
+    assert store.lookup(pose(0.6), max_distance=0.05) == (None, np.inf)
+
+
+def test_lookup_returns_a_copy():
+    store = SeedStore()
+    store.add(pose(0.5), np.zeros(7))
+    q, _ = store.lookup(pose(0.5))
+    q[:] = 1.
+    np.testing.assert_array_equal(store.lookup(pose(0.5))[0], np.zeros(7))
+
+
+def test_orientation_weight():
+    store = SeedStore(orientation_weight=0.1)
+    store.add(pose(0.5), np.zeros(7))
+    # A rotation of a small angle counts for orientation_weight meters per radian
+    _, distance = store.lookup(pose(0.5, yaw=0.01))
+    assert distance == pytest.approx(0.1 * 0.01, rel=1e-4)
+
+
+def test_add_merges_close_poses():
+    store = SeedStore(merge_distance=1e-3)
+    store.add(pose(0.5), np.zeros(7))
+    store.add(pose(0.5005), np.ones(7))
+    assert len(store) == 1
+    np.testing.assert_array_equal(store.lookup(pose(0.5))[0], np.ones(7))
+    store.add(pose(0.502), np.full(7, 2.))
+    assert len(store) == 2
+
+
+def test_least_recently_used_is_evicted():
+    store = SeedStore(capacity=3)
+    for i in range(3):
+        store.add(pose(0.1 * i), np.full(7, float(i)))
+    # Using the first entry makes the second the least recently used
+    store.lookup(pose(0.))
+    store.add(pose(0.5), np.full(7, 3.))
+    assert len(store) == 3
+    assert store.lookup(pose(0.1))[1] == pytest.approx(0.1)
+    np.testing.assert_array_equal(store.lookup(pose(0.))[0], np.zeros(7))
+    np.testing.assert_array_equal(store.lookup(pose(0.5))[0], np.full(7, 3.))
+
+
+def test_nearest_matches_brute_force():
+    # Enough entries for the KD-tree to be built and then go stale again
+    store = SeedStore(capacity=500)
+    poses = random_poses(300)
+    solutions = np.random.default_rng(1).random((300, 7))
+    queries = random_poses(50, seed=2)
+    for n, (target, q) in enumerate(zip(poses, solutions), 1):
+        store.add(target, q)
+        if n % 37 == 0:
+            features = store.features(poses[:n])
+            for query in queries[:5]:
+                expected = np.argmin(np.linalg.norm(features - store.features(query), axis=1))
+                np.testing.assert_array_equal(store.lookup(query)[0], solutions[expected])
+
+    features = store.features(poses)
+    expected = np.argmin(np.linalg.norm(features[np.newaxis] - store.features(queries)[:, np.newaxis], axis=-1), axis=1)
+    np.testing.assert_array_equal(store.lookup_batch(queries, np.zeros(7)), solutions[expected])
+
+
+def test_lookup_batch_default():
+    store = SeedStore()
+    default = np.arange(7.)
+    np.testing.assert_array_equal(store.lookup_batch(np.array([pose(0.5)]), default), [default])
+    store.add(pose(0.5), np.ones(7))
+    seeds = store.lookup_batch(np.array([pose(0.5), pose(0.9)]), default, max_distance=0.1)
+    np.testing.assert_array_equal(seeds, [np.ones(7), default])
+
+
+def test_clear():
+    store = SeedStore()
+    store.add(pose(0.5), np.ones(7))
+    store.clear()
+    assert len(store) == 0 and store.lookup(pose(0.5))[0] is None
+
+
+def test_save_load_round_trip(tmp_path):
+    store = SeedStore(capacity=10, orientation_weight=0.2, merge_distance=1e-3)
+    poses = random_poses(5)
+    for i, target in enumerate(poses):
+        store.add(target, np.full(7, float(i)))
+    path = str(tmp_path / 'seeds.npz')
+    store.save(path)
+
+    loaded = SeedStore.load(path)
+    assert (loaded.capacity, loaded.orientation_weight, loaded.merge_distance) == (10, 0.2, 1e-3)
+    assert len(loaded) == 5
+    for i, target in enumerate(poses):
+        q, distance = loaded.lookup(target)
+        np.testing.assert_array_equal(q, np.full(7, float(i)))
+        assert distance == 0.
+
+
+def test_load_smaller_capacity_keeps_most_recent(tmp_path):
+    store = SeedStore(capacity=10)
+    poses = random_poses(5)
+    for i, target in enumerate(poses):
+        store.add(target, np.full(7, float(i)))
+    store.lookup(poses[0])
+    path = str(tmp_path / 'seeds.npz')
+    store.save(path)
+
+    loaded = SeedStore.load(path, capacity=2)
+    assert len(loaded) == 2
+    assert loaded.lookup(poses[0])[1] == 0.
+    assert loaded.lookup(poses[4])[1] == 0.
+    assert loaded.lookup(poses[1])[1] > 0.
+
+
+def test_ik_warm_starts_from_the_store():
+    ik = IK(seed_store=SeedStore())
+    np.testing.assert_array_equal(ik.warm_start(pose(0.5)), ik.neutral)
+    target = pose(0.5, z=0.2)
+    q_set, success = ik.inverse(target)
+    assert success and len(ik.seed_store) == 1
+    # Solved again from the stored solution, which the first step leaves in place
+    np.testing.assert_array_equal(ik.warm_start(target), q_set[-1])
+    _, success, telemetry = ik.inverse(target, return_telemetry=True)
+    assert success and telemetry.iterations <= 1
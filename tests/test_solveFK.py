@@ -0,0 +1,213 @@
+import numpy as np
+import pytest
+
+from solution import fk_codegen
+from solution.solveFK import FK
+from solution.solveIK import IK
+from solution.benchmark_fk import chain_product
+
+
+def random_configurations(n, seed=0):
+    return IK.lower + np.random.default_rng(seed).random((n, 7)) * (IK.upper - IK.lower)
+
+
+@pytest.fixture(scope='module')
+def fk():
+    return FK()
+
+
+def test_forward_matches_chain_product(fk):
+    for q in random_configurations(20):
+        jointPositions, T0e = fk.forward(q)
+        np.testing.assert_allclose(T0e, chain_product(fk, q), atol=1e-12)
+        # The joint centres are the origins of the intermediate frames
+        np.testing.assert_allclose(jointPositions[0], [0., 0., 0.333], atol=1e-12)
+
+
+def test_forward_batch_matches_forward(fk):
+    Q = random_configurations(50)
+    jointPositions, T0e = fk.forward_batch(Q)
+    assert jointPositions.shape == (50, 7, 3) and T0e.shape == (50, 4, 4)
+    for i, q in enumerate(Q):
+        expected_positions, expected_T0e = fk.forward(q)
+        np.testing.assert_allclose(jointPositions[i], expected_positions, atol=1e-12)
+        np.testing.assert_allclose(T0e[i], expected_T0e, atol=1e-12)
+
+
+def test_forward_batch_single_row(fk):
+    q = random_configurations(1)[0]
+    jointPositions, T0e = fk.forward_batch(q)
+    assert jointPositions.shape == (1, 7, 3)
+    np.testing.assert_allclose(T0e[0], fk.forward(q)[1], atol=1e-12)
+
+
+def test_forward_into_caller_buffers(fk):
+    out = (np.empty((7, 3)), np.empty((4, 4)))
+    for q in random_configurations(5, seed=1):
+        jointPositions, T0e = fk.forward(q, out=out)
+        assert jointPositions is out[0] and T0e is out[1]
+        expected_positions, expected_T0e = fk.forward(q)
+        np.testing.assert_allclose(out[0], expected_positions, atol=1e-12)
+        np.testing.assert_allclose(out[1], expected_T0e, atol=1e-12)
+
+
+def test_forward_without_out_returns_new_arrays(fk):
+    # The results must not alias the buffers of the workspace, which the next call overwrites
+    Q = random_configurations(2, seed=2)
+    first = fk.forward(Q[0])
+    expected = [array.copy() for array in first]
+    fk.forward(Q[1])
+    np.testing.assert_array_equal(first[0], expected[0])
+    np.testing.assert_array_equal(first[1], expected[1])
+
+
+def test_build_dh_transform_into_out(fk):
+    out = np.empty((4, 4))
+    T = fk.build_dh_transform(0.0825, np.pi / 2, 0.316, 0.3, out=out)
+    assert T is out
+    np.testing.assert_allclose(T, fk.build_dh_transform(0.0825, np.pi / 2, 0.316, 0.3))
+
+
+def test_workspace_buffers_are_reused(fk):
+    workspace = fk.workspace()
+    Q = random_configurations(2, seed=3)
+    jointPositions, T0e = workspace.forward(Q[0])
+    again = workspace.forward(Q[1])
+    assert again[0] is jointPositions and again[1] is T0e
+    np.testing.assert_allclose(T0e, fk.forward(Q[1])[1], atol=1e-12)
+
+
+def test_incremental_forward_matches_full(fk):
+    incremental = FK(incremental=True)
+    q = random_configurations(1, seed=4)[0]
+    rng = np.random.default_rng(5)
+    for _ in range(30):
+        # Move only the joints from a random one onward
+        first = rng.integers(7)
+        q = q.copy()
+        q[first:] += rng.normal(0., 0.1, 7 - first)
+        for actual, expected in zip(incremental.forward(q), fk.forward(q)):
+            np.testing.assert_allclose(actual, expected, atol=1e-12)
+
+
+def test_incremental_cache_stats():
+    fk = FK(incremental=True)
+    q = random_configurations(1, seed=6)[0]
+
+    fk.forward(q) # first call: whole chain
+    fk.forward(q) # unchanged: nothing recomputed
+    moved = q.copy()
+    moved[5] += 0.1
+    fk.forward(moved) # joints 6 and 7 recomputed
+    moved = moved.copy()
+    moved[0] += 0.1
+    fk.forward(moved) # first joint changed: whole chain
+
+    stats = fk.cache_stats()
+    assert (stats['hits'], stats['misses']) == (2, 2)
+    assert stats['joints_reused'] == 7 + 5
+    assert stats['joints_computed'] == 7 + 0 + 2 + 7
+    assert stats['hit_rate'] == 0.5
+
+
+def test_workspace_invalidate():
+    workspace = FK().workspace(incremental=True)
+    q = random_configurations(1, seed=7)[0]
+    workspace.forward(q)
+    workspace.invalidate()
+    workspace.forward(q)
+    assert workspace.cache_stats()['misses'] == 2
+    workspace.reset_stats()
+    assert workspace.cache_stats()['hits'] == workspace.cache_stats()['misses'] == 0
+
+
+def test_non_incremental_never_reuses():
+    fk = FK()
+    q = random_configurations(1, seed=8)[0]
+    fk.forward(q)
+    fk.forward(q)
+    assert fk.cache_stats()['hits'] == 0
+
+
+def finite_difference_jacobian(fk, q, h=1e-6):
+    _, T0e = fk.forward(q)
+    J = np.empty((6, 7))
+    for i in range(7):
+        step = np.zeros(7)
+        step[i] = h
+        _, T = fk.forward(q + step)
+        J[:3, i] = (T[:3, 3] - T0e[:3, 3]) / h
+        # Angular velocity from the skew-symmetric part of dR R^T
+        W = (T[:3, :3] - T0e[:3, :3]) @ T0e[:3, :3].T / h
+        J[3:, i] = [W[2, 1], W[0, 2], W[1, 0]]
+    return J
+
+
+def test_forward_with_jacobian_matches_forward(fk):
+    for q in random_configurations(10, seed=9):
+        T0e, frames, J = fk.forward_with_jacobian(q)
+        np.testing.assert_allclose(T0e, fk.forward(q)[1], atol=1e-12)
+        assert frames.shape == (7, 4, 4) and J.shape == (6, 7)
+        np.testing.assert_allclose(J, finite_difference_jacobian(fk, q), atol=1e-5)
+
+
+def test_forward_with_jacobian_batch_matches_single(fk):
+    Q = random_configurations(25, seed=10)
+    T0e, frames, J = fk.forward_with_jacobian_batch(Q)
+    assert T0e.shape == (25, 4, 4) and frames.shape == (25, 7, 4, 4) and J.shape == (25, 6, 7)
+    for i, q in enumerate(Q):
+        for actual, expected in zip((T0e[i], frames[i], J[i]), fk.forward_with_jacobian(q)):
+            np.testing.assert_allclose(actual, expected, atol=1e-12)
+
+
+def test_forward_with_jacobian_returns_copies(fk):
+    Q = random_configurations(2, seed=11)
+    first = fk.forward_with_jacobian(Q[0])
+    fk.forward_with_jacobian(Q[1])
+    np.testing.assert_allclose(first[0], fk.forward(Q[0])[1], atol=1e-12)
+
+
+@pytest.fixture(scope='module')
+def generated():
+    return FK(backend='generated')
+
+
+def test_generated_backend_matches_chain(fk, generated):
+    Q = random_configurations(20, seed=12)
+    for q in Q:
+        for actual, expected in zip(generated.forward(q), fk.forward(q)):
+            np.testing.assert_allclose(actual, expected, atol=1e-12)
+        for actual, expected in zip(generated.forward_with_jacobian(q), fk.forward_with_jacobian(q)):
+            np.testing.assert_allclose(actual, expected, atol=1e-12)
+    for actual, expected in zip(generated.forward_batch(Q), fk.forward_batch(Q)):
+        np.testing.assert_allclose(actual, expected, atol=1e-12)
+    for actual, expected in zip(generated.forward_with_jacobian_batch(Q), fk.forward_with_jacobian_batch(Q)):
+        np.testing.assert_allclose(actual, expected, atol=1e-12)
+
+
+def test_generated_module_is_up_to_date():
+    with open(fk_codegen.DEFAULT_OUTPUT) as f:
+        assert f.read() == fk_codegen.generate()
+
+
+def test_emitter_reuses_expressions():
+    emitter = fk_codegen._Emitter()
+    name = emitter.combine([(2., 'a', 'b'), (1., 'c')])
+    # Same sum with the terms and factors reordered
+    assert emitter.combine([(1., 'c'), (2., 'b', 'a')]) == name
+    # Negated sum
+    assert emitter.combine([(-2., 'a', 'b'), (1., '-c')]) == '-' + name
+    assert emitter.combine([(1., 'a'), (0.5, 1.)]) != name
+    assert len(emitter.lines) == 2
+    assert emitter.lines[1].strip().endswith('a + 0.5')
+    assert emitter.combine([(1., 'a'), (-0.5, 1.)]).startswith('t')
+    assert emitter.lines[2].strip().endswith('a - 0.5')
+
+
+def test_emitter_prune_drops_unused_assignments():
+    emitter = fk_codegen._Emitter()
+    used = emitter.combine([(2., 'x')])
+    emitter.combine([(3., 'y')])
+    emitter.emit('return {}'.format(used))
+    emitter.prune()
+    assert [line.strip() for line in emitter.lines] == ['t1 = 2.0*x', 'return t1']
@@ -0,0 +1,288 @@
+import time
+import numpy as np
+from math import pi
+import pytest
+
+from solution.solveIK import IK, halton
+from solution.transformation_utils import transformation
+
+# Targets of the assignment, reachable from the neutral configuration
+TARGETS = [
+    transformation.transform(np.array([.5, 0, .2]), np.array([0, pi, pi])),
+    transformation.transform(np.array([.7, 0., .3]), np.array([0, pi, pi])),
+    transformation.transform(np.array([-.5, -.1, .2]), np.array([0, pi/2, pi])),
+]
+UNREACHABLE = transformation.transform(np.array([2., 0, .2]), np.array([0, pi, pi]))
+
+
+@pytest.fixture(scope='module')
+def ik():
+    return IK()
+
+
+@pytest.mark.parametrize('solver', ['dls', 'lm', 'staged', 'analytical'])
+@pytest.mark.parametrize('deadline_s', [2e-3, 5e-3])
+def test_inverse_deadline_wall_time(ik, solver, deadline_s):
+    # The median wall time of the solves stays within the budget
+    times = []
+    for target in TARGETS:
+        for _ in range(5):
+            start = time.perf_counter()
+            ik.inverse(target, ik.neutral, solver=solver, deadline_s=deadline_s)
+            times.append(time.perf_counter() - start)
+    assert np.median(times) <= deadline_s
+
+
+@pytest.mark.parametrize('deadline_s', [1e-6, 1e-5])
+def test_inverse_deadline_too_short_to_check(ik, deadline_s):
+    # A budget that does not cover the final check returns the initial guess, unchecked
+    start = time.perf_counter()
+    q_set, success, telemetry = ik.inverse(TARGETS[0], ik.neutral, return_telemetry=True, deadline_s=deadline_s)
+    assert time.perf_counter() - start < 1e-3
+    assert not success and telemetry.timed_out
+    assert np.isnan(telemetry.position_error) and np.isnan(telemetry.rotation_error)
+    np.testing.assert_array_equal(q_set[-1], ik.neutral)
+
+
+def test_inverse_deadline_returns_best_iterate(ik):
+    # When the budget runs out, the last iterate is the one with the lowest pose error
+    q_set, _, telemetry = ik.inverse(TARGETS[1], ik.neutral, solver='dls', return_telemetry=True, deadline_s=1e-3)
+    if telemetry.timed_out:
+        costs = [ik._pose_cost(q, TARGETS[1]) for q in q_set]
+        assert costs[-1] == min(costs)
+
+
+def test_iter_inverse_deadline(ik):
+    start = time.perf_counter()
+    iterates = list(ik.iter_inverse(TARGETS[0], ik.neutral, deadline_s=1e-6))
+    assert time.perf_counter() - start < 1e-3
+    np.testing.assert_array_equal(iterates, [ik.neutral])
+
+
+def test_inverse_multistart_workers_use_the_settings_of_the_instance():
+    # With no iterations allowed, a seed only succeeds if it already solves the target
+    ik = IK()
+    ik.max_steps = 0
+    try:
+        q, success = ik.inverse_multistart(TARGETS[0], seeds=ik.neutral, workers=1)
+        assert not success
+        solution, solved = IK().inverse(TARGETS[0], ik.neutral)
+        assert solved
+        q, success = ik.inverse_multistart(TARGETS[0], seeds=solution[-1], workers=1)
+        assert success
+    finally:
+        ik.close()
+
+
+def test_inverse_batch_matches_inverse(ik):
+    targets = np.array(TARGETS + [UNREACHABLE])
+    q, success, iterations = ik.inverse_batch(targets, ik.neutral)
+    assert q.shape == (4, 7) and success.shape == (4,) and iterations.shape == (4,)
+    np.testing.assert_array_equal(success, [True, True, True, False])
+    for i, target in enumerate(targets):
+        _, solved = ik.inverse(target, ik.neutral)
+        assert success[i] == solved
+        assert success[i] == ik.check_joint_constraints(q[i], target)
+        assert ik.within_limits(q[i])
+
+
+def test_inverse_batch_per_row_seeds(ik):
+    solutions = np.array([ik.inverse(target, ik.neutral)[0][-1] for target in TARGETS])
+    # Seeded with their own solutions, the rows are done without iterating
+    q, success, iterations = ik.inverse_batch(np.array(TARGETS), solutions)
+    assert success.all()
+    np.testing.assert_array_equal(iterations, 0)
+    np.testing.assert_allclose(q, solutions, atol=1e-12)
+
+
+def test_halton_points():
+    points = halton(4, 2)
+    np.testing.assert_allclose(points, [[1/2, 1/3], [1/4, 2/3], [3/4, 1/9], [1/8, 4/9]])
+
+
+@pytest.mark.parametrize('strategy', ['random', 'halton'])
+def test_sample_seeds_within_limits(ik, strategy):
+    seeds = ik.sample_seeds(64, strategy, random_state=0)
+    assert seeds.shape == (64, 7)
+    assert ik.within_limits(seeds).all()
+    with pytest.raises(ValueError):
+        ik.sample_seeds(4, 'grid')
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_inverse_multistart(workers):
+    ik = IK()
+    try:
+        for target in TARGETS:
+            q, success = ik.inverse_multistart(target, ik.neutral, num_seeds=4, workers=workers, random_state=1)
+            assert success and ik.check_joint_constraints(q, target)
+        q, success = ik.inverse_multistart(UNREACHABLE, ik.neutral, num_seeds=2, seeds='halton', workers=workers)
+        assert not success and q.shape == (7,)
+    finally:
+        ik.close()
+
+
+@pytest.mark.parametrize('solver', ['dls', 'lm'])
+def test_inverse_converges(ik, solver):
+    for target in TARGETS:
+        q_set, success = ik.inverse(target, ik.neutral, solver=solver)
+        assert success and ik.check_joint_constraints(q_set[-1], target)
+        np.testing.assert_array_equal(q_set[0], ik.neutral)
+
+
+def test_inverse_lm_telemetry(ik):
+    q_set, success, telemetry = ik.inverse(TARGETS[1], ik.neutral, solver='lm', return_telemetry=True)
+    assert telemetry.solver == 'lm' and telemetry.success == success and success
+    assert 0 < telemetry.iterations <= ik.max_steps
+    # Rejected steps are counted but yield no iterate
+    assert len(q_set) <= telemetry.iterations + 1
+    position_error, rotation_error = ik.pose_error(q_set[-1], TARGETS[1])
+    assert telemetry.position_error == position_error <= ik.linear_tol
+    assert telemetry.rotation_error == rotation_error <= ik.angular_tol
+    assert telemetry.wall_time > 0. and not telemetry.timed_out
+
+
+def test_inverse_lm_cost_decreases(ik):
+    # Every accepted step passes the sufficient decrease test of the line search
+    q_set, _ = ik.inverse(TARGETS[2], ik.neutral, solver='lm')
+    costs = [ik._pose_cost(q, TARGETS[2]) for q in q_set]
+    assert all(b < a for a, b in zip(costs, costs[1:]))
+
+
+def test_inverse_lm_fails_on_unreachable_target(ik):
+    q_set, success, telemetry = ik.inverse(UNREACHABLE, ik.neutral, solver='lm', return_telemetry=True)
+    assert not success and not telemetry.success
+    assert telemetry.position_error > ik.linear_tol
+    assert ik.within_limits(q_set[-1])
+
+
+def test_inverse_keep_last(ik):
+    q_set, success = ik.inverse(TARGETS[1], ik.neutral, keep_last=2)
+    full, _ = ik.inverse(TARGETS[1], ik.neutral)
+    assert success and len(q_set) == 2
+    np.testing.assert_allclose(q_set[-1], full[-1])
+
+
+def run_iter_inverse(generator):
+    # Iterates of an iter_inverse generator, and the success it returns
+    iterates = []
+    while True:
+        try:
+            iterates.append(next(generator))
+        except StopIteration as stop:
+            return iterates, stop.value
+
+
+@pytest.mark.parametrize('solver', ['dls', 'lm'])
+def test_iter_inverse_matches_inverse(ik, solver):
+    for target in TARGETS + [UNREACHABLE]:
+        q_set, success = ik.inverse(target, ik.neutral, solver=solver)
+        iterates, streamed = run_iter_inverse(ik.iter_inverse(target, ik.neutral, solver=solver))
+        assert streamed is success
+        np.testing.assert_allclose(iterates, q_set)
+
+
+def test_iter_inverse_decimation(ik):
+    q_set, _ = ik.inverse(TARGETS[2], ik.neutral)
+    iterates, success = run_iter_inverse(ik.iter_inverse(TARGETS[2], ik.neutral, every=3))
+    assert success
+    # The initial guess, every third iterate, and the final one
+    expected = [q_set[0]] + q_set[3::3]
+    if len(q_set) % 3 != 1:
+        expected.append(q_set[-1])
+    np.testing.assert_allclose(iterates, expected)
+
+    iterates, success = run_iter_inverse(ik.iter_inverse(TARGETS[2], ik.neutral, min_step=0.1))
+    assert success
+    np.testing.assert_allclose(iterates[0], ik.neutral)
+    np.testing.assert_allclose(iterates[-1], q_set[-1])
+    steps = np.linalg.norm(np.diff(iterates[:-1], axis=0), axis=1)
+    assert (steps >= 0.1).all()
+
+
+def test_joint_margins(ik):
+    q = np.array([ik.lower + 0.1, ik.upper + 0.2])
+    np.testing.assert_allclose(ik.joint_margins(q), [np.full(7, 0.1), np.full(7, -0.2)])
+    assert ik.joint_margins(ik.neutral).shape == (7,)
+
+
+def test_within_limits(ik):
+    q = np.array([ik.neutral, ik.lower, ik.upper + 1e-9, ik.lower + 0.05])
+    np.testing.assert_array_equal(ik.within_limits(q), [True, True, False, True])
+    np.testing.assert_array_equal(ik.within_limits(q, margin=0.1), [True, False, False, False])
+    assert ik.within_limits(ik.neutral) and not ik.within_limits(ik.upper + 1.)
+
+
+def test_project_to_limits(ik):
+    # A full turn away from a valid configuration is wrapped back onto it
+    q = ik.neutral + np.array([2 * np.pi, 0, -2 * np.pi, 0, 0, 0, 2 * np.pi])
+    np.testing.assert_allclose(ik.project_to_limits(q), ik.neutral, atol=1e-12)
+    np.testing.assert_allclose(ik.project_to_limits(q, wrap=False), np.clip(q, ik.lower, ik.upper))
+
+    Q = np.random.default_rng(3).uniform(-10, 10, (100, 7))
+    projected = ik.project_to_limits(Q, margin=0.01)
+    assert projected.shape == Q.shape and ik.within_limits(projected, margin=0.01 - 1e-12).all()
+    # Configurations within the limits are unchanged
+    np.testing.assert_allclose(ik.project_to_limits(projected), projected, atol=1e-12)
+
+
+def test_check_joint_constraints_batch_matches_single(ik):
+    solutions = [ik.inverse(target, ik.neutral)[0][-1] for target in TARGETS]
+    q = np.array(solutions + [ik.neutral, solutions[0] + 1e-2, ik.upper + 0.1])
+    targets = np.array(TARGETS + [TARGETS[0], TARGETS[0], TARGETS[0]])
+    success = ik.check_joint_constraints_batch(q, targets)
+    np.testing.assert_array_equal(success, [True, True, True, False, False, False])
+    np.testing.assert_array_equal(success, [ik.check_joint_constraints(*args) for args in zip(q, targets)])
+
+
+def joint_path(n=50):
+    # Poses along a smooth joint space path
+    s = np.linspace(0., 1., n)[:, np.newaxis]
+    step = np.array([0.6, 0.4, -0.3, 0.5, 0.4, -0.3, 0.5])
+    Q = IK.neutral + s * step
+    return Q, IK.fk.forward_batch(Q)[1]
+
+
+@pytest.mark.parametrize('solver', ['dls', 'lm'])
+def test_inverse_path_matches_inverse(ik, solver):
+    Q, poses = joint_path()
+    q, success, iterations, breaks = ik.inverse_path(poses, Q[0], solver=solver)
+    assert q.shape == (50, 7) and success.all() and breaks == []
+    np.testing.assert_array_equal(success, ik.check_joint_constraints_batch(q, poses))
+    # The predicted seeds only need a few corrections
+    assert iterations[1:].max() <= 3
+    assert np.abs(np.diff(q, axis=0)).max() <= ik.path_max_joint_step
+    for k in range(1, 50, 7):
+        _, solved = ik.inverse(poses[k], q[k - 1], solver=solver)
+        assert solved
+
+
+def test_inverse_path_reports_breaks(ik):
+    Q, poses = joint_path(10)
+    poses[5] = UNREACHABLE
+    q, success, _, breaks = ik.inverse_path(poses, Q[0])
+    np.testing.assert_array_equal(success, np.arange(10) != 5)
+    assert 5 in breaks
+
+
+def test_inverse_staged(ik):
+    for target in TARGETS:
+        q_set, success, telemetry = ik.inverse(target, ik.neutral, solver='staged', return_telemetry=True)
+        assert success and telemetry.solver == 'staged'
+        assert telemetry.iterations >= len(q_set) - 1
+
+        # Position-only steps until within staged_switch_distance, then the
+        # refinement of staged_refine from there
+        distance = [np.linalg.norm(ik.fk.forward(q)[1][:3, 3] - target[:3, 3]) for q in q_set]
+        switch = next(k for k, d in enumerate(distance) if d <= ik.staged_switch_distance)
+        assert switch > 0
+        assert all(b < a for a, b in zip(distance[:switch], distance[1:switch + 1]))
+        refined, _ = ik.inverse(target, q_set[switch], solver=ik.staged_refine)
+        np.testing.assert_allclose(q_set[switch:], refined)
+
+
+
+def test_inverse_staged_unreachable(ik):
+    q_set, success, telemetry = ik.inverse(UNREACHABLE, ik.neutral, solver='staged', return_telemetry=True)
+    assert not success and ik.within_limits(q_set[-1])
+    assert telemetry.iterations <= ik.staged_max_position_steps + ik.max_steps
@@ -0,0 +1,66 @@
+import numpy as np
+from math import pi
+import pytest
+
+from solution.transformation_utils import transformation
+
+
+def random_transforms(n, seed=0):
+    rng = np.random.default_rng(seed)
+    d = rng.uniform(-1., 1., (n, 3))
+    rpy = rng.uniform([-pi, -pi / 2, -pi], [pi, pi / 2, pi], (n, 3))
+    return d, rpy
+
+
+def test_transform_matches_elementary_transforms():
+    for d, (r, p, y) in zip(*random_transforms(20)):
+        expected = transformation.trans(d) @ transformation.roll(r) @ transformation.pitch(p) @ transformation.yaw(y)
+        np.testing.assert_allclose(transformation.transform(d, [r, p, y]), expected, atol=1e-12)
+
+
+def test_transform_batch_matches_transform():
+    d, rpy = random_transforms(30)
+    T = transformation.transform_batch(d, rpy)
+    assert T.shape == (30, 4, 4)
+    for i in range(30):
+        np.testing.assert_allclose(T[i], transformation.transform(d[i], rpy[i]), atol=1e-12)
+
+    # Broadcasting: one translation for a (5, 6) grid of orientations
+    T = transformation.transform_batch(d[0], rpy.reshape(5, 6, 3))
+    assert T.shape == (5, 6, 4, 4)
+    np.testing.assert_allclose(T[2, 3], transformation.transform(d[0], rpy[15]), atol=1e-12)
+
+
+def test_rpy_round_trip():
+    d, rpy = random_transforms(30)
+    np.testing.assert_allclose(transformation.rpy(transformation.transform_batch(d, rpy)), rpy, atol=1e-9)
+    for i in range(5):
+        np.testing.assert_allclose(transformation.rpy(transformation.transform(d[i], rpy[i])), rpy[i], atol=1e-9)
+
+
+@pytest.mark.parametrize('pitch', [pi / 2, -pi / 2])
+def test_rpy_gimbal_lock(pitch):
+    T = transformation.transform(np.zeros(3), [0.3, pitch, 0.5])
+    roll, p, yaw = transformation.rpy(T)
+    assert roll == 0. and p == pytest.approx(pitch)
+    # The same rotation, carried by yaw alone
+    np.testing.assert_allclose(transformation.transform(np.zeros(3), [roll, p, yaw]), T, atol=1e-9)
+
+
+def test_inverse_matches_linalg_inv():
+    T = transformation.transform_batch(*random_transforms(20))
+    Ti = transformation.inverse(T)
+    np.testing.assert_allclose(Ti, np.linalg.inv(T), atol=1e-12)
+    np.testing.assert_allclose(transformation.inverse(T[0]), np.linalg.inv(T[0]), atol=1e-12)
+    np.testing.assert_allclose(T @ Ti, np.broadcast_to(np.identity(4), T.shape), atol=1e-12)
+
+
+def test_compose_matches_matmul():
+    A = transformation.transform_batch(*random_transforms(20))
+    B = transformation.transform_batch(*random_transforms(20, seed=1))
+    np.testing.assert_allclose(transformation.compose(A, B), A @ B, atol=1e-12)
+    np.testing.assert_allclose(transformation.compose(A[0], B[0]), A[0] @ B[0], atol=1e-12)
+    # One transform against a batch, on either side
+    np.testing.assert_allclose(transformation.compose(A[0], B), A[0] @ B, atol=1e-12)
+    np.testing.assert_allclose(transformation.compose(A, B[0]), A @ B[0], atol=1e-12)
+    assert transformation.compose(A[:4, np.newaxis], B[np.newaxis, :5]).shape == (4, 5, 4, 4)